@@ -0,0 +1,161 @@
+"""Announcement fan-out for product and coupon notices.
+
+``announce`` records an Announcement and queues its first chunk; it does no
+per-recipient work, so saving a product or coupon never waits on the size
+of the audience. The ``accounts.announce`` job then walks the segment's
+users in id order, ANNOUNCE_CHUNK_SIZE at a time: it sends their emails over
+one connection (core.mail.send_batch), creates their in-app notifications
+with one bulk insert (a store-wide segment gets a single broadcast row
+instead), saves the progress shown on the dashboard and queues the next
+chunk, spaced so email goes out at no more than ANNOUNCE_EMAILS_PER_MINUTE.
+
+Email bodies are rendered once per announcement and shared by every
+recipient. Emails are only sent when ANNOUNCE_BY_EMAIL is enabled.
+"""
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.jobs import enqueue
+from core.mail import send_batch
+from .models import Announcement
+from .notifications import broadcast, notify_users
+
+
+logger = logging.getLogger(__name__)
+
+
+def _site():
+    try:
+        site = Site.objects.get_current()
+        return site.name, site.domain
+    except Exception:
+        return getattr(settings, "STORE_NAME", "Store"), getattr(settings, "STORE_DOMAIN", "localhost:8000")
+
+
+def _render(ann: Announcement) -> None:
+    site_name, site_domain = _site()
+    link = ann.link_url or "/"
+    ctx = {
+        "announcement": ann,
+        "site_name": site_name,
+        "site_domain": site_domain,
+        "link": link if "://" in link else f"https://{site_domain}{link}",
+    }
+    ann.email_subject = render_to_string("accounts/email/announcement_subject.txt", ctx).strip()[:200]
+    ann.email_text = render_to_string("accounts/email/announcement.txt", ctx)
+    ann.email_html = render_to_string("accounts/email/announcement.html", ctx)
+
+
+def recipients(ann: Announcement):
+    users = User.objects.filter(is_active=True)
+    if ann.segment == Announcement.SEGMENT_WISHLIST:
+        users = users.filter(wishlist__product_id=ann.product_id)
+    return users
+
+
+def _queue_chunk(ann: Announcement, after: int, delay: float = 0) -> None:
+    # One key per chunk, so a re-run chunk never queues its successor twice
+    enqueue("accounts.announce", {"announcement_id": ann.pk, "after": after}, key=f"announce:{ann.pk}:{after}", delay=delay)
+
+
+def announce(
+    key: str,
+    title: str,
+    message: str = "",
+    link_url: str = "",
+    level: str = "promo",
+    segment: str = Announcement.SEGMENT_ALL,
+    product=None,
+) -> Optional[Announcement]:
+    """Start fanning out a notice; returns None if ``key`` was already announced."""
+    ann = Announcement(
+        key=key[:200],
+        title=title[:150],
+        message=message[:500],
+        link_url=link_url[:300],
+        level=level,
+        segment=segment,
+        product=product,
+        send_email=bool(getattr(settings, "ANNOUNCE_BY_EMAIL", False)),
+    )
+    if ann.send_email:
+        _render(ann)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                ann.save()
+        except IntegrityError:
+            return None
+        if segment == Announcement.SEGMENT_ALL:
+            broadcast(title=ann.title, message=ann.message, link_url=ann.link_url, level=level)
+            if not ann.send_email:
+                # Nothing per user to do
+                Announcement.objects.filter(pk=ann.pk).update(status=Announcement.STATUS_DONE, finished_at=timezone.now())
+                return ann
+        _queue_chunk(ann, 0)
+    return ann
+
+
+def _email(ann: Announcement, address: str) -> EmailMultiAlternatives:
+    msg = EmailMultiAlternatives(ann.email_subject, ann.email_text, getattr(settings, "DEFAULT_FROM_EMAIL", None) or None, [address])
+    if ann.email_html:
+        msg.attach_alternative(ann.email_html, "text/html")
+    return msg
+
+
+def run_chunk(announcement_id: int, after: int) -> None:
+    """Deliver the chunk of recipients with ids above ``after`` and queue the next one."""
+    ann = Announcement.objects.filter(pk=announcement_id).first()
+    if ann is None or ann.status != Announcement.STATUS_RUNNING or ann.cursor != after:
+        return  # cancelled, finished, or this chunk is already done
+    size = max(1, int(getattr(settings, "ANNOUNCE_CHUNK_SIZE", 500)))
+    users = recipients(ann)
+    if ann.recipients is None:
+        Announcement.objects.filter(pk=ann.pk).update(recipients=users.count())
+
+    ids, emails = [], []
+    for uid, address in users.filter(pk__gt=after).order_by("pk").values_list("pk", "email")[:size].iterator():
+        ids.append(uid)
+        if ann.send_email and address:
+            emails.append(_email(ann, address))
+    sent = send_batch(emails) if emails else 0
+
+    now = timezone.now()
+    finished = len(ids) < size
+    fields = {
+        "cursor": ids[-1] if ids else after,
+        "processed": F("processed") + len(ids),
+        "emailed": F("emailed") + sent,
+        "email_failed": F("email_failed") + (len(emails) - sent),
+        "updated_at": now,
+    }
+    if finished:
+        fields.update(status=Announcement.STATUS_DONE, finished_at=now)
+    with transaction.atomic():
+        # Conditional on the cursor: a chunk that is run twice only counts once
+        if not Announcement.objects.filter(pk=ann.pk, cursor=after, status=Announcement.STATUS_RUNNING).update(**fields):
+            return
+        if ids and ann.segment != Announcement.SEGMENT_ALL:
+            notify_users(ids, ann.title, ann.message, ann.link_url, ann.level)
+        if not finished:
+            rate = int(getattr(settings, "ANNOUNCE_EMAILS_PER_MINUTE", 600))
+            _queue_chunk(ann, ids[-1], delay=len(emails) * 60.0 / rate if rate > 0 else 0)
+    logger.info("Announcement %s: %s recipients after %s, %s emailed", ann.pk, len(ids), after, sent)
+
+
+def cancel(ann: Announcement) -> bool:
+    """Stop a running announcement; chunks already queued do nothing."""
+    return bool(
+        Announcement.objects.filter(pk=ann.pk, status=Announcement.STATUS_RUNNING).update(
+            status=Announcement.STATUS_CANCELLED, finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    )
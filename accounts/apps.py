@@ -5,3 +5,8 @@ class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
 
+    def ready(self):
+        try:
+            from . import signals  # noqa: F401
+        except Exception:
+            pass
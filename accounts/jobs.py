@@ -0,0 +1,8 @@
+from core.jobs import job
+from .announcements import run_chunk
+
+
+@job("accounts.announce")
+def announce_chunk(announcement_id: int, after: int = 0):
+    """Deliver one chunk of an announcement; errors are retried by the queue."""
+    run_chunk(announcement_id, after)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.sessions import backfill, purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in batches and prune the UserSession index (replaces clearsessions)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=5000, help="Sessions deleted per query")
+        parser.add_argument("--backfill", action="store_true", help="Also index active sessions opened before UserSession existed")
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch=options["batch"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions"))
+        if options["backfill"]:
+            self.stdout.write(self.style.SUCCESS(f"Indexed {backfill()} active sessions"))
@@ -0,0 +1,20 @@
+from .sessions import sync
+
+
+class UserSessionMiddleware:
+    """Keep the UserSession index on the current key when a signed-in session's key is cycled.
+
+    Runs after the view and before SessionMiddleware saves the session, so the
+    updated marker is stored with it. Only sessions the request touched are
+    checked, which is a dict lookup unless the key changed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, "session", None)
+        if session is not None and session.accessed:
+            sync(session)
+        return response
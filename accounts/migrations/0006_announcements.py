@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_variant_reserved'),
+        ('accounts', '0005_notification_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Announcement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('title', models.CharField(max_length=150)),
+                ('message', models.CharField(blank=True, max_length=500)),
+                ('link_url', models.CharField(blank=True, max_length=300)),
+                ('level', models.CharField(choices=[('info', 'Info'), ('promo', 'Promotion'), ('alert', 'Alert')], default='promo', max_length=12)),
+                ('segment', models.CharField(choices=[('all', 'All users'), ('wishlist', 'Wishlist holders of a product')], default='all', max_length=20)),
+                ('send_email', models.BooleanField(default=False)),
+                ('email_subject', models.CharField(blank=True, max_length=200)),
+                ('email_text', models.TextField(blank=True)),
+                ('email_html', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('cancelled', 'Cancelled')], default='running', max_length=10)),
+                ('recipients', models.PositiveIntegerField(blank=True, null=True)),
+                ('cursor', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('emailed', models.PositiveIntegerField(default=0)),
+                ('email_failed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.product')),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
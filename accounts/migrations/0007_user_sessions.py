@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_user_sessions(apps, schema_editor):
+    # Sessions opened before the index existed must be indexed now: an idle
+    # one would otherwise survive sign-out everywhere and account deletion.
+    # Mirrors accounts.sessions.backfill with the historical models.
+    from django.contrib.sessions.backends.db import SessionStore
+
+    Session = apps.get_model("sessions", "Session")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    UserSession = apps.get_model("accounts", "UserSession")
+    decoder = SessionStore()
+
+    def save(rows):
+        live = set(User.objects.filter(pk__in=[r.user_id for r in rows]).values_list("pk", flat=True))
+        UserSession.objects.bulk_create([r for r in rows if r.user_id in live], ignore_conflicts=True)
+
+    rows = []
+    sessions = Session.objects.filter(expire_date__gte=timezone.now()).values_list("session_key", "session_data")
+    for key, data in sessions.iterator(chunk_size=2000):
+        try:
+            user_id = decoder.decode(data).get("_auth_user_id")
+        except Exception:
+            continue
+        if user_id:
+            rows.append(UserSession(session_key=key, user_id=int(user_id)))
+        if len(rows) >= 2000:
+            save(rows)
+            rows = []
+    if rows:
+        save(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0006_announcements'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSession',
+            fields=[
+                ('session_key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_sessions, migrations.RunPython.noop),
+    ]
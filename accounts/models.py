@@ -51,7 +51,7 @@ class Notification(models.Model):
     message = models.CharField(max_length=500, blank=True)
     link_url = models.CharField(max_length=300, blank=True)
     level = models.CharField(max_length=12, choices=LEVELS, default="info")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     is_active = models.BooleanField(default=True)
 
     class Meta:
@@ -63,6 +63,7 @@ class Notification(models.Model):
 
 
 class NotificationRead(models.Model):
+    # Sparse receipt: only needed for notifications newer than the user's watermark
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications_read")
     notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name="reads")
     read_at = models.DateTimeField(auto_now_add=True)
@@ -72,3 +73,79 @@ class NotificationRead(models.Model):
 
     def __str__(self):
         return f"Read {self.notification_id} by {self.user_id}"
+
+
+class NotificationWatermark(models.Model):
+    # Everything created at or before last_seen_at counts as read for this user
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="notification_watermark")
+    last_seen_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} seen up to {self.last_seen_at:%Y-%m-%d %H:%M}"
+
+
+class Announcement(models.Model):
+    """A notice fanned out to a user segment in chunks by the job worker (see accounts.announcements)."""
+
+    SEGMENT_ALL = "all"
+    SEGMENT_WISHLIST = "wishlist"
+    SEGMENTS = (
+        (SEGMENT_ALL, "All users"),
+        (SEGMENT_WISHLIST, "Wishlist holders of a product"),
+    )
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_CANCELLED = "cancelled"
+    STATUSES = (
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_CANCELLED, "Cancelled"),
+    )
+
+    # Dedupes repeat triggers, e.g. re-saving a product that is already on sale
+    key = models.CharField(max_length=200, unique=True)
+    title = models.CharField(max_length=150)
+    message = models.CharField(max_length=500, blank=True)
+    link_url = models.CharField(max_length=300, blank=True)
+    level = models.CharField(max_length=12, choices=Notification.LEVELS, default="promo")
+    segment = models.CharField(max_length=20, choices=SEGMENTS, default=SEGMENT_ALL)
+    product = models.ForeignKey("catalog.Product", null=True, blank=True, on_delete=models.SET_NULL)
+    send_email = models.BooleanField(default=False)
+    # Rendered once when the announcement is created, shared by every recipient
+    email_subject = models.CharField(max_length=200, blank=True)
+    email_text = models.TextField(blank=True)
+    email_html = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_RUNNING)
+    # Progress: recipients are walked in user-id order; cursor is the last id done
+    recipients = models.PositiveIntegerField(null=True, blank=True)
+    cursor = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    emailed = models.PositiveIntegerField(default=0)
+    email_failed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"{self.title} -> {self.get_segment_display()}"
+
+    @property
+    def percent(self) -> int:
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.recipients:
+            return 0
+        return min(100, int(self.processed * 100 / self.recipients))
+
+
+class UserSession(models.Model):
+    # django_session keeps the user id inside its encoded data; this indexes it (see accounts.sessions)
+    session_key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sessions")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Session of {self.user_id}"
@@ -1,15 +1,189 @@
+"""Notifications and per-user unread counts.
+
+A user has read a notification when it was created at or before their
+watermark (NotificationWatermark.last_seen_at, moved forward by "clear") or
+when they marked it and left a NotificationRead receipt, so receipts only
+exist for the few notifications newer than the watermark.
+
+The bell's (unread, total) counts are cached per user together with the
+store-wide broadcast sequence they were counted at. ``broadcast`` increments
+that sequence and ``notify_user`` increments the user's counters, so new
+notifications are added to cached counts rather than invalidating them, and
+the bell costs one cache round trip per page. Anything else that changes
+what a user has read (marking, clearing, editing or deleting notifications)
+calls ``invalidate_counts`` and the next page recounts from the database.
+"""
+import logging
+import uuid
+from typing import Iterable, List, Optional, Set, Tuple
+
 from django.contrib.auth.models import User
-from .models import Notification
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
 
+from core.cache import DEFAULT_TIMEOUT
+from .models import Notification, NotificationRead, NotificationWatermark
 
-def broadcast(title: str, message: str = "", link_url: str = "", level: str = "promo") -> Notification:
-    """Create a broadcast notification to all users.
 
-    Use user=None on Notification; unread state is tracked per-user via NotificationRead entries when opened/marked.
-    """
-    return Notification.objects.create(user=None, title=title, message=message, link_url=link_url, level=level)
+logger = logging.getLogger(__name__)
+
+# Store-wide: a generation token (replaced to drop every user's counts) and
+# the number of broadcasts sent within that generation
+_GEN_KEY = "store:notif:gen"
+_SEQ_KEY = "store:notif:seq"
+
+
+def _user_keys(user_id) -> Tuple[str, str, str]:
+    return (
+        f"store:notif:{user_id}:unread",
+        f"store:notif:{user_id}:total",
+        f"store:notif:{user_id}:base",
+    )
+
+
+def _new_generation() -> Tuple[str, int]:
+    gen = uuid.uuid4().hex
+    try:
+        cache.set_many({_GEN_KEY: gen, _SEQ_KEY: 0}, None)
+    except Exception:
+        logger.debug("Cache unavailable starting notification generation", exc_info=True)
+    return gen, 0
+
+
+def visible_to(user):
+    """Active broadcasts plus notifications addressed to ``user``."""
+    return Notification.objects.filter(is_active=True).filter(models.Q(user__isnull=True) | models.Q(user=user))
+
+
+def last_seen(user):
+    return NotificationWatermark.objects.filter(user=user).values_list("last_seen_at", flat=True).first()
+
+
+def _count(user) -> Tuple[int, int]:
+    visible = visible_to(user)
+    seen = last_seen(user)
+    newer = visible.filter(created_at__gt=seen) if seen else visible
+    return newer.exclude(reads__user=user).count(), visible.count()
+
+
+def unread_counts(user) -> Tuple[int, int]:
+    """(unread, total) for the bell; a single get_many when the counts are cached."""
+    unread_key, total_key, base_key = _user_keys(user.pk)
+    try:
+        got = cache.get_many([unread_key, total_key, base_key, _GEN_KEY, _SEQ_KEY])
+    except Exception:
+        logger.debug("Cache unavailable reading notification counts", exc_info=True)
+        return _count(user)
+    gen, seq = got.get(_GEN_KEY), got.get(_SEQ_KEY)
+    if gen is None or seq is None:
+        gen, seq = _new_generation()
+    base = got.get(base_key)
+    if base and base[0] == gen and base[1] <= seq and unread_key in got and total_key in got:
+        sent = seq - base[1]
+        return got[unread_key] + sent, got[total_key] + sent
+    # A broadcast committed between the read above and this count is counted
+    # twice until the entry expires; it is never missed
+    unread, total = _count(user)
+    try:
+        cache.set_many({unread_key: unread, total_key: total, base_key: (gen, seq)}, DEFAULT_TIMEOUT)
+    except Exception:
+        logger.debug("Cache unavailable writing notification counts", exc_info=True)
+    return unread, total
+
+
+def _invalidate_many(user_ids: List[int]) -> None:
+    try:
+        cache.delete_many([k for uid in user_ids for k in _user_keys(uid)])
+    except Exception:
+        logger.debug("Cache unavailable dropping notification counts", exc_info=True)
+
+
+def invalidate_counts(user_id: Optional[int] = None) -> None:
+    """Drop cached counts for one user, or for everyone when user_id is None."""
+    if user_id is None:
+        _new_generation()
+    else:
+        _invalidate_many([user_id])
+
+
+def _count_broadcast() -> None:
+    try:
+        cache.incr(_SEQ_KEY)
+    except ValueError:
+        # Sequence evicted: cached counts can no longer be brought up to date
+        _new_generation()
+    except Exception:
+        logger.debug("Cache unavailable counting broadcast", exc_info=True)
+
+
+def _count_direct(user_id: int) -> None:
+    unread_key, total_key, _ = _user_keys(user_id)
+    try:
+        cache.incr(unread_key)
+        cache.incr(total_key)
+    except ValueError:
+        # Not cached (or half evicted): the next page counts from the database
+        invalidate_counts(user_id)
+    except Exception:
+        logger.debug("Cache unavailable counting notification", exc_info=True)
+
+
+def read_ids(user, notifications: Iterable[Notification]) -> Set[int]:
+    """IDs among ``notifications`` that ``user`` has read."""
+    notifications = list(notifications)
+    seen = last_seen(user) if notifications else None
+    read = {n.id for n in notifications if seen and n.created_at <= seen}
+    pending = [n.id for n in notifications if n.id not in read]
+    if pending:
+        read.update(
+            NotificationRead.objects.filter(user=user, notification_id__in=pending)
+            .values_list("notification_id", flat=True)
+        )
+    return read
+
+
+def mark_read(user, notification: Notification) -> None:
+    seen = last_seen(user)
+    if seen and notification.created_at <= seen:
+        return  # already covered by the watermark
+    NotificationRead.objects.get_or_create(user=user, notification=notification)
+
+
+def mark_all_read(user) -> None:
+    """Move the watermark to now, drop the receipts it covers and delete the user's own notifications."""
+    now = timezone.now()
+    with transaction.atomic():
+        NotificationWatermark.objects.update_or_create(user=user, defaults={"last_seen_at": now})
+        NotificationRead.objects.filter(user=user, notification__created_at__lte=now).delete()
+        Notification.objects.filter(user=user).delete()
+    invalidate_counts(user.pk)
+
+
+def broadcast(title: str, message: str = "", link_url: str = "", level: str = "promo") -> Notification:
+    """Create a broadcast notification to all users (user=None)."""
+    n = Notification(user=None, title=title, message=message, link_url=link_url, level=level)
+    n._counted = True  # core.signals leaves cached counts alone
+    n.save()
+    transaction.on_commit(_count_broadcast)
+    return n
 
 
 def notify_user(user: User, title: str, message: str = "", link_url: str = "", level: str = "info") -> Notification:
-    return Notification.objects.create(user=user, title=title, message=message, link_url=link_url, level=level)
+    n = Notification(user=user, title=title, message=message, link_url=link_url, level=level)
+    n._counted = True
+    n.save()
+    transaction.on_commit(lambda: _count_direct(user.pk))
+    return n
+
 
+def notify_users(user_ids: Iterable[int], title: str, message: str = "", link_url: str = "", level: str = "info") -> int:
+    """Notify many users with one bulk insert; returns the number notified."""
+    user_ids = list(user_ids)
+    Notification.objects.bulk_create(
+        [Notification(user_id=uid, title=title, message=message, link_url=link_url, level=level) for uid in user_ids],
+        batch_size=500,
+    )
+    # bulk_create sends no post_save: drop all their cached counts in one call
+    transaction.on_commit(lambda: _invalidate_many(user_ids))
+    return len(user_ids)
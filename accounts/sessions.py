@@ -0,0 +1,163 @@
+"""User -> session index.
+
+django_session stores the user id only inside each row's encoded data, so
+finding one user's sessions meant decoding every active session. A
+UserSession row is recorded when a user logs in and removed when they log
+out, so ``end_sessions`` deletes exactly that user's sessions, through the
+configured session engine so cache-backed sessions go too. A session keeps
+the key it was indexed under, and UserSessionMiddleware calls ``sync`` to
+move the row when the key is cycled while signed in (e.g. by
+update_session_auth_hash on a password change).
+
+``purge_expired`` deletes expired sessions in batches together with index
+rows whose session no longer exists (``manage.py purge_sessions``, run
+from cron in place of ``clearsessions``). ``backfill`` indexes sessions
+that were opened before the index existed.
+"""
+import logging
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserSession
+
+
+logger = logging.getLogger(__name__)
+
+# Session entry holding the key the session is indexed under
+_INDEXED_KEY = "_indexed_session_key"
+
+
+def _store():
+    return import_module(settings.SESSION_ENGINE).SessionStore
+
+
+def _db_backed() -> bool:
+    # db and cached_db keep every session in django_session
+    return issubclass(_store(), DBStore)
+
+
+def _index(session, user_id) -> None:
+    key = session.session_key
+    previous = session.get(_INDEXED_KEY)
+    try:
+        with transaction.atomic():
+            if previous and previous != key:
+                # The old key's session was deleted when the key was cycled
+                UserSession.objects.filter(session_key=previous).delete()
+            UserSession.objects.update_or_create(session_key=key, defaults={"user_id": user_id})
+        session[_INDEXED_KEY] = key
+    except Exception:
+        # Best effort: a missed row only means sign-out-everywhere skips this session
+        logger.exception("Could not index session for user %s", user_id)
+
+
+def remember(user, session) -> None:
+    if session is None or not session.session_key or user is None or not user.pk:
+        return
+    _index(session, user.pk)
+
+
+def sync(session) -> None:
+    """Re-index a signed-in session whose key changed since it was indexed."""
+    key = session.session_key
+    if not key or session.get(_INDEXED_KEY) == key:
+        return
+    user_id = session.get(SESSION_KEY)
+    if user_id:
+        _index(session, int(user_id))
+
+
+def forget(session) -> None:
+    key = getattr(session, "session_key", None)
+    if key:
+        UserSession.objects.filter(session_key=key).delete()
+
+
+def end_sessions(user) -> int:
+    """Delete every indexed session of ``user``; returns how many."""
+    keys = list(UserSession.objects.filter(user=user).values_list("session_key", flat=True))
+    store = _store()
+    for key in keys:
+        store(session_key=key).delete()
+    UserSession.objects.filter(session_key__in=keys).delete()
+    return len(keys)
+
+
+def purge_expired(batch: int = 5000) -> int:
+    """Delete expired sessions and stale index rows in batches; returns sessions deleted."""
+    deleted = 0
+    if _db_backed():
+        now = timezone.now()
+        while True:
+            keys = list(Session.objects.filter(expire_date__lt=now).values_list("session_key", flat=True)[:batch])
+            if not keys:
+                break
+            Session.objects.filter(session_key__in=keys).delete()
+            UserSession.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+        # Index rows whose session was removed some other way (e.g. clearsessions)
+        while True:
+            stale = list(
+                UserSession.objects.exclude(session_key__in=Session.objects.values("session_key"))
+                .values_list("session_key", flat=True)[:batch]
+            )
+            if not stale:
+                break
+            UserSession.objects.filter(session_key__in=stale).delete()
+        return deleted
+
+    store = _store()
+    try:
+        store.clear_expired()
+    except NotImplementedError:
+        pass  # e.g. the cache backend, where entries expire by themselves
+    last = ""
+    while True:
+        keys = list(
+            UserSession.objects.filter(session_key__gt=last).order_by("session_key")
+            .values_list("session_key", flat=True)[:batch]
+        )
+        if not keys:
+            break
+        probe = store()
+        stale = [k for k in keys if not probe.exists(k)]
+        UserSession.objects.filter(session_key__in=stale).delete()
+        last = keys[-1]
+    return deleted
+
+
+def backfill(batch: int = 2000) -> int:
+    """Index active sessions opened before UserSession existed (database-backed engines only)."""
+    if not _db_backed():
+        return 0
+    indexed = 0
+    sessions = Session.objects.filter(expire_date__gte=timezone.now()).exclude(
+        session_key__in=UserSession.objects.values("session_key")
+    )
+
+    def _save(rows):
+        # Skip sessions of users that have since been deleted
+        live = set(User.objects.filter(pk__in=[r.user_id for r in rows]).values_list("pk", flat=True))
+        return len(UserSession.objects.bulk_create([r for r in rows if r.user_id in live], ignore_conflicts=True))
+
+    rows = []
+    for session in sessions.iterator(chunk_size=batch):
+        try:
+            user_id = session.get_decoded().get("_auth_user_id")
+        except Exception:
+            continue
+        if user_id:
+            rows.append(UserSession(session_key=session.session_key, user_id=int(user_id)))
+        if len(rows) >= batch:
+            indexed += _save(rows)
+            rows = []
+    if rows:
+        indexed += _save(rows)
+    return indexed
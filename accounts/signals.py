@@ -0,0 +1,16 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.dispatch import receiver
+
+from .sessions import forget, remember
+
+
+@receiver(user_logged_in)
+def session_opened(sender, request, user, **kwargs):
+    # login() has already cycled the key, so this is the session's final key
+    remember(user, getattr(request, "session", None))
+
+
+@receiver(user_logged_out)
+def session_closed(sender, request, user, **kwargs):
+    # Sent before the session is flushed, while its key is still known
+    forget(getattr(request, "session", None))
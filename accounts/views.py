@@ -6,10 +6,9 @@ from .models import UserProfile
 from orders.models import Order
 from catalog.models import ProductImage
 from .models import Address
-from django.contrib.sessions.models import Session
-from django.utils import timezone
-from .models import Notification, NotificationRead
-from django.db import models
+from .models import Notification
+from .notifications import mark_all_read, mark_read, read_ids, visible_to
+from .sessions import end_sessions
 from django.http import JsonResponse
 
 
@@ -217,15 +216,8 @@ def address_make_default(request, pk: int):
 def signout_all_sessions(request):
     if request.method != "POST":
         return redirect("profile")
-    uid = str(request.user.pk)
-    # Delete all active sessions for this user (including current)
-    for session in Session.objects.filter(expire_date__gte=timezone.now()):
-        try:
-            data = session.get_decoded()
-        except Exception:
-            continue
-        if str(data.get("_auth_user_id")) == uid:
-            session.delete()
+    # Delete all sessions for this user (including current), found via the UserSession index
+    end_sessions(request.user)
     # Ensure current request is logged out too
     logout(request)
     messages.info(request, "Signed out from all sessions.")
@@ -238,14 +230,7 @@ def delete_account(request):
         return redirect("profile")
     user = request.user
     # Remove sessions for the user
-    uid = str(user.pk)
-    for session in Session.objects.filter(expire_date__gte=timezone.now()):
-        try:
-            data = session.get_decoded()
-        except Exception:
-            continue
-        if str(data.get("_auth_user_id")) == uid:
-            session.delete()
+    end_sessions(user)
 
     # Soft-delete: deactivate and anonymize to preserve orders integrity
     # Clear profile PII if present
@@ -286,11 +271,9 @@ def delete_account(request):
 
 @login_required
 def notifications(request):
-    # Fetch broadcast + user-specific notifications
-    qs = Notification.objects.filter(is_active=True).filter(models.Q(user__isnull=True) | models.Q(user=request.user)).order_by("-created_at")
-    # Determine read set
-    read_ids = set(NotificationRead.objects.filter(user=request.user, notification_id__in=qs.values_list('id', flat=True)).values_list('notification_id', flat=True))
-    return render(request, "accounts/notifications.html", {"notifications": qs, "read_ids": read_ids})
+    # Broadcast + user-specific notifications; read state from the watermark and receipts
+    items = list(visible_to(request.user).order_by("-created_at"))
+    return render(request, "accounts/notifications.html", {"notifications": items, "read_ids": read_ids(request.user, items)})
 
 
 @login_required
@@ -298,8 +281,7 @@ def notification_mark_read(request, pk: int):
     if request.method != "POST":
         return redirect("notifications")
     try:
-        n = Notification.objects.get(pk=pk)
-        NotificationRead.objects.get_or_create(user=request.user, notification=n)
+        mark_read(request.user, Notification.objects.get(pk=pk))
     except Notification.DoesNotExist:
         pass
     return redirect(request.META.get("HTTP_REFERER", "notifications"))
@@ -310,16 +292,8 @@ def notifications_clear(request):
     if request.method != "POST":
         return redirect("notifications")
     try:
-        # All active notifications visible to this user
-        notif_qs = Notification.objects.filter(is_active=True).filter(models.Q(user__isnull=True) | models.Q(user=request.user))
-        ids = list(notif_qs.values_list('id', flat=True))
-        # Mark broadcasts as read for this user (so they disappear)
-        existing = set(NotificationRead.objects.filter(user=request.user, notification_id__in=ids).values_list('notification_id', flat=True))
-        to_create = [NotificationRead(user=request.user, notification_id=nid) for nid in ids if nid not in existing]
-        if to_create:
-            NotificationRead.objects.bulk_create(to_create, ignore_conflicts=True)
-        # Delete user-specific notifications entirely
-        Notification.objects.filter(user=request.user).delete()
+        # One watermark row instead of a receipt per broadcast
+        mark_all_read(request.user)
         messages.success(request, "Notifications cleared")
     except Exception:
         messages.error(request, "Could not clear notifications")
@@ -9,6 +9,6 @@ class CartItemInline(admin.TabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ("user", "updated_at")
+    list_display = ("user", "item_count", "subtotal", "updated_at")
     inlines = [CartItemInline]
 
@@ -5,3 +5,9 @@ class CartConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "cart"
 
+
+    def ready(self):
+        try:
+            from . import signals  # noqa: F401
+        except Exception:
+            pass
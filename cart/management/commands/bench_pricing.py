@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from cart.models import Cart
+from catalog.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure per-click latency of the cart quantity AJAX endpoint (changes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clicks", type=int, default=200, help="Quantity updates to time")
+        parser.add_argument("--items", type=int, default=5, help="Distinct products in the benchmark cart")
+        parser.add_argument("--pin", default="", help="Session delivery pin (enables the shipping estimate)")
+        parser.add_argument("--cold", action="store_true", help="Clear the cache before every click")
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.filter(is_active=True).order_by("id")[: options["items"]])
+        if not products:
+            raise CommandError("No active products; run seed_store first")
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=["*"]):
+                self._run(products, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, products, options):
+        user = get_user_model().objects.create_user(username="bench-pricing", password="x")
+        cart = Cart.objects.create(user=user)
+        items = [cart.items.create(product=p, variant=p.variants.order_by("id").first(), quantity=1) for p in products]
+        http = Client()
+        http.force_login(user)
+        if options["pin"]:
+            session = http.session
+            session["delivery"] = {"postal_code": options["pin"]}
+            session.save()
+        headers = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+        timings, queries = [], []
+        for n in range(options["clicks"]):
+            if options["cold"]:
+                cache.clear()
+            item = items[n % len(items)]
+            # Cycle quantities 1..3 like a shopper stepping the +/- buttons
+            qty = 1 + (n // len(items)) % 3
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                resp = http.post(reverse("update_cart_item", args=[item.id]), {"quantity": qty}, **headers)
+                timings.append((time.perf_counter() - start) * 1000)
+            if resp.status_code != 200:
+                raise CommandError(f"update_cart_item returned {resp.status_code}: {resp.content[:200]!r}")
+            queries.append(len(ctx.captured_queries))
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{len(timings)} clicks over {len(items)} items: "
+            f"mean {statistics.mean(timings):.2f} ms, median {statistics.median(timings):.2f} ms, "
+            f"p95 {p95:.2f} ms, {statistics.mean(queries):.1f} queries/click"
+        )
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:40
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model("cart", "Cart")
+    for cart in Cart.objects.prefetch_related("items__product", "items__variant"):
+        count, subtotal = 0, Decimal("0.00")
+        for it in cart.items.all():
+            v, p = it.variant, it.product
+            unit = next(
+                (x for x in (getattr(v, "sale_price", None), getattr(v, "base_price", None), p.sale_price) if x is not None),
+                p.base_price,
+            )
+            count += it.quantity
+            subtotal += unit * it.quantity
+        Cart.objects.filter(pk=cart.pk).update(item_count=count, subtotal=subtotal)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('catalog', '0013_productimage_color_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
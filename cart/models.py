@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from decimal import Decimal
 from catalog.models import Product, Variant
@@ -7,9 +8,19 @@ from catalog.models import Product, Variant
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="cart")
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized totals, kept current by CartItem.save and cart.signals
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False)
 
-    def subtotal(self) -> Decimal:
-        return sum((item.line_total() for item in self.items.all()), Decimal("0.00"))
+    @staticmethod
+    def add_to_totals(cart_id: int, quantity: int, amount: Decimal) -> None:
+        """Atomically add to a cart's item_count/subtotal (negative values subtract)."""
+        if not quantity and not amount:
+            return
+        Cart.objects.filter(pk=cart_id).update(
+            item_count=F("item_count") + quantity,
+            subtotal=F("subtotal") + amount,
+        )
 
     def __str__(self):
         return f"Cart({self.user})"
@@ -24,6 +35,48 @@ class CartItem(models.Model):
     class Meta:
         unique_together = ("cart", "product", "variant")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = instance._line_key()
+        return instance
+
+    def _line_key(self):
+        return (self.product_id, self.variant_id, self.quantity)
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded", None)
+        with transaction.atomic():
+            if loaded is not None:
+                # Delta from the locked row, not from what this instance read:
+                # a concurrent save in between must not be counted twice
+                loaded = (
+                    CartItem.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("product_id", "variant_id", "quantity")
+                    .first()
+                ) or loaded
+            super().save(*args, **kwargs)
+            if loaded is None:
+                Cart.add_to_totals(self.cart_id, self.quantity, self.line_total())
+            elif loaded[:2] == (self.product_id, self.variant_id):
+                change = self.quantity - loaded[2]
+                if change:
+                    Cart.add_to_totals(self.cart_id, change, self.unit_price() * change)
+            else:
+                # Product or variant swapped: the old unit price is unknown here
+                from .signals import recalculate_carts  # local import: signals import models
+                recalculate_carts([self.cart_id])
+        self._loaded = self._line_key()
+
+    def add_quantity(self, n: int) -> None:
+        """Add ``n`` to a saved line in one UPDATE, so concurrent adds all count."""
+        with transaction.atomic():
+            CartItem.objects.filter(pk=self.pk).update(quantity=F("quantity") + n)
+            Cart.add_to_totals(self.cart_id, n, self.unit_price() * n)
+            self.quantity = CartItem.objects.filter(pk=self.pk).values_list("quantity", flat=True).get()
+        self._loaded = self._line_key()
+
     def unit_price(self) -> Decimal:
         if self.variant and (getattr(self.variant, "sale_price", None) is not None or getattr(self.variant, "base_price", None) is not None):
             return self.variant.price()
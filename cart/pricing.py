@@ -0,0 +1,210 @@
+"""Cart and checkout pricing.
+
+``price_lines`` turns a snapshot of cart lines into an immutable
+PriceBreakdown: subtotal, coupon discount, GST, shipping (Shiprocket estimate
+below the free-shipping threshold, else the flat rate) and total. The cart
+page, its AJAX quantity/remove endpoints and checkout all price through it.
+
+A breakdown is memoized under a key derived from everything it depends on:
+the snapshot's lines (so any change to a quantity, variant or unit price is a
+new key), the applied coupon, the drop pin, the payment mode and the
+packaging version (weights and dimensions, see catalog.packaging). Repeat
+renders and AJAX round trips for an unchanged cart therefore skip the coupon
+arithmetic and shipping estimate entirely.
+"""
+import hashlib
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from catalog.packaging import parcel_for_items
+from core.cache import cached, get_version, versioned_key
+
+
+CENT = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    product_id: int
+    variant_id: Optional[int]
+    quantity: int
+    unit_price: Decimal
+
+    @property
+    def line_total(self) -> Decimal:
+        return self.unit_price * self.quantity
+
+
+@dataclass(frozen=True)
+class CartSnapshot:
+    lines: Tuple[PricedLine, ...]
+
+    @property
+    def item_count(self) -> int:
+        return sum((line.quantity for line in self.lines), 0)
+
+    @property
+    def subtotal(self) -> Decimal:
+        return sum((line.line_total for line in self.lines), Decimal("0.00"))
+
+    def digest(self) -> str:
+        raw = "|".join(
+            f"{l.product_id}:{l.variant_id}:{l.quantity}:{l.unit_price}" for l in self.lines
+        )
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class PriceBreakdown:
+    subtotal: Decimal
+    discount_amount: Decimal
+    discounted_subtotal: Decimal
+    coupon_code: str
+    gst_amount: Decimal
+    shipping: Decimal
+    total: Decimal
+    item_count: int
+
+    def as_json(self) -> dict:
+        """Totals in the string form the cart's AJAX endpoints return."""
+        return {
+            "subtotal": str(self.subtotal),
+            "discount_amount": str(self.discount_amount),
+            "discounted_subtotal": str(self.discounted_subtotal),
+            "gst_amount": str(self.gst_amount),
+            "shipping": str(self.shipping),
+            "total": str(self.total),
+            "cart_count": self.item_count,
+        }
+
+
+def snapshot(lines: Iterable[Tuple[object, object, int, Optional[Decimal]]]) -> CartSnapshot:
+    """Snapshot (product, variant, quantity, unit_price) tuples.
+
+    ``unit_price`` may be None to use the variant price (falling back to the
+    product price), matching CartItem.unit_price.
+    """
+    out = []
+    for product, variant, qty, unit in lines:
+        if unit is None:
+            if variant and (getattr(variant, "sale_price", None) is not None or getattr(variant, "base_price", None) is not None):
+                unit = variant.price()
+            else:
+                unit = product.price()
+        out.append(PricedLine(
+            product_id=product.id,
+            variant_id=(variant.id if variant else None),
+            quantity=int(qty),
+            unit_price=Decimal(unit),
+        ))
+    return CartSnapshot(lines=tuple(out))
+
+
+def snapshot_items(items) -> CartSnapshot:
+    """Snapshot CartItem or SessionCartItem objects."""
+    return snapshot((it.product, it.variant, it.quantity, None) for it in items)
+
+
+def get_coupon(code: Optional[str]):
+    """Coupon for ``code`` (case-insensitive) or None; cached until coupons change."""
+    if not code:
+        return None
+    from coupons.models import Coupon  # local import avoids app load order issues
+
+    def _load():
+        # Cache misses as False so unknown codes don't hit the database each time
+        return Coupon.objects.filter(code__iexact=code).first() or False
+
+    return cached(versioned_key(f"coupon:{code.strip().lower()}", ("coupons", None)), _load) or None
+
+
+def drop_pin_for(request, address=None, postal_code=None) -> Optional[str]:
+    """Delivery pin: the session's chosen pin, else the given address or pin,
+    else the user's default address."""
+    delivery = request.session.get("delivery") or {}
+    pin = str(delivery.get("postal_code") or "").strip()
+    if pin:
+        return pin
+    if address is not None:
+        return address.postal_code or None
+    if postal_code is not None:
+        return str(postal_code).strip() or None
+    user = getattr(request, "user", None)
+    if not (user and user.is_authenticated):
+        return None
+    from accounts.models import Address  # local import avoids app load order issues
+
+    def _load():
+        addresses = Address.objects.filter(user=user)
+        default = addresses.filter(is_default=True).first() or addresses.first()
+        return default.postal_code if default else ""
+
+    return cached(versioned_key("default_pin", ("addresses", user.pk)), _load) or None
+
+
+def _shipping(snap: CartSnapshot, discounted_subtotal: Decimal, drop_pin: Optional[str], cod: bool) -> Decimal:
+    if discounted_subtotal >= Decimal(getattr(settings, "FREE_SHIPPING_THRESHOLD", 399)):
+        return Decimal("0.00")
+    flat = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
+    if not drop_pin:
+        return flat
+    try:
+        from orders.shiprocket import estimate_shipping_charge  # local import: orders imports cart
+
+        parcel = parcel_for_items(snap.lines)
+        est = estimate_shipping_charge(
+            drop_pin=str(drop_pin),
+            units_total=parcel.units or 1,
+            cod=cod,
+            declared_value=discounted_subtotal,
+            total_weight_kg=parcel.weight_kg,
+            dims_cm=parcel.dims_cm,
+        )
+    except Exception:
+        est = None
+    return Decimal(est).quantize(CENT) if est is not None else flat
+
+
+def _compute(snap: CartSnapshot, coupon, drop_pin: Optional[str], cod: bool) -> PriceBreakdown:
+    subtotal = snap.subtotal.quantize(CENT)
+    discount_amount = Decimal("0.00")
+    if coupon is not None:
+        discount_amount = (subtotal * Decimal(coupon.discount_percent) / Decimal("100")).quantize(CENT)
+    discounted_subtotal = (subtotal - discount_amount).quantize(CENT)
+    if discounted_subtotal < 0:
+        discounted_subtotal = Decimal("0.00")
+    gst_rate = Decimal(str(getattr(settings, "GST_RATE", "0.18")))
+    gst_amount = (discounted_subtotal * gst_rate).quantize(CENT)
+    shipping = _shipping(snap, discounted_subtotal, drop_pin, cod)
+    return PriceBreakdown(
+        subtotal=subtotal,
+        discount_amount=discount_amount,
+        discounted_subtotal=discounted_subtotal,
+        coupon_code=(coupon.code if coupon is not None else ""),
+        gst_amount=gst_amount,
+        shipping=shipping,
+        total=(discounted_subtotal + gst_amount + shipping).quantize(CENT),
+        item_count=snap.item_count,
+    )
+
+
+def price_lines(snap: CartSnapshot, coupon_code: Optional[str] = None, drop_pin: Optional[str] = None, cod: bool = False) -> PriceBreakdown:
+    coupon = get_coupon(coupon_code)
+    if coupon is not None and not coupon.is_valid():
+        coupon = None
+    # Everything the result depends on is part of the key
+    parts = (
+        snap.digest(),
+        f"{coupon.code}:{coupon.discount_percent}" if coupon is not None else "",
+        drop_pin or "",
+        int(bool(cod)),
+        get_version("packaging"),
+        getattr(settings, "GST_RATE", "0.18"),
+        getattr(settings, "FREE_SHIPPING_THRESHOLD", 399),
+        getattr(settings, "FLAT_SHIPPING_RATE", 49),
+    )
+    key = "pricing:" + hashlib.sha1(repr(parts).encode()).hexdigest()
+    return cached(key, lambda: _compute(snap, coupon, drop_pin, cod))
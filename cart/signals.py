@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.models import Product, Variant
+from .models import Cart, CartItem
+
+
+def recalculate_carts(cart_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute Cart.item_count/subtotal from the items in one UPDATE.
+
+    Unit prices follow CartItem.unit_price: variant sale/base price, then the
+    product's. Pass cart_ids to limit the refresh; None rebuilds every cart.
+    """
+    unit = Coalesce(
+        "variant__sale_price", "variant__base_price", "product__sale_price", "product__base_price",
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    items = CartItem.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+    line = ExpressionWrapper(F("quantity") * unit, output_field=DecimalField(max_digits=12, decimal_places=2))
+    qs = Cart.objects.all() if cart_ids is None else Cart.objects.filter(pk__in=list(cart_ids))
+    return qs.update(
+        item_count=Coalesce(Subquery(items.annotate(c=Sum("quantity")).values("c")), 0),
+        subtotal=Coalesce(
+            Subquery(items.annotate(s=Sum(line)).values("s")), 0,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_totals(cart_ids: Iterable[int]):
+    """Recount the given carts once on exit instead of after every item deleted inside."""
+    cart_ids = list(cart_ids)
+    outer = getattr(_batch, "active", False)
+    _batch.active = True
+    try:
+        yield
+    finally:
+        _batch.active = outer
+    recalculate_carts(cart_ids)
+
+
+@receiver(post_delete, sender=CartItem)
+def cart_item_deleted(sender, instance: CartItem, **kwargs):
+    # Covers queryset deletes too; a no-op when the whole cart is being deleted
+    if getattr(_batch, "active", False):
+        return
+    loaded = CartItem.product.is_cached(instance) and (not instance.variant_id or CartItem.variant.is_cached(instance))
+    if loaded:
+        Cart.add_to_totals(instance.cart_id, -instance.quantity, -instance.line_total())
+    else:
+        # Items deleted in bulk arrive without product/variant: one recount
+        # beats two lookups per line
+        recalculate_carts([instance.cart_id])
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_save, sender=Product)
+def cart_prices_changed(sender, instance, **kwargs):
+    # Re-price the carts holding this product/variant
+    field = "variant" if sender is Variant else "product"
+    cart_ids = CartItem.objects.filter(**{field: instance}).values_list("cart_id", flat=True).distinct()
+    if cart_ids.exists():
+        recalculate_carts(cart_ids)
@@ -3,7 +3,12 @@ from dataclasses import dataclass
 from decimal import Decimal
 from typing import List, Optional, Dict, Any
 
+from django.db import transaction
+
 from catalog.models import Product, Variant
+from core.cache import bump_version
+from .models import CartItem
+from .signals import recalculate_carts
 
 
 SESSION_KEY = "cart"
@@ -28,7 +33,17 @@ class SessionCartItem:
         return self.unit_price() * self.quantity
 
 
+def _session_lines(request) -> List[Dict[str, Any]]:
+    """Session cart lines for reading; never creates or modifies the session."""
+    cart = request.session.get(SESSION_KEY)
+    if not cart or "items" not in cart:
+        return []
+    return cart["items"]
+
+
 def _get_session_cart(request) -> Dict[str, Any]:
+    # For writers only: storing an empty cart marks the session modified,
+    # which makes SessionMiddleware save it (and set a cookie)
     cart = request.session.get(SESSION_KEY)
     if not cart or "items" not in cart:
         cart = {"items": []}
@@ -50,8 +65,7 @@ def add_session_item(request, product_id: int, variant_id: Optional[int], quanti
 
 
 def update_session_item(request, product_id: int, variant_id: Optional[int], quantity: int):
-    cart = _get_session_cart(request)
-    for it in cart["items"]:
+    for it in _session_lines(request):
         if it.get("product_id") == product_id and it.get("variant_id") == variant_id:
             it["quantity"] = max(1, int(quantity))
             request.session.modified = True
@@ -59,6 +73,8 @@ def update_session_item(request, product_id: int, variant_id: Optional[int], qua
 
 
 def remove_session_item(request, product_id: int, variant_id: Optional[int]):
+    if not _session_lines(request):
+        return
     cart = _get_session_cart(request)
     cart["items"] = [
         it for it in cart["items"] if not (it.get("product_id") == product_id and it.get("variant_id") == variant_id)
@@ -67,30 +83,83 @@ def remove_session_item(request, product_id: int, variant_id: Optional[int]):
 
 
 def clear_session_cart(request):
+    # pop() marks the session modified only when the key was present
     request.session.pop(SESSION_KEY, None)
-    request.session.modified = True
+
+
+def _as_id(value) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, "", "None") else None
+    except (TypeError, ValueError):
+        return None
 
 
 def get_session_items(request) -> List[SessionCartItem]:
+    """Hydrate the session cart in two batched queries (products, variants).
+
+    Lines whose product no longer exists are skipped; a missing variant
+    degrades to a product-only line, matching the per-line lookups this
+    replaced.
+    """
     items: List[SessionCartItem] = []
-    cart = _get_session_cart(request)
-    for it in cart.get("items", []):
-        try:
-            product = Product.objects.get(id=it.get("product_id"))
-        except Product.DoesNotExist:
+    lines = _session_lines(request)
+    if not lines:
+        return items
+    product_ids = {pid for pid in (_as_id(it.get("product_id")) for it in lines) if pid}
+    variant_ids = {vid for vid in (_as_id(it.get("variant_id")) for it in lines) if vid}
+    products = {
+        p.id: p for p in Product.objects.filter(id__in=product_ids).prefetch_related("images", "variants")
+    }
+    variants = {v.id: v for v in Variant.objects.filter(id__in=variant_ids)} if variant_ids else {}
+    for v in variants.values():
+        # Reuse the fetched product so Variant.price() fallbacks don't query again
+        if v.product_id in products:
+            v.product = products[v.product_id]
+    for it in lines:
+        product = products.get(_as_id(it.get("product_id")))
+        if product is None:
             continue
-        variant = None
-        vid = it.get("variant_id")
-        if vid:
-            try:
-                variant = Variant.objects.get(id=vid)
-            except Variant.DoesNotExist:
-                variant = None
+        vid = _as_id(it.get("variant_id"))
+        variant = variants.get(vid) if vid else None
         qty = max(1, int(it.get("quantity", 1)))
         items.append(SessionCartItem(product=product, variant=variant, quantity=qty))
     return items
 
 
+def merge_session_cart(request, cart) -> int:
+    """Move the session cart into ``cart`` (adding to matching lines) and clear it.
+
+    One transaction: matching lines get one bulk_update, new lines one
+    bulk_create, and the cart's totals are recomputed once. Returns the
+    number of session lines merged.
+    """
+    ses_items = get_session_items(request)
+    if not ses_items:
+        return 0
+    with transaction.atomic():
+        existing = {(it.product_id, it.variant_id): it for it in cart.items.select_for_update()}
+        changed: Dict[Any, CartItem] = {}
+        new: Dict[Any, CartItem] = {}
+        for it in ses_items:
+            key = (it.product.id, it.variant.id if it.variant else None)
+            if key in existing:
+                existing[key].quantity += it.quantity
+                changed[key] = existing[key]
+            elif key in new:
+                new[key].quantity += it.quantity
+            else:
+                new[key] = CartItem(cart=cart, product=it.product, variant=it.variant, quantity=it.quantity)
+        if changed:
+            CartItem.objects.bulk_update(list(changed.values()), ["quantity"])
+        if new:
+            CartItem.objects.bulk_create(list(new.values()))
+        # Bulk writes skip CartItem.save and its signals
+        recalculate_carts([cart.pk])
+        transaction.on_commit(lambda: bump_version("cart", cart.user_id))
+    clear_session_cart(request)
+    return len(ses_items)
+
+
 # Coupon helpers
 def set_session_coupon(request, code: str):
     request.session[COUPON_KEY] = {"code": code}
@@ -106,4 +175,3 @@ def get_session_coupon(request) -> Optional[str]:
 
 def clear_session_coupon(request):
     request.session.pop(COUPON_KEY, None)
-    request.session.modified = True
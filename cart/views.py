@@ -1,10 +1,10 @@
 from decimal import Decimal
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
-from django.conf import settings
 from django.http import JsonResponse
 from catalog.models import Product, Variant, WishlistItem
 from .models import Cart, CartItem
+from .pricing import drop_pin_for, get_coupon, price_lines, snapshot, snapshot_items
 from .utils import (
     add_session_item,
     get_session_items,
@@ -15,8 +15,6 @@ from .utils import (
     clear_session_coupon,
 )
 from coupons.models import Coupon
-from accounts.models import Address
-from orders.shiprocket import estimate_shipping_charge
 
 
 def _get_user_cart(user):
@@ -24,6 +22,15 @@ def _get_user_cart(user):
     return cart
 
 
+def _cart_prices(request):
+    """Price the current cart (database cart for members, session cart for guests)."""
+    if request.user.is_authenticated and hasattr(request.user, "cart"):
+        items = request.user.cart.items.select_related("product", "variant")
+    else:
+        items = get_session_items(request)
+    return price_lines(snapshot_items(items), coupon_code=get_session_coupon(request), drop_pin=drop_pin_for(request))
+
+
 def view_cart(request):
     is_auth = request.user.is_authenticated
     # Local helper to pick a thumbnail URL for a product, optionally color-aware
@@ -63,7 +70,6 @@ def view_cart(request):
                 "size_options": size_options,
                 "thumb_url": _thumb_for(it.product, color),
             })
-        subtotal = cart.subtotal()
     else:
         ses_items = get_session_items(request)
         cart_items = []
@@ -83,96 +89,9 @@ def view_cart(request):
                 "size_options": size_options,
                 "thumb_url": _thumb_for(it.product, color),
             })
-        subtotal = sum((it["line_total"] for it in cart_items), Decimal("0.00"))
-    # Coupon application
     coupon_code = get_session_coupon(request)
-    coupon = None
-    discount_amount = Decimal("0.00")
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code__iexact=coupon_code)
-            if coupon.is_valid():
-                discount_amount = (subtotal * Decimal(coupon.discount_percent) / Decimal("100")).quantize(Decimal("0.01"))
-            else:
-                coupon = None
-        except Coupon.DoesNotExist:
-            coupon = None
-
-    discounted_subtotal = (subtotal - discount_amount).quantize(Decimal("0.01"))
-    if discounted_subtotal < 0:
-        discounted_subtotal = Decimal("0.00")
-
-    gst_rate = Decimal(str(getattr(settings, "GST_RATE", "0.18")))
-    gst_amount = (discounted_subtotal * gst_rate).quantize(Decimal("0.01"))
-    # Dynamic shipping estimate using session delivery pin (if set) or default address; fallback to flat/free
-    shipping = Decimal("0.00")
-    if discounted_subtotal >= Decimal(getattr(settings, "FREE_SHIPPING_THRESHOLD", 399)):
-        shipping = Decimal("0.00")
-    else:
-        ship_estimate = None
-        try:
-            delivery = request.session.get("delivery") or {}
-            drop_pin = (str(delivery.get("postal_code") or "").strip() or None)
-            if not drop_pin and request.user.is_authenticated:
-                addresses = Address.objects.filter(user=request.user)
-                default_address = addresses.filter(is_default=True).first() or addresses.first()
-                drop_pin = default_address.postal_code if default_address else None
-            if drop_pin:
-                # Compute total weight and dims from cart items (db for auth, session list for guests)
-                total_w = Decimal("0.00")
-                max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
-                max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
-                max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
-                if request.user.is_authenticated and hasattr(request.user, "cart"):
-                    items_iter = request.user.cart.items.select_related("product", "variant")
-                else:
-                    # Build a light-weight iterable from current view cart_items
-                    class _Wrap: pass
-                    items_iter = []
-                    for c in cart_items:
-                        w = _Wrap()
-                        w.product = c["product"]
-                        w.variant = c["variant"]
-                        w.quantity = c["quantity"]
-                        items_iter.append(w)
-                for it in items_iter:
-                    if it.variant and getattr(it.variant, "weight_kg", None):
-                        w = Decimal(str(it.variant.weight_kg))
-                    elif getattr(it.product, "weight_kg", None):
-                        w = Decimal(str(it.product.weight_kg))
-                    else:
-                        w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
-                    total_w += (w * Decimal(it.quantity))
-                    lv = (getattr(it.variant, "length_cm", None) if it.variant else None) or getattr(it.product, "length_cm", None)
-                    bv = (getattr(it.variant, "breadth_cm", None) if it.variant else None) or getattr(it.product, "breadth_cm", None)
-                    hv = (getattr(it.variant, "height_cm", None) if it.variant else None) or getattr(it.product, "height_cm", None)
-                    if lv:
-                        try: max_l = max(max_l, int(lv))
-                        except Exception: pass
-                    if bv:
-                        try: max_b = max(max_b, int(bv))
-                        except Exception: pass
-                    if hv:
-                        try: max_h = max(max_h, int(hv))
-                        except Exception: pass
-                units_total = sum((c["quantity"] for c in cart_items), 0)
-                est = estimate_shipping_charge(
-                    drop_pin=str(drop_pin),
-                    units_total=units_total or 1,
-                    cod=False,
-                    declared_value=discounted_subtotal,
-                    total_weight_kg=total_w,
-                    dims_cm=(max_l, max_b, max_h),
-                )
-                ship_estimate = est
-        except Exception:
-            ship_estimate = None
-        if ship_estimate is not None:
-            shipping = ship_estimate.quantize(Decimal("0.01"))
-        else:
-            flat = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
-            shipping = flat
-    total = (discounted_subtotal + gst_amount + shipping).quantize(Decimal("0.01"))
+    snap = snapshot((c["product"], c["variant"], c["quantity"], c["unit_price"]) for c in cart_items)
+    prices = price_lines(snap, coupon_code=coupon_code, drop_pin=drop_pin_for(request))
 
     # Saved for later (wishlist) items for authenticated users
     saved_items = []
@@ -204,14 +123,14 @@ def view_cart(request):
         "cart/view_cart.html",
         {
             "cart_items": cart_items,
-            "subtotal": subtotal,
-            "discount_amount": discount_amount,
-            "discounted_subtotal": discounted_subtotal,
-            "coupon": coupon,
+            "subtotal": prices.subtotal,
+            "discount_amount": prices.discount_amount,
+            "discounted_subtotal": prices.discounted_subtotal,
+            "coupon": (get_coupon(prices.coupon_code) if prices.coupon_code else None),
             "coupon_code": coupon_code,
-            "gst_amount": gst_amount,
-            "shipping": shipping,
-            "total": total,
+            "gst_amount": prices.gst_amount,
+            "shipping": prices.shipping,
+            "total": prices.total,
             "saved_items": saved_items,
         },
     )
@@ -250,7 +169,7 @@ def add_to_cart(request, product_id):
     # Enforce stock availability for variants
     if variant:
         try:
-            available = int(getattr(variant, "stock", 0) or 0)
+            available = variant.available_stock()
             # Include any existing quantity of this variant in cart
             existing_qty = 0
             if request.user.is_authenticated:
@@ -263,9 +182,8 @@ def add_to_cart(request, product_id):
             else:
                 # Check session cart
                 try:
-                    from .utils import _get_session_cart
-                    sesi = _get_session_cart(request)
-                    for it in sesi.get("items", []):
+                    from .utils import _session_lines
+                    for it in _session_lines(request):
                         if it.get("product_id") == product.id and it.get("variant_id") == variant.id:
                             existing_qty = int(it.get("quantity", 0) or 0)
                             break
@@ -304,12 +222,9 @@ def add_to_cart(request, product_id):
     # Regular add to cart
     if request.user.is_authenticated:
         cart = _get_user_cart(request.user)
-        item, created = CartItem.objects.get_or_create(cart=cart, product=product, variant=variant)
+        item, created = CartItem.objects.get_or_create(cart=cart, product=product, variant=variant, defaults={"quantity": qty})
         if not created:
-            item.quantity += qty
-        else:
-            item.quantity = qty
-        item.save()
+            item.add_quantity(qty)
     else:
         add_session_item(request, product.id, variant.id if variant else None, qty)
     # Remember last picked variant for this product (to reuse when moving from saved)
@@ -324,8 +239,8 @@ def add_to_cart(request, product_id):
     # Build quick response
     def _cart_count():
         try:
-            if request.user.is_authenticated and hasattr(request.user, "cart"):
-                return sum((it.quantity for it in request.user.cart.items.all()), 0)
+            if request.user.is_authenticated:
+                return Cart.objects.filter(user=request.user).values_list("item_count", flat=True).first() or 0
             else:
                 ses_items = get_session_items(request)
                 return sum((it.quantity for it in ses_items), 0)
@@ -350,10 +265,10 @@ def update_cart_item(request, item_id):
             item = CartItem.objects.get(id=item_id, cart__user=request.user)
             # Stock check for variant
             var = getattr(item, "variant", None)
-            if var and qty > int(getattr(var, "stock", 0) or 0):
+            if var and qty > var.available_stock():
                 msg = "There are not enough items in stock."
                 if is_ajax:
-                    return JsonResponse({"ok": False, "error": "out_of_stock", "message": msg, "available": int(getattr(var, 'stock', 0) or 0)}, status=400)
+                    return JsonResponse({"ok": False, "error": "out_of_stock", "message": msg, "available": var.available_stock()}, status=400)
                 messages.error(request, msg)
                 return redirect("view_cart")
             item.quantity = qty
@@ -375,10 +290,10 @@ def update_cart_item(request, item_id):
                 from catalog.models import Variant
                 try:
                     vobj = Variant.objects.get(id=vid)
-                    if qty > int(getattr(vobj, "stock", 0) or 0):
+                    if qty > vobj.available_stock():
                         msg = "There are not enough items in stock."
                         if is_ajax:
-                            return JsonResponse({"ok": False, "error": "out_of_stock", "message": msg, "available": int(getattr(vobj, 'stock', 0) or 0)}, status=400)
+                            return JsonResponse({"ok": False, "error": "out_of_stock", "message": msg, "available": vobj.available_stock()}, status=400)
                         messages.error(request, msg)
                         return redirect("view_cart")
                 except Variant.DoesNotExist:
@@ -398,10 +313,10 @@ def update_cart_item(request, item_id):
             from catalog.models import Variant
             try:
                 vobj = Variant.objects.get(id=vid)
-                if qty > int(getattr(vobj, "stock", 0) or 0):
+                if qty > vobj.available_stock():
                     msg = "There are not enough items in stock."
                     if is_ajax:
-                        return JsonResponse({"ok": False, "error": "out_of_stock", "message": msg, "available": int(getattr(vobj, 'stock', 0) or 0)}, status=400)
+                        return JsonResponse({"ok": False, "error": "out_of_stock", "message": msg, "available": vobj.available_stock()}, status=400)
                     messages.error(request, msg)
                     return redirect("view_cart")
             except Variant.DoesNotExist:
@@ -413,108 +328,8 @@ def update_cart_item(request, item_id):
         line_total = unit * qty
         resp.update({"pid": pid, "vid": vid, "item_total": str(line_total.quantize(Decimal("0.01")))})
 
-    # Compute cart totals & count
-    gst_rate = Decimal(str(getattr(settings, "GST_RATE", "0.18")))
-    flat = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
-
-    if request.user.is_authenticated and hasattr(request.user, "cart"):
-        cart = request.user.cart
-        subtotal = cart.subtotal()
-        cart_count = sum((it.quantity for it in cart.items.all()), 0)
-    else:
-        ses_items = get_session_items(request)
-        subtotal = sum((it.line_total() for it in ses_items), Decimal("0.00"))
-        cart_count = sum((it.quantity for it in ses_items), 0)
-
-    # Coupon application (mirror logic from view_cart)
-    coupon_code = get_session_coupon(request)
-    discount_amount = Decimal("0.00")
-    if coupon_code:
-        try:
-            c = Coupon.objects.get(code__iexact=coupon_code)
-            if c.is_valid():
-                discount_amount = (subtotal * Decimal(c.discount_percent) / Decimal("100")).quantize(Decimal("0.01"))
-        except Coupon.DoesNotExist:
-            pass
-
-    discounted_subtotal = (subtotal - discount_amount).quantize(Decimal("0.01"))
-    if discounted_subtotal < 0:
-        discounted_subtotal = Decimal("0.00")
-
-    gst_amount = (discounted_subtotal * gst_rate).quantize(Decimal("0.01"))
-    # Try dynamic estimate using session delivery pin or user's default address
-    if discounted_subtotal >= Decimal(getattr(settings, "FREE_SHIPPING_THRESHOLD", 399)):
-        shipping = Decimal("0.00")
-    else:
-        ship_estimate = None
-        try:
-            delivery = request.session.get("delivery") or {}
-            drop_pin = (str(delivery.get("postal_code") or "").strip() or None)
-            if not drop_pin and request.user.is_authenticated:
-                addresses = Address.objects.filter(user=request.user)
-                default_address = addresses.filter(is_default=True).first() or addresses.first()
-                drop_pin = default_address.postal_code if default_address else None
-            if drop_pin:
-                total_w = Decimal("0.00")
-                max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
-                max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
-                max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
-                if request.user.is_authenticated and hasattr(request.user, "cart"):
-                    items_iter = request.user.cart.items.select_related("product", "variant")
-                else:
-                    items_iter = get_session_items(request)
-                units_total = 0
-                for it in items_iter:
-                    qty = getattr(it, 'quantity', 0) or 0
-                    units_total += int(qty)
-                    var = getattr(it, 'variant', None)
-                    prod = getattr(it, 'product', None)
-                    if var and getattr(var, "weight_kg", None):
-                        w = Decimal(str(var.weight_kg))
-                    elif prod and getattr(prod, "weight_kg", None):
-                        w = Decimal(str(prod.weight_kg))
-                    else:
-                        w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
-                    total_w += (w * Decimal(qty))
-                    lv = (getattr(var, "length_cm", None) if var else None) or (getattr(prod, "length_cm", None) if prod else None)
-                    bv = (getattr(var, "breadth_cm", None) if var else None) or (getattr(prod, "breadth_cm", None) if prod else None)
-                    hv = (getattr(var, "height_cm", None) if var else None) or (getattr(prod, "height_cm", None) if prod else None)
-                    if lv:
-                        try: max_l = max(max_l, int(lv))
-                        except Exception: pass
-                    if bv:
-                        try: max_b = max(max_b, int(bv))
-                        except Exception: pass
-                    if hv:
-                        try: max_h = max(max_h, int(hv))
-                        except Exception: pass
-                est = estimate_shipping_charge(
-                    drop_pin=str(drop_pin),
-                    units_total=units_total or 1,
-                    cod=False,
-                    declared_value=discounted_subtotal,
-                    total_weight_kg=total_w,
-                    dims_cm=(max_l, max_b, max_h),
-                )
-                ship_estimate = est
-        except Exception:
-            ship_estimate = None
-
-        if ship_estimate is not None:
-            shipping = Decimal(ship_estimate).quantize(Decimal("0.01"))
-        else:
-            shipping = flat
-    total = (discounted_subtotal + gst_amount + shipping).quantize(Decimal("0.01"))
-
-    resp.update({
-        "subtotal": str(subtotal),
-        "discount_amount": str(discount_amount),
-        "discounted_subtotal": str(discounted_subtotal),
-        "gst_amount": str(gst_amount),
-        "shipping": str(shipping),
-        "total": str(total),
-        "cart_count": cart_count,
-    })
+    # Cart totals & count
+    resp.update(_cart_prices(request).as_json())
 
     if is_ajax:
         return JsonResponse(resp)
@@ -548,7 +363,7 @@ def update_cart_variant(request, item_id):
         existing = CartItem.objects.filter(cart=item.cart, product=product, variant=new_variant).first()
         # Determine target quantity with clamp/reset-to-1 rule if new stock is lower than current qty
         try:
-            new_stock = int(getattr(new_variant, "stock", 0) or 0)
+            new_stock = new_variant.available_stock()
         except Exception:
             new_stock = 0
         qty_current = int(getattr(item, "quantity", 1) or 1)
@@ -592,7 +407,7 @@ def update_cart_variant(request, item_id):
             qty = it.quantity
             break
     try:
-        new_stock = int(getattr(new_variant, "stock", 0) or 0)
+        new_stock = new_variant.available_stock()
     except Exception:
         new_stock = 0
     # Clamp to new stock instead of resetting to 1
@@ -620,105 +435,8 @@ def remove_cart_item(request, item_id):
     else:
         remove_session_item_session(request, pid, vid)
 
-    # Compute updated totals and count
-    gst_rate = Decimal(str(getattr(settings, "GST_RATE", "0.18")))
-    flat = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
-    if request.user.is_authenticated and hasattr(request.user, "cart"):
-        cart = request.user.cart
-        subtotal = cart.subtotal()
-        cart_count = sum((it.quantity for it in cart.items.all()), 0)
-    else:
-        ses_items = get_session_items(request)
-        subtotal = sum((it.line_total() for it in ses_items), Decimal("0.00"))
-        cart_count = sum((it.quantity for it in ses_items), 0)
-    # Coupon + discounted subtotal
-    coupon_code = get_session_coupon(request)
-    discount_amount = Decimal("0.00")
-    if coupon_code:
-        try:
-            c = Coupon.objects.get(code__iexact=coupon_code)
-            if c.is_valid():
-                discount_amount = (subtotal * Decimal(c.discount_percent) / Decimal("100")).quantize(Decimal("0.01"))
-        except Coupon.DoesNotExist:
-            pass
-    discounted_subtotal = (subtotal - discount_amount).quantize(Decimal("0.01"))
-    if discounted_subtotal < 0:
-        discounted_subtotal = Decimal("0.00")
-    gst_amount = (discounted_subtotal * gst_rate).quantize(Decimal("0.01"))
-    # Dynamic estimate using session delivery pin or default address
-    if discounted_subtotal >= Decimal(getattr(settings, "FREE_SHIPPING_THRESHOLD", 399)):
-        shipping = Decimal("0.00")
-    else:
-        ship_estimate = None
-        try:
-            delivery = request.session.get("delivery") or {}
-            drop_pin = (str(delivery.get("postal_code") or "").strip() or None)
-            if not drop_pin and request.user.is_authenticated and hasattr(request.user, "cart"):
-                addresses = Address.objects.filter(user=request.user)
-                default_address = addresses.filter(is_default=True).first() or addresses.first()
-                drop_pin = default_address.postal_code if default_address else None
-            if drop_pin:
-                total_w = Decimal("0.00")
-                max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
-                max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
-                max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
-                items_iter = None
-                if request.user.is_authenticated and hasattr(request.user, "cart"):
-                    items_iter = request.user.cart.items.select_related("product", "variant")
-                else:
-                    items_iter = get_session_items(request)
-                units_total = 0
-                for it in items_iter:
-                    qty = getattr(it, 'quantity', 0) or 0
-                    units_total += int(qty)
-                    var = getattr(it, 'variant', None)
-                    prod = getattr(it, 'product', None)
-                    if var and getattr(var, "weight_kg", None):
-                        w = Decimal(str(var.weight_kg))
-                    elif prod and getattr(prod, "weight_kg", None):
-                        w = Decimal(str(prod.weight_kg))
-                    else:
-                        w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
-                    total_w += (w * Decimal(qty))
-                    lv = (getattr(var, "length_cm", None) if var else None) or (getattr(prod, "length_cm", None) if prod else None)
-                    bv = (getattr(var, "breadth_cm", None) if var else None) or (getattr(prod, "breadth_cm", None) if prod else None)
-                    hv = (getattr(var, "height_cm", None) if var else None) or (getattr(prod, "height_cm", None) if prod else None)
-                    if lv:
-                        try: max_l = max(max_l, int(lv))
-                        except Exception: pass
-                    if bv:
-                        try: max_b = max(max_b, int(bv))
-                        except Exception: pass
-                    if hv:
-                        try: max_h = max(max_h, int(hv))
-                        except Exception: pass
-                est = estimate_shipping_charge(
-                    drop_pin=str(drop_pin),
-                    units_total=units_total or 1,
-                    cod=False,
-                    declared_value=discounted_subtotal,
-                    total_weight_kg=total_w,
-                    dims_cm=(max_l, max_b, max_h),
-                )
-                ship_estimate = est
-        except Exception:
-            ship_estimate = None
-        shipping = ship_estimate.quantize(Decimal("0.01")) if ship_estimate is not None else flat
-    total = (discounted_subtotal + gst_amount + shipping).quantize(Decimal("0.01"))
-
     if is_ajax:
-        return JsonResponse({
-            "ok": True,
-            "pid": pid,
-            "vid": vid,
-            "subtotal": str(subtotal),
-            "discount_amount": str(discount_amount),
-            "discounted_subtotal": str(discounted_subtotal),
-            "gst_amount": str(gst_amount),
-            "shipping": str(shipping),
-            "total": str(total),
-            "cart_count": cart_count,
-        })
+        return JsonResponse({"ok": True, "pid": pid, "vid": vid, **_cart_prices(request).as_json()})
 
     messages.info(request, "Removed item from cart")
     return redirect("view_cart")
@@ -797,10 +515,7 @@ def move_saved_to_cart(request, product_id: int):
     cart = _get_user_cart(request.user)
     item, created = CartItem.objects.get_or_create(cart=cart, product=product, variant=(variant if product.variants.exists() else None))
     if not created:
-        item.quantity += 1
-    else:
-        item.quantity = 1
-    item.save()
+        item.add_quantity(1)
     messages.success(request, "Moved to cart")
     return redirect("view_cart")
 
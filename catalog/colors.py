@@ -0,0 +1,259 @@
+"""Color search engine for image-based product search.
+
+Each ProductImage stores a small color signature, its dominant colors as
+``[[r, g, b, weight], ...]``, computed once at save time (see
+ProductImage.save and the ``compute_color_signatures`` command). An uploaded
+query image goes through the same extraction, and ``nearest_products`` ranks
+products by distance between the two signatures in CIE Lab space. The
+in-process index over all signatures is rebuilt when the "colors" cache
+version is bumped by the ProductImage signals in catalog.signals.
+
+Extraction: the image is downscaled, pixels close to the border color
+(usually a studio background) are dropped, and a coarse color histogram
+seeds a few k-means iterations in Lab space.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional at import time; extraction is then disabled
+    np = None
+
+from core.cache import DEFAULT_TIMEOUT, get_version
+
+
+logger = logging.getLogger(__name__)
+
+# sRGB reference values for Variant.COLOR_CHOICES ("Multi" has no single color)
+PALETTE_RGB: Dict[str, Tuple[int, int, int]] = {
+    "Black": (20, 20, 22),
+    "White": (245, 245, 245),
+    "Grey": (128, 128, 128),
+    "Red": (200, 30, 45),
+    "Blue": (40, 90, 200),
+    "Navy Blue": (25, 35, 80),
+    "Green": (40, 140, 60),
+    "Olive": (110, 110, 50),
+    "Yellow": (240, 210, 50),
+    "Orange": (240, 130, 30),
+    "Pink": (240, 140, 180),
+    "Purple": (110, 50, 150),
+    "Brown": (110, 70, 40),
+    "Maroon": (110, 20, 35),
+    "Beige": (215, 195, 160),
+    "Cream": (245, 235, 205),
+    "Teal": (0, 128, 128),
+    "Sky Blue": (135, 200, 235),
+    "Lavender": (190, 170, 225),
+}
+
+SAMPLE_SIZE = 96          # longest side of the downscaled image
+MAX_CLUSTERS = 3          # dominant colors kept per image
+MIN_WEIGHT = 0.08         # clusters smaller than this share are dropped
+BACKGROUND_DELTA = 18.0   # Lab distance from the border color treated as background
+MATCH_DISTANCE = 30.0     # signature distance above which images don't match
+KMEANS_ITERATIONS = 8
+
+# sRGB (D65) -> XYZ, and the D65 white point
+_RGB_TO_XYZ = (
+    (0.4124, 0.3576, 0.1805),
+    (0.2126, 0.7152, 0.0722),
+    (0.0193, 0.1192, 0.9505),
+)
+_WHITE = (0.95047, 1.0, 1.08883)
+
+
+def available() -> bool:
+    return np is not None
+
+
+def rgb_to_lab(rgb):
+    """Convert an (..., 3) array of 0-255 sRGB values to CIE Lab."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array(_RGB_TO_XYZ).T / np.array(_WHITE)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    return np.stack(
+        [116.0 * f[..., 1] - 16.0, 500.0 * (f[..., 0] - f[..., 1]), 200.0 * (f[..., 1] - f[..., 2])],
+        axis=-1,
+    )
+
+
+_palette_lab = None
+
+
+def _palette():
+    global _palette_lab
+    if _palette_lab is None:
+        names = list(PALETTE_RGB)
+        _palette_lab = (names, rgb_to_lab(np.array([PALETTE_RGB[n] for n in names])))
+    return _palette_lab
+
+
+def _foreground_mask(lab):
+    """Mask over the pixels of lab (H, W, 3) that differ from the border color."""
+    border = np.concatenate([lab[0], lab[-1], lab[:, 0], lab[:, -1]])
+    bg = np.median(border, axis=0)
+    keep = np.linalg.norm(lab.reshape(-1, 3) - bg, axis=1) > BACKGROUND_DELTA
+    # A mostly uniform image (e.g. a plain swatch) is its own foreground
+    if keep.sum() < 0.1 * keep.size:
+        keep[:] = True
+    return keep
+
+
+def extract_signature(fp) -> List[List[float]]:
+    """Dominant colors of an image file as [[r, g, b, weight], ...], heaviest first."""
+    if np is None:
+        return []
+    img = Image.open(fp)
+    img.draft("RGB", (SAMPLE_SIZE, SAMPLE_SIZE))
+    img = img.convert("RGB")
+    img.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+    rgb = np.asarray(img, dtype=np.float64)
+    if rgb.size == 0:
+        return []
+    lab_img = rgb_to_lab(rgb)
+    keep = _foreground_mask(lab_img)
+    lab = lab_img.reshape(-1, 3)[keep]
+    rgb_px = rgb.reshape(-1, 3)[keep]
+
+    # Seed k-means from the most populated cells of a 4x4x4 RGB histogram
+    q = (rgb_px // 64).astype(np.int64)
+    cells = q[:, 0] * 16 + q[:, 1] * 4 + q[:, 2]
+    counts = np.bincount(cells, minlength=64)
+    seeds = [c for c in np.argsort(counts)[::-1][:MAX_CLUSTERS + 1] if counts[c]]
+    centers = np.array([lab[cells == c].mean(axis=0) for c in seeds])
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.argmin(((lab[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+        moved = np.array([lab[labels == k].mean(axis=0) if (labels == k).any() else centers[k] for k in range(len(centers))])
+        if np.allclose(moved, centers, atol=0.5):
+            break
+        centers = moved
+
+    weights = np.bincount(labels, minlength=len(centers)) / float(len(lab))
+    out = []
+    for k in np.argsort(weights)[::-1][:MAX_CLUSTERS]:
+        if weights[k] < MIN_WEIGHT:
+            continue
+        r, g, b = rgb_px[labels == k].mean(axis=0)
+        out.append([int(round(r)), int(round(g)), int(round(b)), round(float(weights[k]), 3)])
+    return out
+
+
+def nearest_palette_color(signature: Sequence[Sequence[float]]) -> str:
+    """Palette name closest to the heaviest color of a signature ("" if empty)."""
+    if np is None or not signature:
+        return ""
+    names, palette = _palette()
+    lab = rgb_to_lab(np.array(signature[0][:3], dtype=np.float64))
+    return names[int(np.argmin(np.linalg.norm(palette - lab, axis=1)))]
+
+
+def signature_for_file(field_file) -> List[List[float]]:
+    """Signature for an ImageField value, uploaded or already in storage."""
+    if np is None or not field_file:
+        return []
+    try:
+        f = field_file.file if not getattr(field_file, "_committed", True) else None
+        if f is not None:
+            pos = f.tell() if hasattr(f, "tell") else 0
+            f.seek(0)
+            try:
+                return extract_signature(f)
+            finally:
+                # Leave the upload where storage expects to read it from
+                f.seek(pos)
+        with field_file.storage.open(field_file.name, "rb") as fh:
+            return extract_signature(fh)
+    except Exception:
+        logger.warning("Could not extract color signature for %s", getattr(field_file, "name", ""), exc_info=True)
+        return []
+
+
+class ColorIndex:
+    """Nearest-neighbour lookup over stored ProductImage signatures.
+
+    All cluster centers live in one (M, 3) Lab array ordered by image, with
+    images ordered by product, so a query is one distance matrix plus two
+    ``minimum.reduceat`` passes (best cluster per image, best image per
+    product). Rebuilt lazily when the "colors" cache version changes, and at
+    least every STORE_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._built_at = 0.0
+        self._centers = None        # (M, 3) Lab
+        self._image_starts = None   # first center of each image
+        self._product_starts = None  # first image of each product
+        self._product_ids = None    # product id per product slot
+
+    def _ensure_fresh(self):
+        version = get_version("colors")
+        if self._version == version and time.time() - self._built_at < DEFAULT_TIMEOUT:
+            return
+        with self._lock:
+            if self._version == version and time.time() - self._built_at < DEFAULT_TIMEOUT:
+                return
+            self._build()
+            self._version = version
+            self._built_at = time.time()
+
+    def _build(self):
+        from .models import ProductImage  # local import: models import this module
+
+        rows = (
+            ProductImage.objects.filter(product__is_active=True)
+            .exclude(color_signature=[])
+            .order_by("product_id", "id")
+            .values_list("product_id", "color_signature")
+        )
+        centers, image_starts, product_starts, product_ids = [], [], [], []
+        for pid, signature in rows.iterator():
+            if not signature:
+                continue
+            if not product_ids or product_ids[-1] != pid:
+                product_ids.append(pid)
+                product_starts.append(len(image_starts))
+            image_starts.append(len(centers))
+            centers.extend(c[:3] for c in signature)
+        if centers:
+            self._centers = rgb_to_lab(np.array(centers, dtype=np.float64))
+        else:
+            self._centers = np.empty((0, 3))
+        self._image_starts = np.array(image_starts, dtype=np.intp)
+        self._product_starts = np.array(product_starts, dtype=np.intp)
+        self._product_ids = np.array(product_ids, dtype=np.int64)
+
+    def nearest_products(self, signature, limit: int = 200, max_distance: float = MATCH_DISTANCE) -> List[int]:
+        """Product ids whose images best match signature, closest first."""
+        if np is None or not signature:
+            return []
+        self._ensure_fresh()
+        centers = self._centers
+        if centers is None or not len(centers):
+            return []
+        query = np.array(signature, dtype=np.float64)
+        q_lab = rgb_to_lab(query[:, :3])
+        q_w = query[:, 3] / query[:, 3].sum()
+        dist = np.linalg.norm(q_lab[:, None, :] - centers[None, :, :], axis=2)   # (k, M)
+        per_image = np.minimum.reduceat(dist, self._image_starts, axis=1)        # (k, images)
+        image_score = q_w @ per_image                                            # (images,)
+        product_score = np.minimum.reduceat(image_score, self._product_starts)   # (products,)
+        order = np.argsort(product_score, kind="stable")
+        order = order[product_score[order] <= max_distance][:limit]
+        return [int(pid) for pid in self._product_ids[order]]
+
+
+_index = ColorIndex()
+
+
+def nearest_products(signature, limit: int = 200) -> List[int]:
+    return _index.nearest_products(signature, limit=limit)
@@ -0,0 +1,63 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Variant
+from catalog.packaging import parcel_for, table
+
+
+def _per_line_loop(lines):
+    # The per-call fallback loop parcel_for replaced, for comparison
+    total_w = Decimal("0.00")
+    max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
+    max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
+    max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
+    for prod, var, qty in lines:
+        if var and getattr(var, "weight_kg", None):
+            w = Decimal(str(var.weight_kg))
+        elif getattr(prod, "weight_kg", None):
+            w = Decimal(str(prod.weight_kg))
+        else:
+            w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
+        total_w += w * Decimal(qty)
+        lv = (getattr(var, "length_cm", None) if var else None) or getattr(prod, "length_cm", None)
+        bv = (getattr(var, "breadth_cm", None) if var else None) or getattr(prod, "breadth_cm", None)
+        hv = (getattr(var, "height_cm", None) if var else None) or getattr(prod, "height_cm", None)
+        if lv:
+            max_l = max(max_l, int(lv))
+        if bv:
+            max_b = max(max_b, int(bv))
+        if hv:
+            max_h = max(max_h, int(hv))
+    return total_w, (max_l, max_b, max_h)
+
+
+class Command(BaseCommand):
+    help = "Microbenchmark parcel weight/dimension computation (read-only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=20, help="Lines per parcel")
+        parser.add_argument("--number", type=int, default=2000, help="Parcels computed per timing")
+
+    def handle(self, *args, **options):
+        variants = list(Variant.objects.select_related("product")[:500])
+        if not variants:
+            raise CommandError("No variants; run seed_store first")
+        rng = random.Random(7)
+        picks = [rng.choice(variants) for _ in range(options["lines"])]
+        objects = [(v.product, v, rng.randint(1, 3)) for v in picks]
+        ids = [(p.id, v.id, qty) for p, v, qty in objects]
+
+        table.unit(None)  # build the table outside the timings
+        legacy_w, legacy_dims = _per_line_loop(objects)
+        parcel = parcel_for(ids)
+        if (parcel.weight_kg, parcel.dims_cm) != (legacy_w, legacy_dims):
+            raise CommandError(f"Mismatch: {parcel} vs {(legacy_w, legacy_dims)}")
+
+        number = options["number"]
+        for label, fn in (("per-line loop", lambda: _per_line_loop(objects)), ("parcel_for", lambda: parcel_for(ids))):
+            best = min(timeit.repeat(fn, number=number, repeat=5))
+            self.stdout.write(f"{label}: {best / number * 1e6:.1f} us per {len(ids)}-line parcel")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from catalog.colors import available, nearest_palette_color, signature_for_file
+from catalog.models import ProductImage
+from core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = "Compute color signatures for product images used by image search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Recompute images that already have a signature")
+
+    def handle(self, *args, **options):
+        if not available():
+            self.stderr.write(self.style.ERROR("numpy is not installed; cannot compute color signatures"))
+            return
+        qs = ProductImage.objects.all().order_by("id")
+        if not options["all"]:
+            qs = qs.filter(color_signature=[])
+        done = 0
+        for img in qs.iterator():
+            signature = signature_for_file(img.image)
+            # queryset update: one index rebuild at the end instead of one per image
+            ProductImage.objects.filter(pk=img.pk).update(
+                color_signature=signature, dominant_color=nearest_palette_color(signature)
+            )
+            done += 1
+        bump_version("colors")
+        self.stdout.write(self.style.SUCCESS(f"Computed color signatures for {done} images"))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2025-11-02 10:15
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    Review = apps.get_model("reviews", "Review")
+    ReviewMedia = apps.get_model("reviews", "ReviewMedia")
+    ratings = {
+        row["product_id"]: row
+        for row in Review.objects.values("product_id").annotate(s=Sum("rating"), c=Count("id"))
+    }
+    media = dict(
+        ReviewMedia.objects.values("review__product_id").annotate(c=Count("id")).values_list("review__product_id", "c")
+    )
+    for pid in set(ratings) | set(media):
+        row = ratings.get(pid) or {}
+        Product.objects.filter(pk=pid).update(
+            rating_sum=row.get("s") or 0,
+            rating_count=row.get("c") or 0,
+            media_count=media.get(pid, 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_merge_20251101_0253'),
+        ('reviews', '0002_reviewmedia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='media_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:35
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX = django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='catalog_product_search_gin')
+
+
+def add_index(apps, schema_editor):
+    # GIN exists only on PostgreSQL; elsewhere the column stays NULL and unindexed
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("catalog", "Product"), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("catalog", "Product"), INDEX)
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import Value
+
+    Category = apps.get_model("catalog", "Category")
+    Product = apps.get_model("catalog", "Product")
+    for category_id, name in Category.objects.values_list("pk", "name"):
+        Product.objects.filter(category_id=category_id).update(
+            search_vector=SearchVector("name", weight="A")
+            + SearchVector(Value(name), weight="B")
+            + SearchVector("description", weight="C")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_variant_reserved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='product', index=INDEX)],
+            database_operations=[migrations.RunPython(add_index, remove_index)],
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
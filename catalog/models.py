@@ -1,9 +1,26 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
 from decimal import Decimal
 
 
+def _without_counters(instance, counters, kwargs):
+    """Save kwargs that leave ``counters`` out of an ordinary save of an existing row.
+
+    The counters are only changed by queryset UPDATEs (F()/subquery), so a
+    full save would write back whatever the instance loaded and erase any
+    change made since.
+    """
+    if instance._state.adding or kwargs.get("force_insert") or kwargs.get("update_fields") is not None:
+        return kwargs
+    kwargs["update_fields"] = [
+        f.name for f in instance._meta.concrete_fields if not f.primary_key and f.name not in counters
+    ]
+    return kwargs
+
+
 class Category(models.Model):
     name = models.CharField(max_length=120, unique=True)
     slug = models.SlugField(max_length=140, unique=True, blank=True)
@@ -39,15 +56,36 @@ class Product(models.Model):
     length_cm = models.PositiveIntegerField(null=True, blank=True, help_text="Package length in cm")
     breadth_cm = models.PositiveIntegerField(null=True, blank=True, help_text="Package breadth in cm")
     height_cm = models.PositiveIntegerField(null=True, blank=True, help_text="Package height in cm")
+    # Denormalized review aggregates, maintained by reviews.signals
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    media_count = models.PositiveIntegerField(default=0, editable=False)
+    # Weighted tsvector of name, category and description for catalog.search's
+    # Postgres backend, written by catalog.signals (always NULL elsewhere)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    COUNTERS = ("rating_sum", "rating_count", "media_count")
+
+    class Meta:
+        indexes = [GinIndex(fields=["search_vector"], name="catalog_product_search_gin")]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        # search_vector is also only written by UPDATE
+        super().save(*args, **_without_counters(self, self.COUNTERS + ("search_vector",), kwargs))
 
     def price(self) -> Decimal:
         return self.sale_price if self.sale_price is not None else self.base_price
 
+    @property
+    def avg_rating(self) -> float:
+        return (self.rating_sum / self.rating_count) if self.rating_count else 0.0
+
+    @property
+    def review_count(self) -> int:
+        return self.rating_count
+
     def __str__(self):
         return self.name
 
@@ -59,10 +97,24 @@ class ProductImage(models.Model):
     is_primary = models.BooleanField(default=False)
     # Optional: assign this image to a specific variant color (e.g., "Black")
     color = models.CharField(max_length=30, blank=True)
+    # Dominant colors [[r, g, b, weight], ...] for image search (catalog.colors)
+    color_signature = models.JSONField(default=list, blank=True, editable=False)
+    dominant_color = models.CharField(max_length=30, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.name}"
 
+    def save(self, *args, **kwargs):
+        # Extract once per new/replaced file rather than per search request
+        if self.image and (not self.color_signature or not getattr(self.image, "_committed", True)):
+            from .colors import nearest_palette_color, signature_for_file
+            self.color_signature = signature_for_file(self.image)
+            self.dominant_color = nearest_palette_color(self.color_signature)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"color_signature", "dominant_color"}
+        super().save(*args, **kwargs)
+
 
 class Variant(models.Model):
     SIZE_CHOICES = [
@@ -100,6 +152,8 @@ class Variant(models.Model):
     color = models.CharField(max_length=30)
     sku = models.CharField(max_length=50, unique=True)
     stock = models.PositiveIntegerField(default=0)
+    # Units held by unpaid/unpacked orders (orders.inventory); sellable = stock - reserved
+    reserved = models.PositiveIntegerField(default=0, editable=False)
     # Retail pricing at variant level (optional; falls back to product when blank)
     base_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
@@ -114,9 +168,18 @@ class Variant(models.Model):
     class Meta:
         unique_together = ("product", "size", "color")
 
+    COUNTERS = ("reserved",)
+
     def __str__(self):
         return f"{self.product.name} - {self.size} / {self.color}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **_without_counters(self, self.COUNTERS, kwargs))
+
+    def available_stock(self) -> int:
+        """Units that can still be sold (on hand minus reservations)."""
+        return max(0, int(self.stock or 0) - int(self.reserved or 0))
+
     def price(self) -> Decimal:
         """Variant retail price with fallback to product price when unset."""
         if self.sale_price is not None:
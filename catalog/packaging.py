@@ -0,0 +1,141 @@
+"""Parcel weight and dimensions for shipping quotes and shipments.
+
+Effective per-unit shipping attributes (variant value, else the product's)
+are precomputed for every variant and product into an in-process table,
+rebuilt when the "packaging" cache version is bumped by the Product/Variant
+signals in catalog.signals. Weights are kept in whole grams, so computing a
+parcel is a single integer pass over (product id, variant id, quantity)
+lines with no queries and no Decimal conversions.
+
+A parcel weighs the sum of its units (a unit without a weight counts as
+SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG) and measures the largest length, breadth
+and height among its units, never less than the SHIPROCKET_DEFAULT_DIM_*
+box.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from core.cache import DEFAULT_TIMEOUT, get_version
+
+
+# (grams, length, breadth, height) per unit; 0 means "not set"
+Unit = Tuple[int, int, int, int]
+
+_GRAMS = Decimal("1000")
+
+
+@dataclass(frozen=True)
+class Parcel:
+    weight_kg: Decimal
+    dims_cm: Tuple[int, int, int]
+    units: int
+
+
+def _grams(kg) -> int:
+    return int((Decimal(kg) * _GRAMS).to_integral_value()) if kg else 0
+
+
+def _cm(value) -> int:
+    try:
+        return int(value) if value else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def unit_attributes(product_attrs, variant_attrs=None) -> Unit:
+    """Effective (grams, l, b, h) from (weight_kg, l, b, h) tuples, variant first."""
+    v = variant_attrs or (None, None, None, None)
+    return (
+        _grams(v[0] or product_attrs[0]),
+        _cm(v[1] or product_attrs[1]),
+        _cm(v[2] or product_attrs[2]),
+        _cm(v[3] or product_attrs[3]),
+    )
+
+
+def _defaults() -> Unit:
+    return (
+        _grams(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5))),
+        int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20)),
+        int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15)),
+        int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2)),
+    )
+
+
+class PackagingTable:
+    """Per-unit shipping attributes for every variant and product."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._built_at = 0.0
+        self._variants: Dict[int, Unit] = {}
+        self._products: Dict[int, Unit] = {}
+
+    def _ensure_fresh(self):
+        version = get_version("packaging")
+        if self._version == version and time.time() - self._built_at < DEFAULT_TIMEOUT:
+            return
+        with self._lock:
+            if self._version == version and time.time() - self._built_at < DEFAULT_TIMEOUT:
+                return
+            self._build()
+            self._version = version
+            self._built_at = time.time()
+
+    def _build(self):
+        from .models import Product, Variant  # local import: catalog.models loads before this is used
+
+        fields = ("weight_kg", "length_cm", "breadth_cm", "height_cm")
+        products = {}
+        for row in Product.objects.values_list("pk", *fields).iterator():
+            products[row[0]] = row[1:]
+        variants = {}
+        for row in Variant.objects.values_list("pk", "product_id", *fields).iterator():
+            variants[row[0]] = unit_attributes(products.get(row[1], (None,) * 4), row[2:])
+        self._products = {pk: unit_attributes(attrs) for pk, attrs in products.items()}
+        self._variants = variants
+
+    def unit(self, product_id: Optional[int], variant_id: Optional[int] = None) -> Unit:
+        self._ensure_fresh()
+        if variant_id and variant_id in self._variants:
+            return self._variants[variant_id]
+        return self._products.get(product_id, (0, 0, 0, 0))
+
+    def parcel(self, lines: Iterable[Tuple[Optional[int], Optional[int], int]]) -> Parcel:
+        """Parcel for (product id, variant id or None, quantity) lines."""
+        self._ensure_fresh()
+        variants, products = self._variants, self._products
+        default_grams, max_l, max_b, max_h = _defaults()
+        grams = units = 0
+        for product_id, variant_id, qty in lines:
+            unit = variants.get(variant_id) if variant_id else None
+            if unit is None:
+                unit = products.get(product_id, (0, 0, 0, 0))
+            g, l, b, h = unit
+            grams += (g or default_grams) * qty
+            units += qty
+            if l > max_l:
+                max_l = l
+            if b > max_b:
+                max_b = b
+            if h > max_h:
+                max_h = h
+        return Parcel(weight_kg=Decimal(grams) / _GRAMS, dims_cm=(max_l, max_b, max_h), units=units)
+
+
+table = PackagingTable()
+
+
+def parcel_for(lines: Iterable[Tuple[Optional[int], Optional[int], int]]) -> Parcel:
+    return table.parcel(lines)
+
+
+def parcel_for_items(items) -> Parcel:
+    """Parcel for objects with product_id/variant_id/quantity (CartItem, OrderItem)."""
+    return table.parcel((it.product_id, it.variant_id, int(it.quantity)) for it in items)
@@ -0,0 +1,314 @@
+"""Product search backends.
+
+``get_backend()`` returns the backend named by the CATALOG_SEARCH_BACKEND
+setting: "memory" (in-process inverted index), "postgres" (tsvector full-text
+search) or "auto", which picks Postgres when the default database is
+PostgreSQL and the inverted index otherwise. Backends return a SearchResult
+of ranked product ids plus category/color facets; catalog.views.search
+paginates it. The index is kept in sync by the Product/Variant/Category
+signals in catalog.signals, which bump the "search" cache version and, on
+PostgreSQL, recompute the stored Product.search_vector the Postgres backend
+queries through its GIN index (``update_search_vectors``).
+"""
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Value
+
+from core.cache import DEFAULT_TIMEOUT, get_version
+from .models import Category, Product, Variant
+
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+MAX_RESULTS = 1000
+
+# Field weights used by both backends
+W_NAME = 3.0
+W_CATEGORY = 2.0
+W_COLOR = 2.0
+W_DESCRIPTION = 1.0
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+@dataclass
+class SearchResult:
+    ids: List[int] = field(default_factory=list)
+    # [(slug, name, count)] and [(color, count)] over the query matches
+    category_facets: List[Tuple[str, str, int]] = field(default_factory=list)
+    color_facets: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return len(self.ids)
+
+
+def _within_edits(a: str, b: str, limit: int) -> bool:
+    """True if Levenshtein(a, b) <= limit (banded, early exit)."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            row_min = min(row_min, cur[j])
+        if row_min > limit:
+            return False
+        prev = cur
+    return prev[-1] <= limit
+
+
+def _typo_budget(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+class InvertedIndexBackend:
+    """In-process inverted index over active products.
+
+    Rebuilt lazily when the "search" cache version changes, and at least every
+    STORE_CACHE_TIMEOUT seconds so workers without a shared cache converge.
+    Matching is per term: exact, then prefix, then within a small edit
+    distance; all query terms must match (falling back to any term).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._built_at = 0.0
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._vocab: List[str] = []
+        self._meta: Dict[int, Tuple[str, str, Tuple[str, ...], int]] = {}
+
+    # Index maintenance
+
+    def _ensure_fresh(self):
+        version = get_version("search")
+        if self._version == version and time.time() - self._built_at < DEFAULT_TIMEOUT:
+            return
+        with self._lock:
+            if self._version == version and time.time() - self._built_at < DEFAULT_TIMEOUT:
+                return
+            self._build()
+            self._version = version
+            self._built_at = time.time()
+
+    def _build(self):
+        postings: Dict[str, Dict[int, float]] = {}
+        meta = {}
+        colors: Dict[int, Set[str]] = {}
+        for pid, color in Variant.objects.filter(product__is_active=True).values_list("product_id", "color"):
+            if color:
+                colors.setdefault(pid, set()).add(color.strip())
+        products = (
+            Product.objects.filter(is_active=True)
+            .select_related("category")
+            .only("id", "name", "description", "created_at", "category__name", "category__slug")
+            .order_by("-created_at")
+        )
+        for recency, p in enumerate(products):
+            pcolors = tuple(sorted(colors.get(p.id, ())))
+            meta[p.id] = (p.category.slug, p.category.name, pcolors, recency)
+            for text, weight in (
+                (p.name, W_NAME),
+                (p.category.name, W_CATEGORY),
+                (" ".join(pcolors), W_COLOR),
+                (p.description, W_DESCRIPTION),
+            ):
+                for tok in tokenize(text):
+                    bucket = postings.setdefault(tok, {})
+                    bucket[p.id] = bucket.get(p.id, 0.0) + weight
+        self._postings = postings
+        self._vocab = sorted(postings)
+        self._meta = meta
+
+    # Query
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Index terms matching a query term, with a match-quality factor."""
+        out = []
+        if term in self._postings:
+            out.append((term, 1.0))
+        i = bisect.bisect_left(self._vocab, term)
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            if self._vocab[i] != term:
+                out.append((self._vocab[i], 0.7))
+            i += 1
+        budget = _typo_budget(term)
+        if not out and budget:
+            for cand in self._vocab:
+                if cand[0] == term[0] and _within_edits(term, cand, budget):
+                    out.append((cand, 0.5))
+        return out
+
+    def search(self, query: str, category: str = "", color: str = "") -> SearchResult:
+        self._ensure_fresh()
+        terms = tokenize(query)
+        if not terms:
+            return SearchResult()
+        n_docs = max(1, len(self._meta))
+        per_term: List[Dict[int, float]] = []
+        for term in terms:
+            scores: Dict[int, float] = {}
+            for cand, quality in self._expand(term):
+                bucket = self._postings[cand]
+                idf = math.log(1.0 + n_docs / len(bucket))
+                for pid, weight in bucket.items():
+                    scores[pid] = max(scores.get(pid, 0.0), weight * idf * quality)
+            per_term.append(scores)
+        matched = set.intersection(*(set(s) for s in per_term)) if per_term else set()
+        if not matched:
+            matched = set().union(*(set(s) for s in per_term))
+        totals = {pid: sum(s.get(pid, 0.0) for s in per_term) for pid in matched}
+
+        cat_counts: Dict[Tuple[str, str], int] = {}
+        color_counts: Dict[str, int] = {}
+        for pid in matched:
+            slug, name, pcolors, _ = self._meta[pid]
+            cat_counts[(slug, name)] = cat_counts.get((slug, name), 0) + 1
+            for c in pcolors:
+                color_counts[c] = color_counts.get(c, 0) + 1
+
+        wanted_color = color.strip().lower()
+        ids = [
+            pid for pid in matched
+            if (not category or self._meta[pid][0] == category)
+            and (not wanted_color or wanted_color in (c.lower() for c in self._meta[pid][2]))
+        ]
+        ids.sort(key=lambda pid: (-totals[pid], self._meta[pid][3]))
+        return SearchResult(
+            ids=ids[:MAX_RESULTS],
+            category_facets=sorted(((s, n, c) for (s, n), c in cat_counts.items()), key=lambda f: (-f[2], f[1])),
+            color_facets=sorted(color_counts.items(), key=lambda f: (-f[1], f[0])),
+        )
+
+
+def _vector(category_name: str):
+    from django.contrib.postgres.search import SearchVector
+
+    # The category name is passed as a value: UPDATE cannot follow a join
+    return (
+        SearchVector("name", weight="A")
+        + SearchVector(Value(category_name), weight="B")
+        + SearchVector("description", weight="C")
+    )
+
+
+def update_search_vectors(products) -> int:
+    """Recompute the stored search_vector of a Product queryset (PostgreSQL only); returns rows updated."""
+    if connection.vendor != "postgresql":
+        return 0
+    updated = 0
+    for category_id, name in Category.objects.filter(pk__in=products.values("category_id")).values_list("pk", "name"):
+        updated += products.filter(category_id=category_id).update(search_vector=_vector(name))
+    return updated
+
+
+class PostgresBackend:
+    """Full-text search with Postgres tsvector/tsquery.
+
+    Queries the stored, GIN-indexed Product.search_vector, so matching does
+    not build a vector per row. Terms are prefix-matched (``term:*``); when
+    nothing matches, falls back to trigram word similarity for typo
+    tolerance if the pg_trgm extension is installed.
+    """
+
+    def _base(self):
+        return Product.objects.filter(is_active=True)
+
+    def _facets(self, ids):
+        from django.db.models import Count
+        cats = (
+            Product.objects.filter(id__in=ids)
+            .values("category__slug", "category__name")
+            .annotate(n=Count("id"))
+            .order_by("-n", "category__name")
+        )
+        colors = (
+            Variant.objects.filter(product_id__in=ids)
+            .exclude(color="")
+            .values("color")
+            .annotate(n=Count("product", distinct=True))
+            .order_by("-n", "color")
+        )
+        return (
+            [(r["category__slug"], r["category__name"], r["n"]) for r in cats],
+            [(r["color"], r["n"]) for r in colors],
+        )
+
+    def search(self, query: str, category: str = "", color: str = "") -> SearchResult:
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        terms = tokenize(query)
+        if not terms:
+            return SearchResult()
+        tsquery = SearchQuery(" & ".join(f"{t}:*" for t in terms), search_type="raw")
+        qs = (
+            self._base()
+            .filter(search_vector=tsquery)
+            .annotate(rank=SearchRank(F("search_vector"), tsquery))
+            .order_by("-rank", "-created_at")
+        )
+        matched = list(qs.values_list("id", flat=True)[:MAX_RESULTS])
+        if not matched:
+            matched = self._fuzzy(query)
+        cat_facets, color_facets = self._facets(matched)
+        ids = matched
+        if category or color:
+            filtered = Product.objects.filter(id__in=matched)
+            if category:
+                filtered = filtered.filter(category__slug=category)
+            if color:
+                filtered = filtered.filter(variants__color__iexact=color)
+            keep = set(filtered.values_list("id", flat=True))
+            ids = [pid for pid in matched if pid in keep]
+        return SearchResult(ids=ids, category_facets=cat_facets, color_facets=color_facets)
+
+    def _fuzzy(self, query: str) -> List[int]:
+        try:
+            from django.contrib.postgres.search import TrigramWordSimilarity
+            return list(
+                self._base()
+                .annotate(sim=TrigramWordSimilarity(query, "name"))
+                .filter(sim__gte=0.3)
+                .order_by("-sim", "-created_at")
+                .values_list("id", flat=True)[:MAX_RESULTS]
+            )
+        except Exception:
+            logger.debug("Trigram search unavailable (is pg_trgm installed?)", exc_info=True)
+            return []
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, "CATALOG_SEARCH_BACKEND", "auto")
+                if name == "auto":
+                    name = "postgres" if connection.vendor == "postgresql" else "memory"
+                _backend = PostgresBackend() if name == "postgres" else InvertedIndexBackend()
+    return _backend
+
+
+def search_products(query: str, category: str = "", color: str = "") -> SearchResult:
+    return get_backend().search(query, category=category, color=color)
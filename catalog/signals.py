@@ -1,22 +1,76 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Product
-from accounts.notifications import broadcast
+from .models import Category, Product, ProductImage, Variant
+from .search import update_search_vectors
+from core.cache import bump_version
+from accounts.announcements import announce
+from accounts.models import Announcement
 
 
 @receiver(post_save, sender=Product)
 def product_notify(sender, instance: Product, created: bool, **kwargs):
     try:
+        # Keyed announcements: re-saving a product never repeats a notice
         if created and instance.notify_users:
             title = f"New arrival: {instance.name}"
             link = f"/product/{instance.slug}/"
-            broadcast(title=title, message="Check it out before it sells out!", link_url=link, level="promo")
+            announce(f"product-new:{instance.pk}", title, "Check it out before it sells out!", link)
         elif not created and instance.notify_users and instance.sale_price is not None:
+            # Sale notices go to the shoppers who saved the product
             title = f"On sale: {instance.name}"
             link = f"/product/{instance.slug}/"
-            broadcast(title=title, message="Limited time offer.", link_url=link, level="promo")
+            announce(
+                f"product-sale:{instance.pk}:{instance.sale_price}",
+                title,
+                "Limited time offer.",
+                link,
+                segment=Announcement.SEGMENT_WISHLIST,
+                product=instance,
+            )
     except Exception:
         # Fail silently; notifications shouldn't break product saving
         pass
 
+
+
+@receiver([post_save, post_delete], sender=Variant)
+@receiver([post_save, post_delete], sender=ProductImage)
+def product_matrix_changed(sender, instance, **kwargs):
+    # Invalidate the cached variant matrix (catalog.variants)
+    bump_version("product", instance.product_id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Variant)
+@receiver([post_save, post_delete], sender=Category)
+def search_index_changed(sender, instance, **kwargs):
+    # Names, descriptions, colors and category labels feed catalog.search
+    bump_version("search")
+
+
+@receiver(post_save, sender=Product)
+def product_search_vector(sender, instance: Product, update_fields=None, **kwargs):
+    if update_fields is not None and not {"name", "category", "description"} & set(update_fields):
+        return  # e.g. review counters: nothing searchable changed
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def category_search_vector(sender, instance: Category, **kwargs):
+    # The category name is part of every one of its products' vectors
+    update_search_vectors(instance.products.all())
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver(post_save, sender=Product)
+def color_index_changed(sender, instance, **kwargs):
+    # Signatures and product visibility feed catalog.colors
+    bump_version("colors")
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Variant)
+def packaging_changed(sender, instance, **kwargs):
+    # Weights and dimensions feed catalog.packaging
+    bump_version("packaging")
@@ -0,0 +1,73 @@
+"""Per-product variant matrix used by the product page.
+
+Everything the size/color selector needs is derived from one pass over the
+product's variants (plus one query for color thumbnails) and cached under a
+version bumped by the Variant/ProductImage signals in catalog.signals (and by
+orders.inventory when reservations change sellable stock).
+"""
+from typing import Any, Dict
+
+from django.db.models import F
+
+from core.cache import cached, versioned_key
+from .models import Product, ProductImage, Variant
+
+
+SIZE_ORDER = ["M", "L", "XL", "XXL"]
+COLOR_ORDER = ["Red", "Black", "Navy Blue", "White", "Grey"]
+
+
+def _ordered(values, order):
+    return sorted(set(values), key=lambda v: (order.index(v) if v in order else 999, v))
+
+
+def build_variant_matrix(product_id: int) -> Dict[str, Any]:
+    rows = list(
+        Variant.objects.filter(product_id=product_id)
+        .annotate(sellable=F("stock") - F("reserved"))
+        .values_list("size", "color", "sellable", "sale_price", "base_price")
+    )
+    sizes = _ordered((r[0] for r in rows), SIZE_ORDER)
+    colors = _ordered((r[1] for r in rows), COLOR_ORDER)
+
+    color_sizes: Dict[str, set] = {}
+    stock: Dict[str, Dict[str, int]] = {}
+    prices: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for size, color, qty, sale, base in rows:
+        if color and size:
+            color_sizes.setdefault(color, set()).add(size)
+        c = (color or "").strip()
+        s = (size or "").strip()
+        if not c or not s:
+            continue
+        stock.setdefault(c, {})[s] = max(0, int(qty or 0))
+        prices.setdefault(c, {})[s] = {
+            "sale": (str(sale) if sale is not None else None),
+            "base": (str(base) if base is not None else None),
+        }
+
+    # color -> first image url (in upload order)
+    color_thumbs: Dict[str, str] = {}
+    for img in ProductImage.objects.filter(product_id=product_id).exclude(color="").order_by("id"):
+        if img.color not in color_thumbs:
+            try:
+                color_thumbs[img.color] = img.image.url if img.image else ""
+            except Exception:
+                color_thumbs[img.color] = ""
+
+    return {
+        "sizes": sizes,
+        "colors": colors,
+        # sizes within each color follow the global size order
+        "color_sizes": {c: [s for s in sizes if s in szs] for c, szs in color_sizes.items()},
+        "stock": stock,
+        "prices": prices,
+        "color_thumbs": color_thumbs,
+    }
+
+
+def get_variant_matrix(product: Product) -> Dict[str, Any]:
+    return cached(
+        versioned_key("variant_matrix", ("product", product.pk)),
+        lambda: build_variant_matrix(product.pk),
+    )
@@ -2,24 +2,22 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from .models import Product, Category, WishlistItem
+from .variants import get_variant_matrix
+from .search import search_products
+from .colors import extract_signature, nearest_palette_color, nearest_products
+from django.core.paginator import Paginator
 try:
     from core.models import Banner
 except Exception:
     Banner = None
-from django.db.models import Q, F, DecimalField, ExpressionWrapper, Avg, Count
+from django.db.models import F, DecimalField, ExpressionWrapper, FloatField
 from reviews.models import ReviewMedia
 import json
-from PIL import Image
-import io
 
 
 
 def home(request):
-    products = (
-        Product.objects.filter(is_active=True)
-        .annotate(avg_rating=Avg("reviews__rating"), review_count=Count("reviews"))
-        .order_by("-created_at")[:12]
-    )
+    products = Product.objects.filter(is_active=True).order_by("-created_at")[:12]
     categories = Category.objects.all()
     banners = []
     wishlist_ids = []
@@ -103,116 +101,51 @@ def product_detail(request, slug):
     if request.user.is_authenticated:
         wishlist = WishlistItem.objects.filter(user=request.user).values_list("product_id", flat=True)
 
-    # Build distinct, well-ordered size and color lists for the selector
-    sizes = []
-    colors = []
-    if product.variants.exists():
-        size_order = ["M", "L", "XL", "XXL"]
-        color_order = ["Red", "Black", "Navy Blue", "White", "Grey"]
-        raw_sizes = product.variants.values_list("size", flat=True).distinct()
-        raw_colors = product.variants.values_list("color", flat=True).distinct()
-        sizes = sorted(set(raw_sizes), key=lambda s: (size_order.index(s) if s in size_order else 999, s))
-        colors = sorted(set(raw_colors), key=lambda c: (color_order.index(c) if c in color_order else 999, c))
+    # Sizes, colors, stock and prices come from the cached variant matrix
+    matrix = get_variant_matrix(product)
+    sizes = matrix["sizes"]
+    colors = matrix["colors"]
 
     videos = product.videos.all()
     images = product.images.all()
-    # Build color -> first image thumb mapping and color options list
-    color_first_img = {}
-    try:
-        for img in images:
-            c = getattr(img, "color", "") or ""
-            if c and c not in color_first_img:
-                color_first_img[c] = img.image.url if getattr(img.image, "url", None) else ""
-    except Exception:
-        color_first_img = {}
     color_options = [
-        {"name": c, "thumb": color_first_img.get(c, "")}
+        {"name": c, "thumb": matrix["color_thumbs"].get(c, "")}
         for c in colors
     ]
-    # Build color -> allowed sizes map for UI filtering
-    c2s = {}
-    try:
-        for v in product.variants.all():
-            if not v.color or not v.size:
-                continue
-            c2s.setdefault(v.color, set()).add(v.size)
-    except Exception:
-        c2s = {}
-    # Order sizes within each color based on sizes order
-    def _order_sizes(szs):
-        order = {s: i for i, s in enumerate(sizes)}
-        return [s for s in sizes if s in szs]
-    color_size_map = {c: _order_sizes(szs) for c, szs in c2s.items()}
-
-    # Build nested stock map: color -> size -> stock
-    stock_map = {}
-    try:
-        for v in product.variants.all():
-            c = (v.color or "").strip()
-            s = (v.size or "").strip()
-            if not c or not s:
-                continue
-            stock_map.setdefault(c, {})[s] = int(getattr(v, "stock", 0) or 0)
-    except Exception:
-        stock_map = {}
-
-    # Build variant price map: color -> size -> {sale, base}
-    price_map = {}
-    try:
-        for v in product.variants.all():
-            c = (v.color or "").strip()
-            s = (v.size or "").strip()
-            if not c or not s:
-                continue
-            sale = getattr(v, "sale_price", None)
-            base = getattr(v, "base_price", None)
-            price_map.setdefault(c, {})[s] = {
-                "sale": (str(sale) if sale is not None else None),
-                "base": (str(base) if base is not None else None),
-            }
-    except Exception:
-        price_map = {}
-    # Ratings & Reviews summary
-    try:
-        stats = product.reviews.aggregate(avg_rating=Avg("rating"), rating_count=Count("id"))
-        avg_rating = float(stats.get("avg_rating") or 0.0)
-        # one decimal place for display
-        avg_rating_disp = round(avg_rating + 1e-8, 1)
-        rating_count = int(stats.get("rating_count") or 0)
-        review_count = rating_count
-    except Exception:
-        avg_rating_disp = 0.0
-        rating_count = 0
-        review_count = 0
+    color_size_map = matrix["color_sizes"]
+    stock_map = matrix["stock"]
+    price_map = matrix["prices"]
+    # Ratings & Reviews summary (denormalized on Product by reviews.signals)
+    avg_rating_disp = round(float(product.avg_rating) + 1e-8, 1)
+    rating_count = product.rating_count
+    review_count = rating_count
 
     # Recent review media (images/videos)
     recent_media = list(ReviewMedia.objects.filter(review__product=product).order_by("-created_at")[0:4])
-    total_media_count = ReviewMedia.objects.filter(review__product=product).count()
-    remaining_media = max(0, total_media_count - len(recent_media))
+    remaining_media = max(0, product.media_count - len(recent_media))
 
     # Latest review and preview list of all reviews (product-wide, not variant-specific)
     review_qs = product.reviews.select_related("user").prefetch_related("media").order_by("-created_at")
     latest_review = review_qs.first()
     reviews_preview = list(review_qs[:10])
 
-    # Similar products from same category
+    # Similar products from same category, ranked on the stored aggregates (no reviews join)
+    rating_avg = ExpressionWrapper(F("rating_sum") * 1.0 / F("rating_count"), output_field=FloatField())
     similar_qs = (
-        Product.objects.filter(is_active=True, category=product.category)
+        Product.objects.filter(is_active=True, category=product.category, rating_count__gt=0)
         .exclude(id=product.id)
-        .annotate(avg_rating=Avg("reviews__rating"), review_count=Count("reviews"))
-        .filter(review_count__gt=0)
+        .alias(rating_avg=rating_avg)
         .prefetch_related("images")
-        .order_by("-avg_rating", "-review_count", "-created_at")
+        .order_by("-rating_avg", "-rating_count", "-created_at")
     )
     similar_products = list(similar_qs[:8])
     if not similar_products:
         fallback_qs = (
-            Product.objects.filter(is_active=True)
+            Product.objects.filter(is_active=True, rating_count__gt=0)
             .exclude(id=product.id)
-            .annotate(avg_rating=Avg("reviews__rating"), review_count=Count("reviews"))
-            .filter(review_count__gt=0)
+            .alias(rating_avg=rating_avg)
             .prefetch_related("images")
-            .order_by("-avg_rating", "-review_count", "-created_at")
+            .order_by("-rating_avg", "-rating_count", "-created_at")
         )
         similar_products = list(fallback_qs[:8])
 
@@ -250,29 +183,45 @@ def product_detail(request, slug):
     )
 
 
+SEARCH_PAGE_SIZE = 24
+
+
 def search(request):
     products = Product.objects.filter(is_active=True)
     title = "Search"
     hint = None
     q = request.GET.get("q", "").strip()
+    selected_category = request.GET.get("category", "").strip()
+    selected_color = request.GET.get("color", "").strip()
+    page_obj = None
+    result = None
     if request.method == "POST" and request.FILES.get("image"):
         try:
-            uploaded = request.FILES["image"].read()
-            img = Image.open(io.BytesIO(uploaded)).convert("RGB").resize((64, 64))
-            pixels = list(img.getdata())
-            # Compute average color
-            r = sum(p[0] for p in pixels) / len(pixels)
-            g = sum(p[1] for p in pixels) / len(pixels)
-            b = sum(p[2] for p in pixels) / len(pixels)
-            color = _nearest_color((r, g, b))
-            products = products.filter(variants__color=color).distinct()
+            signature = extract_signature(request.FILES["image"])
+            color = nearest_palette_color(signature)
+            if not color:
+                raise ValueError("no color detected")
+            # Products whose own photos look closest, then any with a variant in that color
+            ranked = nearest_products(signature)
+            by_id = Product.objects.filter(is_active=True).prefetch_related("images").in_bulk(ranked)
+            matches = [by_id[pid] for pid in ranked if pid in by_id]
+            seen = set(by_id)
+            matches += [
+                p for p in products.filter(variants__color=color).distinct().prefetch_related("images")
+                if p.id not in seen
+            ]
+            products = matches
             title = f"Results by image color: {color}"
-            hint = f"Filtered using detected color: {color}"
+            hint = f"Matched by image colors (closest palette color: {color})"
         except Exception:
             messages.error(request, "Couldn't analyze the image. Showing all products.")
     else:
         if q:
-            products = products.filter(Q(name__icontains=q) | Q(description__icontains=q)).distinct()
+            result = search_products(q, category=selected_category, color=selected_color)
+            page_obj = Paginator(result.ids, SEARCH_PAGE_SIZE).get_page(request.GET.get("page"))
+            by_id = Product.objects.prefetch_related("images").in_bulk(list(page_obj.object_list))
+            # Keep the backend's ranking order
+            products = [by_id[pid] for pid in page_obj.object_list if pid in by_id]
             title = f"Results for '{q}'"
         else:
             products = products.none()
@@ -293,24 +242,16 @@ def search(request):
             "hint": hint,
             "banners": banners,
             "q": q,
+            "page_obj": page_obj,
+            "result_total": (result.total if result else None),
+            "category_facets": (result.category_facets if result else []),
+            "color_facets": (result.color_facets if result else []),
+            "selected_category": selected_category,
+            "selected_color": selected_color,
         },
     )
 
 
-def _nearest_color(rgb):
-    palette = {
-        "Red": (239, 68, 68),
-        "Black": (17, 24, 39),
-        "Navy Blue": (30, 58, 138),
-        "White": (250, 250, 250),
-        "Grey": (107, 114, 128),
-    }
-    def dist2(a, b):
-        return (a[0]-b[0])**2 + (a[1]-b[1])**2 + (a[2]-b[2])**2
-    best = min(palette.items(), key=lambda kv: dist2(rgb, kv[1]))
-    return best[0]
-
-
 @login_required
 def wishlist(request):
     items = (
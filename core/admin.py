@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Banner, NewsletterSubscriber
+from .models import Banner, Job, NewsletterSubscriber
 
 
 @admin.register(Banner)
@@ -14,3 +14,11 @@ class BannerAdmin(admin.ModelAdmin):
 class NewsletterSubscriberAdmin(admin.ModelAdmin):
     list_display = ("email", "subscribed_at")
     search_fields = ("email",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "key", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "key", "last_error")
+    readonly_fields = ("created_at", "updated_at", "finished_at", "locked_at", "locked_by")
@@ -5,3 +5,15 @@ class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
 
+    def ready(self):
+        try:
+            from . import signals  # noqa: F401
+        except Exception:
+            pass
+        try:
+            # Register job handlers from every app's jobs.py
+            from .jobs import autodiscover
+            autodiscover()
+            from . import mail  # noqa: F401  registers the core.send_email job
+        except Exception:
+            pass
@@ -0,0 +1,86 @@
+"""Versioned cache helpers for storefront data.
+
+Values are stored under keys that embed a version counter for their scope
+(e.g. "cart" for one user, or "categories" for the whole store). Writers call
+``bump_version`` instead of deleting keys, so every value derived from that
+scope is invalidated at once and the stale entries simply age out.
+"""
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = int(getattr(settings, "STORE_CACHE_TIMEOUT", 300))
+
+
+def _version_key(namespace: str, scope: Optional[Any] = None) -> str:
+    return f"store:ver:{namespace}:{scope if scope is not None else '*'}"
+
+
+def _fresh_version() -> int:
+    # Seed from the clock so a version evicted from the cache never restarts
+    # at a number that older, still-cached values were stored under.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace: str, scope: Optional[Any] = None) -> int:
+    key = _version_key(namespace, scope)
+    try:
+        version = cache.get(key)
+        if version is None:
+            version = _fresh_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key) or version
+        return int(version)
+    except Exception:
+        logger.debug("Cache unavailable reading version %s", key, exc_info=True)
+        return 0
+
+
+def bump_version(namespace: str, scope: Optional[Any] = None) -> None:
+    """Invalidate every value cached under namespace/scope."""
+    key = _version_key(namespace, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing (never read or evicted): start a new generation
+        try:
+            cache.set(key, _fresh_version(), None)
+        except Exception:
+            logger.debug("Cache unavailable bumping version %s", key, exc_info=True)
+    except Exception:
+        logger.debug("Cache unavailable bumping version %s", key, exc_info=True)
+
+
+def versioned_key(name: str, *deps: tuple) -> str:
+    """Build a key for ``name`` bound to the current version of each (namespace, scope) dep."""
+    parts = [name]
+    for namespace, scope in deps:
+        parts.append(f"{namespace}.{scope if scope is not None else '*'}.{get_version(namespace, scope)}")
+    return "store:val:" + ":".join(parts)
+
+
+def cached(key: str, builder: Callable[[], Any], timeout: Optional[int] = None) -> Any:
+    """Return the cached value for key, building and storing it on a miss.
+
+    Cache errors fall back to calling the builder so pages never fail because
+    the cache backend is down.
+    """
+    try:
+        value = cache.get(key)
+    except Exception:
+        logger.debug("Cache unavailable reading %s", key, exc_info=True)
+        return builder()
+    if value is not None:
+        return value
+    value = builder()
+    try:
+        cache.set(key, value, DEFAULT_TIMEOUT if timeout is None else timeout)
+    except Exception:
+        logger.debug("Cache unavailable writing %s", key, exc_info=True)
+    return value
@@ -1,69 +1,116 @@
 from decimal import Decimal
 from django.conf import settings
-from django.db import models
+from django.utils.functional import SimpleLazyObject
 
+from .cache import cached, versioned_key
 
-def store_context(request):
+
+def _all_categories():
+    # Shared across users; invalidated by Category save/delete (core.signals)
+    try:
+        from catalog.models import Category  # local import to avoid early app load
+        return cached(
+            versioned_key("categories", ("categories", None)),
+            lambda: list(Category.objects.all().only("name", "slug")),
+        )
+    except Exception:
+        return []
+
+
+def _cart_count(request):
     # derive cart count for mobile bottom nav
-    cart_count = 0
     try:
-        if getattr(request, "user", None) and request.user.is_authenticated and hasattr(request.user, "cart"):
-            cart = request.user.cart
-            cart_count = sum((it.quantity for it in cart.items.all()), 0)
-        else:
-            from cart.utils import get_session_items  # local import avoids app load order issues
-            cart_count = sum((it.quantity for it in get_session_items(request)), 0)
+        user = getattr(request, "user", None)
+        if user and user.is_authenticated:
+            from cart.models import Cart  # local import avoids app load order issues
+
+            def _build():
+                # One indexed lookup on the denormalized Cart.item_count
+                units = list(Cart.objects.filter(user_id=user.pk).values_list("item_count", flat=True)[:1])
+                return (bool(units), int(units[0]) if units else 0)
+
+            has_cart, count = cached(versioned_key("cart_count", ("cart", user.pk)), _build)
+            if has_cart:
+                return count
+        from cart.utils import get_session_items  # local import avoids app load order issues
+        return sum((it.quantity for it in get_session_items(request)), 0)
     except Exception:
-        cart_count = 0
+        return 0
 
-    # load categories for mobile menu
+
+def _wishlist_count(user):
     try:
-        from catalog.models import Category  # local import to avoid early app load
-        all_categories = list(Category.objects.all().only("name", "slug"))
+        from catalog.models import WishlistItem
+        return cached(
+            versioned_key("wishlist_count", ("wishlist", user.pk)),
+            lambda: int(WishlistItem.objects.filter(user=user).count()),
+        )
     except Exception:
-        all_categories = []
+        return 0
 
-    # default/saved addresses for quick mobile header location selector
-    default_address = None
-    delivery_session = None
-    user_addresses = []
-    wishlist_count = 0
+
+def _notif_counts(user):
+    """Return (unread, total) for the bell; see accounts.notifications."""
+    try:
+        from accounts.notifications import unread_counts  # local import to avoid early app load
+        return unread_counts(user)
+    except Exception:
+        return (0, 0)
+
+
+def store_context(request):
+    """Storefront globals for every template.
+
+    Anything that needs the database is wrapped in SimpleLazyObject so a
+    template that never references it costs nothing; counters and categories
+    are additionally cached under versioned keys bumped by core.signals.
+    """
+    user = getattr(request, "user", None)
+    is_auth = bool(user and user.is_authenticated)
     try:
-        user = getattr(request, "user", None)
         delivery_session = request.session.get("delivery") or None
-        if user and user.is_authenticated:
-            from accounts.models import Address  # local import to avoid early app load
-            from catalog.models import WishlistItem
-            from accounts.models import Notification, NotificationRead
-            user_addresses = list(Address.objects.filter(user=user).all())
-            if user_addresses:
-                default_address = next((a for a in user_addresses if a.is_default), None) or user_addresses[0]
-            try:
-                wishlist_count = int(WishlistItem.objects.filter(user=user).count())
-            except Exception:
-                wishlist_count = 0
-            try:
-                # Unread = active (broadcast or to user) without read receipt
-                notif_qs = Notification.objects.filter(is_active=True).filter(models.Q(user__isnull=True) | models.Q(user=user)).order_by('-created_at')
-                notif_ids = list(notif_qs.values_list('id', flat=True))
-                read_ids = set(NotificationRead.objects.filter(user=user, notification_id__in=notif_ids).values_list('notification_id', flat=True))
-                unread = sum(1 for nid in notif_ids if nid not in read_ids)
-                latest = list(notif_qs[:5])
-                total_count = len(notif_ids)
-            except Exception:
-                unread = 0
-                latest = []
-                total_count = 0
-        else:
-            unread = 0
-            latest = []
-            total_count = 0
     except Exception:
-        default_address = None
-        user_addresses = []
-        unread = 0
-        latest = []
-        total_count = 0
+        delivery_session = None
+
+    # default/saved addresses for quick mobile header location selector
+    def _addresses():
+        if not is_auth:
+            return []
+        try:
+            from accounts.models import Address  # local import to avoid early app load
+            return list(Address.objects.filter(user=user).all())
+        except Exception:
+            return []
+
+    user_addresses = SimpleLazyObject(_addresses)
+
+    def _default_address():
+        if not user_addresses:
+            return None
+        return next((a for a in user_addresses if a.is_default), None) or user_addresses[0]
+
+    notif_counts = SimpleLazyObject(lambda: list(_notif_counts(user)) if is_auth else [0, 0])
+
+    def _latest():
+        if not is_auth:
+            return []
+        try:
+            from accounts.notifications import visible_to
+            return list(visible_to(user).order_by("-created_at")[:5])
+        except Exception:
+            return []
+
+    notif_latest = SimpleLazyObject(_latest)
+
+    def _read_ids():
+        # Read state is only rendered next to the latest notifications
+        if not is_auth or not notif_latest:
+            return []
+        try:
+            from accounts.notifications import read_ids
+            return list(read_ids(user, notif_latest))
+        except Exception:
+            return []
 
     return {
         "STORE_NAME": getattr(settings, "STORE_NAME", "Store"),
@@ -75,14 +122,14 @@ def store_context(request):
         "BRAND_LOGO": getattr(settings, "BRAND_LOGO", "img/logo.svg"),
         "BRAND_GOLD": getattr(settings, "BRAND_GOLD", ""),
         "BRAND_GOLD_DARK": getattr(settings, "BRAND_GOLD_DARK", ""),
-        "CART_COUNT": cart_count,
-        "ALL_CATEGORIES": all_categories,
-        "DEFAULT_ADDRESS": default_address,
+        "CART_COUNT": SimpleLazyObject(lambda: _cart_count(request)),
+        "ALL_CATEGORIES": SimpleLazyObject(_all_categories),
+        "DEFAULT_ADDRESS": SimpleLazyObject(_default_address),
         "DELIVERY_SESSION": delivery_session,
         "USER_ADDRESSES": user_addresses,
-        "WISHLIST_COUNT": wishlist_count,
-        "NOTIF_COUNT": unread,
-        "NOTIF_LATEST": latest,
-        "NOTIF_READ_IDS": list(read_ids) if 'read_ids' in locals() else [],
-        "NOTIF_TOTAL": total_count,
+        "WISHLIST_COUNT": SimpleLazyObject(lambda: _wishlist_count(user) if is_auth else 0),
+        "NOTIF_COUNT": SimpleLazyObject(lambda: notif_counts[0]),
+        "NOTIF_LATEST": notif_latest,
+        "NOTIF_READ_IDS": SimpleLazyObject(_read_ids),
+        "NOTIF_TOTAL": SimpleLazyObject(lambda: notif_counts[1]),
     }
@@ -0,0 +1,159 @@
+"""Database-backed background jobs.
+
+Handlers are plain functions registered with ``@job("app.name")`` in an app's
+``jobs.py`` module (discovered by ``autodiscover``). ``enqueue`` stores a Job
+row in the caller's transaction, so work is only visible to the worker once
+the triggering change commits; ``manage.py run_jobs`` claims due jobs and
+calls the handler with the payload as keyword arguments.
+
+A handler that raises is retried with exponential backoff until
+``max_attempts``, after which the job is marked failed and shows up in the
+dashboard's failed-jobs list, where it can be retried by hand. Finished jobs
+are kept (their key still deduplicates) until ``purge_done`` deletes them,
+which ``run_jobs --purge-done-after`` does periodically.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_handlers: Dict[str, Callable[..., Any]] = {}
+
+
+def job(name: str):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def decorator(fn):
+        _handlers[name] = fn
+        return fn
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules("jobs")
+
+
+def _eager() -> bool:
+    return bool(getattr(settings, "JOBS_EAGER", False))
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds to wait before retry number ``attempts`` (1-based), with jitter."""
+    base = int(getattr(settings, "JOB_RETRY_BASE_DELAY", 30))
+    cap = int(getattr(settings, "JOB_RETRY_MAX_DELAY", 3600))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue(
+    name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    key: Optional[str] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """Create a job, or return the existing one with the same idempotency key."""
+    fields = {
+        "name": name,
+        "payload": payload or {},
+        "run_after": timezone.now() + timedelta(seconds=delay),
+    }
+    if max_attempts:
+        fields["max_attempts"] = max_attempts
+    if key:
+        try:
+            obj, created = Job.objects.get_or_create(key=key, defaults=fields)
+        except IntegrityError:
+            # Lost a race with a concurrent enqueue of the same key
+            obj, created = Job.objects.get(key=key), False
+    else:
+        obj, created = Job.objects.create(**fields), True
+    if created and _eager() and not delay:
+        transaction.on_commit(lambda: _claim(obj.pk, "eager") and run_job(obj.pk))
+    return obj
+
+
+def _claim(pk: int, worker: str) -> bool:
+    # Conditional UPDATE: exactly one worker wins, on any database backend
+    return bool(
+        Job.objects.filter(pk=pk, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING,
+            locked_at=timezone.now(),
+            locked_by=worker[:100],
+            attempts=F("attempts") + 1,
+        )
+    )
+
+
+def requeue_stale() -> int:
+    """Return jobs whose worker died mid-run to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=int(getattr(settings, "JOB_LOCK_TIMEOUT", 600)))
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff).update(
+        status=Job.STATUS_PENDING, locked_at=None, locked_by=""
+    )
+
+
+def claim_due(worker: str, limit: int = 10) -> List[int]:
+    ids = list(
+        Job.objects.filter(status=Job.STATUS_PENDING, run_after__lte=timezone.now())
+        .order_by("run_after")
+        .values_list("id", flat=True)[:limit]
+    )
+    return [pk for pk in ids if _claim(pk, worker)]
+
+
+def run_job(pk: int) -> bool:
+    """Run a claimed job; returns True if the handler succeeded."""
+    obj = Job.objects.get(pk=pk)
+    handler = _handlers.get(obj.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {obj.name!r}")
+        handler(**(obj.payload or {}))
+    except Exception:
+        error = traceback.format_exc(limit=8)
+        now = timezone.now()
+        if obj.attempts >= obj.max_attempts:
+            logger.error("Job %s failed permanently after %s attempts", obj, obj.attempts)
+            updates = {"status": Job.STATUS_FAILED, "finished_at": now}
+        else:
+            logger.warning("Job %s failed (attempt %s/%s); will retry", obj, obj.attempts, obj.max_attempts)
+            updates = {"status": Job.STATUS_PENDING, "run_after": now + timedelta(seconds=backoff_delay(obj.attempts))}
+        Job.objects.filter(pk=pk).update(locked_at=None, locked_by="", last_error=error, updated_at=now, **updates)
+        return False
+    now = timezone.now()
+    Job.objects.filter(pk=pk).update(
+        status=Job.STATUS_DONE, finished_at=now, updated_at=now, locked_at=None, locked_by="", last_error=""
+    )
+    return True
+
+
+def retry(obj: Job) -> None:
+    """Put a failed job back in the queue with a fresh attempt budget."""
+    Job.objects.filter(pk=obj.pk).update(
+        status=Job.STATUS_PENDING, attempts=0, run_after=timezone.now(), finished_at=None, updated_at=timezone.now()
+    )
+
+
+def purge_done(older_than: timedelta, batch: int = 1000) -> int:
+    """Delete jobs that finished successfully more than ``older_than`` ago; returns how many."""
+    cutoff = timezone.now() - older_than
+    deleted = 0
+    while True:
+        ids = list(
+            Job.objects.filter(status=Job.STATUS_DONE, finished_at__lt=cutoff).values_list("id", flat=True)[:batch]
+        )
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,298 @@
+"""Outbound email.
+
+``send_async`` hands a message to a small pool of sender threads
+(EMAIL_WORKERS per process) through a bounded in-process queue, so a request
+never waits on SMTP and an order spike cannot spawn a thread or connection
+per email. Each sender keeps one backend connection open while there is
+mail, takes up to EMAIL_BATCH_SIZE queued messages at a time and passes
+them to a single ``send_messages`` call, and closes the connection after
+EMAIL_IDLE_TIMEOUT seconds without mail.
+
+Transient failures (disconnects, 4xx replies, socket errors) reconnect and
+retry from the message that failed, with backoff; a message the server
+rejects outright is logged and skipped. Messages still unsent after
+EMAIL_MAX_RETRIES attempts are stored as a ``core.send_email`` job, which
+retries them on the job queue's backoff and marks them failed on the
+dashboard when they run out of attempts. When the queue is full a message
+is stored as a job straight away, and at interpreter exit the senders get
+EMAIL_DRAIN_TIMEOUT seconds to send what is still queued.
+
+``send_batch`` runs the same delivery loop on the calling thread, for jobs.
+"""
+import atexit
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db import close_old_connections
+
+from . import metrics
+from .jobs import backoff_delay, enqueue, job
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _setting(name: str, default: int) -> int:
+    return int(getattr(settings, name, default))
+
+
+def _transient(exc: Exception) -> bool:
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPException):
+        # e.g. every recipient refused: retrying sends the same reply
+        return False
+    return isinstance(exc, OSError)
+
+
+def _close(connection) -> None:
+    try:
+        connection.close()
+    except Exception:
+        logger.debug("Error closing mail connection", exc_info=True)
+
+
+def _tracked(messages: List[EmailMessage], done: List[int]):
+    # The backend asks for the next message only after sending the previous
+    # one, so ``done`` counts the messages that went out before a failure
+    for message in messages:
+        yield message
+        done[0] += 1
+
+
+def _deliver(connection, messages: List[EmailMessage]) -> Tuple[int, List[EmailMessage]]:
+    """Send over an open-or-openable connection, retrying transient errors.
+
+    Returns (messages sent, messages left unsent when the retries ran out).
+    """
+    retries = _setting("EMAIL_MAX_RETRIES", 3)
+    sent = attempt = i = 0
+    while i < len(messages):
+        done = [0]
+        try:
+            # Opened here rather than inside send_messages, so the backend
+            # leaves the connection open for the next batch
+            connection.open()
+            connection.send_messages(_tracked(messages[i:], done))
+            sent += done[0]
+            i = len(messages)
+        except Exception as exc:
+            sent += done[0]
+            i += done[0]
+            attempt = 0 if done[0] else attempt
+            _close(connection)
+            if _transient(exc) and attempt < retries:
+                attempt += 1
+                metrics.incr("email.retried")
+                logger.warning("Transient mail error (%s); retry %s/%s", exc, attempt, retries)
+                time.sleep(min(30, 2 ** attempt))
+                continue
+            if i >= len(messages):
+                break
+            if _transient(exc):
+                # The server is still unreachable: the rest would fail the same way
+                logger.warning("Mail error persisted after %s retries (%s); %s unsent", retries, exc, len(messages) - i)
+                metrics.incr("email.sent", sent)
+                return sent, messages[i:]
+            metrics.incr("email.failed")
+            logger.exception("Email %r to %s failed", messages[i].subject, messages[i].to)
+            i += 1
+            attempt = 0
+    metrics.incr("email.sent", sent)
+    return sent, []
+
+
+def _send(messages: List[EmailMessage], connection=None) -> Tuple[int, List[EmailMessage]]:
+    own = connection is None
+    connection = connection or get_connection()
+    try:
+        return _deliver(connection, messages)
+    finally:
+        if own:
+            _close(connection)
+
+
+def send_batch(messages: Iterable[EmailMessage], connection=None) -> int:
+    """Send messages over one connection on this thread.
+
+    Returns the number sent or stored as a job for a later retry; the rest
+    were rejected by the server.
+    """
+    sent, unsent = _send(list(messages), connection)
+    return sent + _defer(unsent)
+
+
+def _serialize(message: EmailMessage) -> dict:
+    if message.attachments:
+        raise ValueError("Attachments cannot be stored in a job payload")
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": list(message.to),
+        "cc": list(message.cc),
+        "bcc": list(message.bcc),
+        "reply_to": list(message.reply_to),
+        "headers": dict(message.extra_headers),
+        "alternatives": [list(a) for a in getattr(message, "alternatives", [])],
+    }
+
+
+def _deserialize(data: dict) -> EmailMultiAlternatives:
+    return EmailMultiAlternatives(
+        data["subject"],
+        data["body"],
+        data["from_email"],
+        data["to"],
+        cc=data["cc"],
+        bcc=data["bcc"],
+        reply_to=data["reply_to"],
+        headers=data["headers"],
+        alternatives=[tuple(a) for a in data["alternatives"]],
+    )
+
+
+def _defer(messages: List[EmailMessage], delay: float = 0) -> int:
+    """Store messages as a ``core.send_email`` job; returns how many were stored."""
+    payloads = []
+    for message in messages:
+        try:
+            payloads.append(_serialize(message))
+        except ValueError:
+            metrics.incr("email.failed")
+            logger.error("Email %r to %s dropped: cannot be stored for retry", message.subject, message.to)
+    if payloads:
+        enqueue("core.send_email", {"messages": payloads}, delay=delay)
+        metrics.incr("email.deferred", len(payloads))
+    return len(payloads)
+
+
+@job("core.send_email")
+def send_email_job(messages: List[dict]):
+    """Send messages that did not fit in a process's mail queue or could not be delivered."""
+    batch = [_deserialize(m) for m in messages]
+    sent, unsent = _send(batch)
+    if len(unsent) == len(batch):
+        # Nothing went out: fail the job so it is retried with backoff, and
+        # marked failed once its attempts run out
+        raise RuntimeError(f"{len(unsent)} emails not sent: mail server unavailable")
+    if unsent:
+        # Part went out: retrying this job would send that part twice, so
+        # only the rest goes into a new job
+        _defer(unsent, delay=backoff_delay(1))
+
+
+class _Sender:
+    """Bounded queue drained by a fixed pool of threads, one connection each."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue: Optional[queue.Queue] = None
+        self._threads: List[threading.Thread] = []
+
+    def _ensure_started(self) -> queue.Queue:
+        with self._lock:
+            # Started lazily, and again in a forked worker, whose copy of
+            # the parent's threads does not run
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=max(1, _setting("EMAIL_QUEUE_SIZE", 500)))
+                self._threads = [
+                    threading.Thread(target=self._run, args=(self._queue,), name=f"mail-sender-{n}", daemon=True)
+                    for n in range(max(1, _setting("EMAIL_WORKERS", 2)))
+                ]
+                for t in self._threads:
+                    t.start()
+            return self._queue
+
+    def submit(self, message: EmailMessage) -> bool:
+        """Queue a message; returns False if the queue is full."""
+        try:
+            self._ensure_started().put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self, q: queue.Queue) -> None:
+        batch_size = max(1, _setting("EMAIL_BATCH_SIZE", 50))
+        idle = _setting("EMAIL_IDLE_TIMEOUT", 30)
+        connection = None
+        stop = False
+        while not stop:
+            try:
+                first = q.get(timeout=idle if connection is not None else None)
+            except queue.Empty:
+                _close(connection)
+                connection = None
+                continue
+            if first is _STOP:
+                break
+            batch = [first]
+            while len(batch) < batch_size:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                connection = connection or get_connection()
+                _, unsent = _deliver(connection, batch)
+                if unsent:
+                    close_old_connections()
+                    _defer(unsent)
+            except Exception:
+                logger.exception("Mail sender failed on a batch of %s", len(batch))
+        if connection is not None:
+            _close(connection)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Send what is queued, then stop the threads (waiting at most ``timeout`` seconds)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            q, threads = self._queue, self._threads
+            self._pid = None
+        for _ in threads:
+            q.put(_STOP)
+        deadline = time.monotonic() + (_setting("EMAIL_DRAIN_TIMEOUT", 10) if timeout is None else timeout)
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        if any(t.is_alive() for t in threads):
+            logger.warning("Mail queue not drained at shutdown (%s items left)", q.qsize())
+
+
+_sender = _Sender()
+atexit.register(_sender.shutdown)
+
+
+def send_async(message: EmailMessage) -> None:
+    """Send ``message`` in the background (through the job queue if this process's queue is full)."""
+    if _sender.submit(message):
+        return
+    metrics.incr("email.overflow")
+    try:
+        payload = _serialize(message)
+    except ValueError:
+        # Not storable (attachments): send on this thread rather than drop it
+        send_batch([message])
+        return
+    enqueue("core.send_email", {"messages": [payload]})
+
+
+def shutdown(timeout: Optional[float] = None) -> None:
+    _sender.shutdown(timeout)
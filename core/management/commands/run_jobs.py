@@ -0,0 +1,61 @@
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.jobs import autodiscover, claim_due, purge_done, requeue_stale, run_job
+
+# Seconds between purges of finished jobs
+PURGE_INTERVAL = 600
+
+
+class Command(BaseCommand):
+    help = "Process background jobs (core.jobs) until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process due jobs once and exit")
+        parser.add_argument("--batch", type=int, default=10, help="Jobs claimed per poll (default: 10)")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument(
+            "--purge-done-after",
+            type=float,
+            default=None,
+            metavar="HOURS",
+            help="Delete jobs that finished this many hours ago (checked every 10 minutes; off by default)",
+        )
+
+    def handle(self, *args, **options):
+        autodiscover()
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = False
+
+        def _request_stop(signum, frame):
+            # Finish the current job, then exit
+            self._stop = True
+
+        signal.signal(signal.SIGTERM, _request_stop)
+        signal.signal(signal.SIGINT, _request_stop)
+
+        keep = options["purge_done_after"]
+        purged_at = 0.0
+        processed = 0
+        while not self._stop:
+            close_old_connections()
+            requeue_stale()
+            if keep is not None and time.monotonic() - purged_at >= PURGE_INTERVAL:
+                purged_at = time.monotonic()
+                purge_done(timedelta(hours=keep))
+            claimed = claim_due(worker, limit=options["batch"])
+            for pk in claimed:
+                run_job(pk)
+                processed += 1
+                if self._stop:
+                    break
+            if options["once"]:
+                break
+            if not claimed:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs"))
@@ -0,0 +1,57 @@
+"""Lightweight counters and timings kept in the Django cache.
+
+Values are shared by every worker using the same cache backend (per process
+with the default locmem cache) and are best-effort: cache errors are ignored.
+Counters expire after METRICS_TTL seconds without updates.
+"""
+import logging
+from contextlib import contextmanager
+import time
+from typing import Dict, Iterable
+
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_TTL = 7 * 24 * 3600
+
+
+def _key(name: str) -> str:
+    return f"store:metric:{name}"
+
+
+def incr(name: str, amount: int = 1) -> None:
+    key = _key(name)
+    try:
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            if not cache.add(key, amount, METRICS_TTL):
+                cache.incr(key, amount)
+    except Exception:
+        logger.debug("Metric %s not recorded", name, exc_info=True)
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record one timing: ``<name>.count`` and ``<name>.total_ms``."""
+    incr(f"{name}.count")
+    incr(f"{name}.total_ms", int(round(seconds * 1000)))
+
+
+@contextmanager
+def timed(name: str):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start)
+
+
+def read(names: Iterable[str]) -> Dict[str, int]:
+    names = list(names)
+    try:
+        values = cache.get_many([_key(n) for n in names])
+    except Exception:
+        values = {}
+    return {n: int(values.get(_key(n)) or 0) for n in names}
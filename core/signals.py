@@ -0,0 +1,61 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import Address, Notification, NotificationRead
+from accounts.notifications import invalidate_counts
+from cart.models import Cart, CartItem
+from catalog.models import Category, WishlistItem
+from coupons.models import Coupon
+from .cache import bump_version
+
+
+# Invalidation for the cached storefront context (core.context_processors)
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance: Category, **kwargs):
+    bump_version("categories")
+
+
+@receiver([post_save, post_delete], sender=Cart)
+def cart_changed(sender, instance: Cart, **kwargs):
+    bump_version("cart", instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def cart_item_changed(sender, instance: CartItem, **kwargs):
+    try:
+        bump_version("cart", instance.cart.user_id)
+    except Cart.DoesNotExist:
+        # Cart already gone (cascade); cart_changed covers it
+        pass
+
+
+@receiver([post_save, post_delete], sender=WishlistItem)
+def wishlist_changed(sender, instance: WishlistItem, **kwargs):
+    bump_version("wishlist", instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def notification_changed(sender, instance: Notification, created: bool = False, **kwargs):
+    if created and getattr(instance, "_counted", False):
+        # broadcast()/notify_user() add it to the cached counts themselves
+        return
+    # A broadcast (user=None) drops every user's counts
+    invalidate_counts(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=NotificationRead)
+def notification_read_changed(sender, instance: NotificationRead, **kwargs):
+    invalidate_counts(instance.user_id)
+
+
+# Invalidation for cart pricing lookups (cart.pricing)
+
+@receiver([post_save, post_delete], sender=Coupon)
+def coupon_changed(sender, instance: Coupon, **kwargs):
+    bump_version("coupons")
+
+
+@receiver([post_save, post_delete], sender=Address)
+def address_changed(sender, instance: Address, **kwargs):
+    bump_version("addresses", instance.user_id)
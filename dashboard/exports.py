@@ -0,0 +1,149 @@
+"""Streaming CSV exports for the dashboard.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` (a
+server-side cursor on PostgreSQL) and written to a StreamingHttpResponse one
+line at a time, so a worker's memory stays flat however many rows an export
+has. Exports accept ``from``/``to`` (YYYY-MM-DD, store-local days,
+inclusive) and the same filters as the matching dashboard list.
+"""
+import csv
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional, Sequence
+
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders.models import Order, OrderItem
+
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename: str, header: Sequence[str], rows: Iterable[Sequence]) -> StreamingHttpResponse:
+    writer = csv.writer(_Echo())
+
+    def _lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    resp = StreamingHttpResponse(_lines(), content_type="text/csv")
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
+
+
+def _parse_day(value: str) -> Optional[date]:
+    try:
+        return parse_date(value.strip())
+    except ValueError:
+        return None
+
+
+def date_range(request):
+    """(first, last) local dates from ?from= and ?to=; either may be None."""
+    return _parse_day(request.GET.get("from", "")), _parse_day(request.GET.get("to", ""))
+
+
+def _filter_dates(qs, field: str, first: Optional[date], last: Optional[date]):
+    # Aware bounds instead of __date, so an index on the column can be used
+    tz = timezone.get_current_timezone()
+    if first:
+        qs = qs.filter(**{f"{field}__gte": timezone.make_aware(datetime.combine(first, time.min), tz)})
+    if last:
+        qs = qs.filter(**{f"{field}__lt": timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min), tz)})
+    return qs
+
+
+USER_COLUMNS = ["id", "username", "email", "is_staff", "is_active", "date_joined", "last_login"]
+
+
+def user_rows(request):
+    User = get_user_model()
+    q = request.GET.get("q", "").strip()
+    staff = request.GET.get("staff", "all")
+    active = request.GET.get("active", "all")
+    qs = User.objects.all()
+    if q:
+        qs = qs.filter(username__icontains=q) | qs.filter(email__icontains=q)
+    if staff in ("yes", "no"):
+        qs = qs.filter(is_staff=(staff == "yes"))
+    if active in ("yes", "no"):
+        qs = qs.filter(is_active=(active == "yes"))
+    qs = _filter_dates(qs, "date_joined", *date_range(request))
+    for uid, username, email, is_staff, is_active, joined, last_login in (
+        qs.order_by("-date_joined").values_list(*USER_COLUMNS).iterator(chunk_size=CHUNK_SIZE)
+    ):
+        yield [uid, username, email or "", is_staff, is_active, joined, last_login or ""]
+
+
+def _orders(request):
+    q = request.GET.get("q", "").strip()
+    status = request.GET.get("status", "all")
+    qs = Order.objects.all()
+    if q:
+        qs = qs.filter(order_number__icontains=q) | qs.filter(user__username__icontains=q)
+    if status and status != "all":
+        qs = qs.filter(status__in=status.split(","))
+    return _filter_dates(qs, "created_at", *date_range(request))
+
+
+# (CSV column, queryset field)
+ORDER_COLUMNS = [
+    ("order_number", "order_number"),
+    ("created_at", "created_at"),
+    ("username", "user__username"),
+    ("email", "user__email"),
+    ("status", "status"),
+    ("payment_method", "payment_method"),
+    ("subtotal", "subtotal"),
+    ("discount_amount", "discount_amount"),
+    ("coupon_code", "coupon_code"),
+    ("gst_amount", "gst_amount"),
+    ("shipping_amount", "shipping_amount"),
+    ("total_amount", "total_amount"),
+    ("shipping_name", "shipping_name"),
+    ("shipping_phone", "shipping_phone"),
+    ("city", "city"),
+    ("state", "state"),
+    ("postal_code", "postal_code"),
+    ("tracking_number", "tracking_number"),
+]
+
+
+def order_rows(request):
+    qs = _orders(request).order_by("-created_at", "-id").values_list(*(f for _, f in ORDER_COLUMNS))
+    return qs.iterator(chunk_size=CHUNK_SIZE)
+
+
+ORDER_ITEM_COLUMNS = [
+    ("order_number", "order__order_number"),
+    ("order_created_at", "order__created_at"),
+    ("order_status", "order__status"),
+    ("product", "product__name"),
+    ("sku", "variant__sku"),
+    ("size", "variant_size"),
+    ("color", "variant_color"),
+    ("quantity", "quantity"),
+    ("unit_price", "unit_price"),
+    ("line_total", "line_total"),
+    ("unit_cost", "unit_cost"),
+    ("line_cost", "line_cost"),
+]
+
+
+def order_item_rows(request):
+    qs = (
+        OrderItem.objects.filter(order__in=_orders(request))
+        .order_by("-order__created_at", "order_id", "id")
+        .values_list(*(f for _, f in ORDER_ITEM_COLUMNS))
+    )
+    for row in qs.iterator(chunk_size=CHUNK_SIZE):
+        yield [("" if v is None else v) for v in row]
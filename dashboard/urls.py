@@ -7,6 +7,8 @@ urlpatterns = [
     path("dashboard/analytics.json", views.analytics_data, name="dashboard_analytics_data"),
     path("dashboard/analytics.csv", views.analytics_csv, name="dashboard_analytics_csv"),
     path("dashboard/orders/", views.orders_list, name="dashboard_orders"),
+    path("dashboard/orders.csv", views.orders_csv, name="dashboard_orders_csv"),
+    path("dashboard/order-items.csv", views.order_items_csv, name="dashboard_order_items_csv"),
     path("dashboard/orders/partial/", views.orders_partial, name="dashboard_orders_partial"),
     path("dashboard/orders/<int:pk>/", views.order_detail_admin, name="dashboard_order_detail"),
     path("dashboard/products/", views.products_list, name="dashboard_products"),
@@ -23,6 +25,11 @@ urlpatterns = [
     path("dashboard/users/<int:pk>/staff/", views.toggle_user_staff, name="dashboard_user_toggle_staff"),
     path("dashboard/users/<int:pk>/active/", views.toggle_user_active, name="dashboard_user_toggle_active"),
     path("dashboard/users.csv", views.users_csv, name="dashboard_users_csv"),
+    path("dashboard/jobs/", views.jobs_list, name="dashboard_jobs"),
+    path("dashboard/jobs/<int:pk>/retry/", views.job_retry, name="dashboard_job_retry"),
+    path("dashboard/jobs/<int:pk>/delete/", views.job_delete, name="dashboard_job_delete"),
+    path("dashboard/announcements/", views.announcements_list, name="dashboard_announcements"),
+    path("dashboard/announcements/<int:pk>/cancel/", views.announcement_cancel, name="dashboard_announcement_cancel"),
     path("dashboard/categories/new/", views.create_category, name="dashboard_category_new"),
     path("dashboard/products/new/", views.create_product, name="dashboard_product_new"),
     path("dashboard/banners/new/", views.create_banner, name="dashboard_banner_new"),
@@ -1,7 +1,7 @@
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Sum, F
-from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models import Count, Sum, F
+from django.db.models.functions import TruncMonth
 from django.forms import inlineformset_factory
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.safestring import mark_safe
@@ -14,16 +14,21 @@ from django.utils import timezone
 from decimal import Decimal
 import random
 from django.views.decorators.http import require_POST
-from django.http import HttpResponse
 from django.core.mail import send_mail, EmailMessage, get_connection
 import logging
 logger = logging.getLogger(__name__)
 
-from orders.models import Order, OrderItem
+from orders.models import DailySalesFact, Order, OrderItem
+from orders.display import enrich_orders, order_item_rows
+from orders.inventory import debit_order, release_order
 from catalog.models import Variant, Product, Category, ProductImage, ProductVideo
-from core.models import Banner
+from core.models import Banner, Job
+from core.jobs import retry as retry_job
+from accounts.announcements import cancel as cancel_announcement
+from accounts.models import Announcement
 from coupons.models import Coupon
 from django.contrib.auth import get_user_model
+from . import exports
 from .forms import (
     CategoryForm,
     ProductForm,
@@ -38,9 +43,7 @@ from .forms import (
 
 @staff_member_required(login_url="/accounts/login/")
 def index(request):
-    orders_paid = Order.objects.filter(status__in=["paid", "shipped", "delivered"]) \
-        .aggregate(total=Sum("total_amount"))
-    revenue = orders_paid["total"] or 0
+    revenue = DailySalesFact.objects.aggregate(total=Sum("revenue"))["total"] or 0
 
     latest_orders = Order.objects.select_related("user").order_by("-created_at")[:10]
 
@@ -54,72 +57,65 @@ def index(request):
     })
 
 
-@staff_member_required(login_url="/accounts/login/")
-def analytics_data(request):
-    from django.conf import settings
+def _analytics_params(request):
     try:
         days = int(request.GET.get("days", "30"))
     except Exception:
         days = 30
-    days = max(1, min(days, 365))
-    group = request.GET.get("group", "day")
-    from django.utils import timezone
-    start = timezone.now() - timezone.timedelta(days=days-1)
+    return max(1, min(days, 365)), request.GET.get("group", "day")
 
-    revenue_statuses = ["paid", "shipped", "delivered"]
 
-    trunc = TruncDate
-    if group == "month":
-        trunc = TruncMonth
-
-    qs = (
-        Order.objects.filter(created_at__date__gte=start.date(), status__in=revenue_statuses)
-        .annotate(d=trunc("created_at"))
-        .values("d")
-        .annotate(
-            revenue=Sum("total_amount"),
-            subtotal=Sum("subtotal"),
-            tax=Sum("gst_amount"),
-            shipping=Sum("shipping_amount"),
-            discount=Sum("discount_amount"),
-            # Real cost from items (if captured), else 0
-            real_cost=Sum("items__line_cost"),
-        )
-        .order_by("d")
-    )
+def _sales_timeline(start, end, group: str):
+    """(label, totals) per day or month from ``start`` to ``end``, zeros included.
 
-    # Build complete timeline with zeros for missing days/months so chart always renders
-    from django.utils import timezone as dj_tz
-    cogs_rate = float(getattr(settings, "COGS_RATE", 0.0) or 0.0)
-    agg = {}
-    for row in qs:
-        key = row["d"].strftime("%Y-%m" if group == "month" else "%Y-%m-%d")
-        agg[key] = row
+    Reads the DailySalesFact rollup (orders.sales), so the cost is one row
+    per day rather than one per order.
+    """
+    facts = DailySalesFact.objects.filter(date__gte=start, date__lte=end)
+    fields = ("revenue", "net_sales", "tax", "shipping", "discount", "cost", "orders", "units")
+    fmt = "%Y-%m" if group == "month" else "%Y-%m-%d"
+    if group == "month":
+        rows = facts.annotate(d=TruncMonth("date")).values("d").annotate(**{f: Sum(f) for f in fields}).order_by("d")
+    else:
+        rows = facts.annotate(d=F("date")).values("d", *fields)
+    agg = {row["d"].strftime(fmt): row for row in rows}
 
-    labels, revenue, net_sales, profit = [], [], [], []
+    timeline = []
     cursor = start
-    today = dj_tz.now()
-    while (cursor.year, cursor.month, cursor.day) <= (today.year, today.month, today.day):
-        key = cursor.strftime("%Y-%m" if group == "month" else "%Y-%m-%d")
-        row = agg.get(key, {})
-        rev = float(row.get("revenue") or 0)
-        sub = float(row.get("subtotal") or 0)
-        disc = float(row.get("discount") or 0)
-        ship = float(row.get("shipping") or 0)
-        real_cost = float(row.get("real_cost") or 0)
-        net = max(sub - disc, 0.0)
-        est_profit = (net - real_cost - ship) if real_cost > 0 else (net * (1.0 - cogs_rate) - ship)
-        labels.append(key)
-        revenue.append(round(rev, 2))
-        net_sales.append(round(net, 2))
-        profit.append(round(est_profit, 2))
+    while cursor <= end:
+        key = cursor.strftime(fmt)
+        timeline.append((key, agg.get(key, {})))
         if group == "month":
             # advance to first day of next month
             y = cursor.year + (1 if cursor.month == 12 else 0)
             m = 1 if cursor.month == 12 else cursor.month + 1
             cursor = cursor.replace(year=y, month=m, day=1)
         else:
-            cursor += dj_tz.timedelta(days=1)
+            cursor += timezone.timedelta(days=1)
+    return timeline
+
+
+def _estimated_profit(row, cogs_rate: float) -> float:
+    net = float(row.get("net_sales") or 0)
+    ship = float(row.get("shipping") or 0)
+    real_cost = float(row.get("cost") or 0)
+    # Real item cost when captured, else the configured COGS rate
+    return (net - real_cost - ship) if real_cost > 0 else (net * (1.0 - cogs_rate) - ship)
+
+
+@staff_member_required(login_url="/accounts/login/")
+def analytics_data(request):
+    from django.conf import settings
+    days, group = _analytics_params(request)
+    cogs_rate = float(getattr(settings, "COGS_RATE", 0.0) or 0.0)
+    today = timezone.localdate()
+
+    labels, revenue, net_sales, profit = [], [], [], []
+    for key, row in _sales_timeline(today - timezone.timedelta(days=days - 1), today, group):
+        labels.append(key)
+        revenue.append(round(float(row.get("revenue") or 0), 2))
+        net_sales.append(round(float(row.get("net_sales") or 0), 2))
+        profit.append(round(_estimated_profit(row, cogs_rate), 2))
 
     return JsonResponse({
         "labels": labels,
@@ -135,56 +131,32 @@ def analytics_data(request):
 @staff_member_required(login_url="/accounts/login/")
 def analytics_csv(request):
     from django.conf import settings
-    import csv
-    from django.http import HttpResponse
-    try:
-        days = int(request.GET.get("days", "30"))
-    except Exception:
-        days = 30
-    days = max(1, min(days, 365))
-    group = request.GET.get("group", "day")
-
-    # Build same data as JSON
-    from django.utils import timezone
-    start = timezone.now() - timezone.timedelta(days=days-1)
-    revenue_statuses = ["paid", "shipped", "delivered"]
-    trunc = TruncMonth if group == "month" else TruncDate
-    qs = (
-        Order.objects.filter(created_at__date__gte=start.date(), status__in=revenue_statuses)
-        .annotate(d=trunc("created_at"))
-        .values("d")
-        .annotate(
-            revenue=Sum("total_amount"),
-            subtotal=Sum("subtotal"),
-            tax=Sum("gst_amount"),
-            shipping=Sum("shipping_amount"),
-            discount=Sum("discount_amount"),
-        )
-        .order_by("d")
-    )
+    days, group = _analytics_params(request)
     cogs_rate = float(getattr(settings, "COGS_RATE", 0.0) or 0.0)
-
-    resp = HttpResponse(content_type='text/csv')
-    resp['Content-Disposition'] = 'attachment; filename="analytics.csv"'
-    w = csv.writer(resp)
-    w.writerow(["date", "revenue", "net_sales", "estimated_profit"]) 
-    for row in qs:
-        if group == "month":
-            d = row["d"].strftime("%Y-%m")
-        else:
-            d = row["d"].strftime("%Y-%m-%d")
-        sub = float(row.get("subtotal") or 0)
-        disc = float(row.get("discount") or 0)
-        ship = float(row.get("shipping") or 0)
-        net = max(sub - disc, 0.0)
-        est_profit = net * (1.0 - cogs_rate) - ship
-        w.writerow([
-            d,
-            round(float(row.get("revenue") or 0), 2),
-            round(net, 2),
-            round(est_profit, 2),
-        ])
-    return resp
+    # ?from=/?to= pick an explicit range; otherwise the last ``days`` days
+    first, last = exports.date_range(request)
+    last = last or timezone.localdate()
+    first = first or (last - timezone.timedelta(days=days - 1))
+
+    def _rows():
+        for key, row in _sales_timeline(first, last, group):
+            if not row:
+                continue
+            yield [
+                key,
+                round(float(row.get("revenue") or 0), 2),
+                round(float(row.get("net_sales") or 0), 2),
+                round(_estimated_profit(row, cogs_rate), 2),
+                row.get("orders") or 0,
+                row.get("units") or 0,
+                round(float(row.get("tax") or 0), 2),
+                round(float(row.get("shipping") or 0), 2),
+                round(float(row.get("discount") or 0), 2),
+                round(float(row.get("cost") or 0), 2),
+            ]
+
+    header = ["date", "revenue", "net_sales", "estimated_profit", "orders", "units", "tax", "shipping", "discount", "cost"]
+    return exports.stream_csv("analytics.csv", header, _rows())
 
 
 @staff_member_required(login_url="/accounts/login/")
@@ -203,60 +175,8 @@ def orders_list(request):
         qs = qs.order_by("created_at")
     else:
         qs = qs.order_by("-created_at")
-    orders = (
-        qs.select_related("user").prefetch_related("items__product__images", "items__variant")
-    )[:50]
-    # Enrich with first item thumb + size/color
-    for o in orders:
-        try:
-            it = o.items.select_related("product", "variant").first()
-            if not it:
-                o.thumb_url = ""; o.first_size = ""; o.first_color = ""; o.first_item_name = ""; o.item_thumbs = []; o.item_more_count = 0; continue
-            size = (getattr(it.variant, "size", None) or it.variant_size or "")
-            color = (getattr(it.variant, "color", None) or it.variant_color or "")
-            thumb = ""
-            imgs = list(getattr(it.product, "images", None).all()) if getattr(it.product, "images", None) else []
-            if color:
-                low = str(color).strip().lower()
-                for im in imgs:
-                    c = (getattr(im, "color", "") or "").strip().lower()
-                    if c and c == low and getattr(im, "image", None) and getattr(im.image, "url", None):
-                        thumb = im.image.url; break
-            if not thumb and imgs:
-                first = imgs[0]
-                if getattr(first, "image", None) and getattr(first.image, "url", None):
-                    thumb = first.image.url
-            o.thumb_url = thumb
-            o.first_size = size
-            o.first_color = color
-            o.first_item_name = it.product.name
-            # Build up to 3 additional item thumbnails across order items (exclude first item's thumb)
-            thumbs = []
-            for item in o.items.select_related("product", "variant").all():
-                t = ""
-                try:
-                    imlist = list(getattr(item.product, "images", None).all()) if getattr(item.product, "images", None) else []
-                    icol = (getattr(item.variant, "color", None) or item.variant_color or "")
-                    if icol:
-                        lowc = str(icol).strip().lower()
-                        for im in imlist:
-                            cc = (getattr(im, "color", "") or "").strip().lower()
-                            if cc and cc == lowc and getattr(im, "image", None) and getattr(im.image, "url", None):
-                                t = im.image.url; break
-                    if not t and imlist:
-                        fi = imlist[0]
-                        if getattr(fi, "image", None) and getattr(fi.image, "url", None):
-                            t = fi.image.url
-                except Exception:
-                    t = ""
-                if t and t != thumb and t not in thumbs:
-                    thumbs.append(t)
-                if len(thumbs) >= 3:
-                    break
-            o.item_thumbs = thumbs
-            o.item_more_count = max(0, o.items.count() - 1 - len(thumbs))
-        except Exception:
-            o.thumb_url = ""; o.first_size = ""; o.first_color = ""; o.first_item_name = ""; o.item_thumbs = []; o.item_more_count = 0
+    # First item thumb + size/color, resolved in bulk
+    orders = enrich_orders(qs.select_related("user")[:50])
 
     summary = qs.aggregate(total_amount=Sum("total_amount"))
     total_amount = summary.get("total_amount") or 0
@@ -293,58 +213,7 @@ def orders_partial(request):
     else:
         qs = qs.order_by("-created_at")
 
-    orders = (
-        qs.select_related("user").prefetch_related("items__product__images", "items__variant")
-    )[:50]
-    for o in orders:
-        try:
-            it = o.items.select_related("product", "variant").first()
-            if not it:
-                o.thumb_url = ""; o.first_size = ""; o.first_color = ""; o.first_item_name = ""; o.item_thumbs = []; o.item_more_count = 0; continue
-            size = (getattr(it.variant, "size", None) or it.variant_size or "")
-            color = (getattr(it.variant, "color", None) or it.variant_color or "")
-            thumb = ""
-            imgs = list(getattr(it.product, "images", None).all()) if getattr(it.product, "images", None) else []
-            if color:
-                low = str(color).strip().lower()
-                for im in imgs:
-                    c = (getattr(im, "color", "") or "").strip().lower()
-                    if c and c == low and getattr(im, "image", None) and getattr(im.image, "url", None):
-                        thumb = im.image.url; break
-            if not thumb and imgs:
-                first = imgs[0]
-                if getattr(first, "image", None) and getattr(first.image, "url", None):
-                    thumb = first.image.url
-            o.thumb_url = thumb
-            o.first_size = size
-            o.first_color = color
-            o.first_item_name = it.product.name
-            thumbs = []
-            for item in o.items.select_related("product", "variant").all():
-                t = ""
-                try:
-                    imlist = list(getattr(item.product, "images", None).all()) if getattr(item.product, "images", None) else []
-                    icol = (getattr(item.variant, "color", None) or item.variant_color or "")
-                    if icol:
-                        lowc = str(icol).strip().lower()
-                        for im in imlist:
-                            cc = (getattr(im, "color", "") or "").strip().lower()
-                            if cc and cc == lowc and getattr(im, "image", None) and getattr(im.image, "url", None):
-                                t = im.image.url; break
-                    if not t and imlist:
-                        fi = imlist[0]
-                        if getattr(fi, "image", None) and getattr(fi.image, "url", None):
-                            t = fi.image.url
-                except Exception:
-                    t = ""
-                if t and t != thumb and t not in thumbs:
-                    thumbs.append(t)
-                if len(thumbs) >= 3:
-                    break
-            o.item_thumbs = thumbs
-            o.item_more_count = max(0, o.items.count() - 1 - len(thumbs))
-        except Exception:
-            o.thumb_url = ""; o.first_size = ""; o.first_color = ""; o.first_item_name = ""; o.item_thumbs = []; o.item_more_count = 0
+    orders = enrich_orders(qs.select_related("user")[:50])
     summary = qs.aggregate(total_amount=Sum("total_amount"))
     total_amount = summary.get("total_amount") or 0
     total_orders = qs.count()
@@ -364,41 +233,9 @@ def orders_partial(request):
 
 @staff_member_required(login_url="/accounts/login/")
 def order_detail_admin(request, pk: int):
-    order = get_object_or_404(
-        Order.objects.select_related("user").prefetch_related("items__product__images", "items__variant"),
-        pk=pk,
-    )
-    # Build color-aware thumbnails and expose size/color for each item
-    items = []
-    for it in order.items.select_related("product", "variant").all():
-        size = (getattr(it.variant, "size", None) or it.variant_size or "")
-        color = (getattr(it.variant, "color", None) or it.variant_color or "")
-        img_url = ""
-        try:
-            imgs = list(getattr(it.product, "images", None).all()) if getattr(it.product, "images", None) else []
-            if color:
-                low = str(color).strip().lower()
-                for im in imgs:
-                    c = (getattr(im, "color", "") or "").strip().lower()
-                    if c and c == low and getattr(im, "image", None) and getattr(im.image, "url", None):
-                        img_url = im.image.url
-                        break
-            if not img_url and imgs:
-                first = imgs[0]
-                if getattr(first, "image", None) and getattr(first.image, "url", None):
-                    img_url = first.image.url
-        except Exception:
-            img_url = ""
-        items.append({
-            "product": it.product,
-            "variant": it.variant,
-            "size": size,
-            "color": color,
-            "qty": it.quantity,
-            "unit_price": it.unit_price,
-            "line_total": it.line_total,
-            "img_url": img_url,
-        })
+    order = get_object_or_404(Order.objects.select_related("user"), pk=pk)
+    # Color-aware thumbnails and size/color for each item
+    items = order_item_rows(order)
     return render(request, "dashboard/order_detail.html", {"order": order, "items": items})
 
 
@@ -871,19 +708,19 @@ def toggle_user_active(request, pk: int):
 
 @staff_member_required(login_url="/accounts/login/")
 def users_csv(request):
-    User = get_user_model()
-    q = request.GET.get('q', '').strip()
-    qs = User.objects.all()
-    if q:
-        qs = qs.filter(username__icontains=q) | qs.filter(email__icontains=q)
-    resp = HttpResponse(content_type='text/csv')
-    resp['Content-Disposition'] = 'attachment; filename="users.csv"'
-    import csv
-    w = csv.writer(resp)
-    w.writerow(['id','username','email','is_staff','is_active','date_joined','last_login'])
-    for u in qs.order_by('-date_joined'):
-        w.writerow([u.id, u.username, u.email or '', u.is_staff, u.is_active, u.date_joined, u.last_login or ''])
-    return resp
+    return exports.stream_csv("users.csv", exports.USER_COLUMNS, exports.user_rows(request))
+
+
+@staff_member_required(login_url="/accounts/login/")
+def orders_csv(request):
+    header = [name for name, _ in exports.ORDER_COLUMNS]
+    return exports.stream_csv("orders.csv", header, exports.order_rows(request))
+
+
+@staff_member_required(login_url="/accounts/login/")
+def order_items_csv(request):
+    header = [name for name, _ in exports.ORDER_ITEM_COLUMNS]
+    return exports.stream_csv("order-items.csv", header, exports.order_item_rows(request))
 
 
 @staff_member_required(login_url="/accounts/login/")
@@ -939,26 +776,16 @@ def update_order_status(request, pk: int):
     prev_status = order.status
     order.status = new_status
     order.save(update_fields=["status", "updated_at"])
-    # When moving into 'packed', decrement stock once
+    # Packing takes the units out of stock (once); cancelling before that
+    # returns any reservation to sale
     try:
-        if new_status == "packed" and not order.stock_debited:
-            for it in order.items.select_related("variant").all():
-                var = getattr(it, "variant", None)
-                if not var:
-                    continue
-                try:
-                    current = int(getattr(var, "stock", 0) or 0)
-                    new_val = max(0, current - int(it.quantity))
-                    if new_val != current:
-                        var.stock = new_val
-                        var.save(update_fields=["stock"])
-                except Exception:
-                    continue
-            order.stock_debited = True
-            order.save(update_fields=["stock_debited", "updated_at"])
+        if new_status == "packed":
+            debit_order(order)
+        elif new_status == "cancelled" and prev_status != "cancelled":
+            release_order(order, note="Order cancelled")
     except Exception:
-        # Do not break status update if stock debit fails
-        pass
+        # Do not break status update if the stock change fails
+        logger.exception("Stock update failed for order %s", order.order_number)
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         return JsonResponse({"ok": True, "status": order.status, "status_display": order.get_status_display()})
     messages.success(request, f"Order {order.order_number} status updated to {order.get_status_display()}")
@@ -1003,3 +830,47 @@ def delete_order(request, pk: int):
         messages.success(request, "Order deleted")
         return redirect("dashboard_orders")
     return render(request, "dashboard/confirm_delete.html", {"object": o, "object_type": "Order", "cancel_url": "/dashboard/orders/"})
+
+
+@staff_member_required(login_url="/accounts/login/")
+def jobs_list(request):
+    # Dead letters: jobs that exhausted their retries
+    failed = Job.objects.filter(status=Job.STATUS_FAILED).order_by("-updated_at")[:100]
+    counts = dict(Job.objects.order_by().values_list("status").annotate(n=Count("id")))
+    return render(request, "dashboard/jobs_list.html", {"jobs": failed, "counts": counts})
+
+
+@staff_member_required(login_url="/accounts/login/")
+@require_POST
+def job_retry(request, pk: int):
+    obj = get_object_or_404(Job, pk=pk, status=Job.STATUS_FAILED)
+    retry_job(obj)
+    messages.success(request, f"Job #{obj.pk} queued for retry")
+    return redirect("dashboard_jobs")
+
+
+@staff_member_required(login_url="/accounts/login/")
+@require_POST
+def job_delete(request, pk: int):
+    obj = get_object_or_404(Job, pk=pk, status=Job.STATUS_FAILED)
+    obj.delete()
+    messages.success(request, f"Job #{pk} deleted")
+    return redirect("dashboard_jobs")
+
+
+@staff_member_required(login_url="/accounts/login/")
+def announcements_list(request):
+    # Product/coupon fan-outs with their progress (accounts.announcements)
+    items = Announcement.objects.select_related("product")[:100]
+    return render(request, "dashboard/announcements_list.html", {"announcements": items})
+
+
+@staff_member_required(login_url="/accounts/login/")
+@require_POST
+def announcement_cancel(request, pk: int):
+    obj = get_object_or_404(Announcement, pk=pk)
+    if cancel_announcement(obj):
+        messages.success(request, f"Announcement \"{obj.title}\" cancelled")
+    else:
+        messages.info(request, "Announcement already finished")
+    return redirect("dashboard_announcements")
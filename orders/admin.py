@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib import messages
-from .models import Order, OrderItem, ReturnRequest, ReturnItem
+from .models import DailySalesFact, Order, OrderItem, ReturnRequest, ReturnItem, StockMovement, TrackingEvent
 from .shiprocket import create_shiprocket_shipment
 
 
@@ -23,7 +23,7 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ("order_number", "user", "status", "payment_method", "total_amount", "created_at")
+    list_display = ("order_number", "user", "status", "tracking_status", "payment_method", "total_amount", "created_at")
     list_filter = ("status", "payment_method", "created_at")
     search_fields = ("order_number", "user__username", "tracking_number")
     inlines = [OrderItemInline]
@@ -53,3 +53,26 @@ class ReturnRequestAdmin(admin.ModelAdmin):
     list_display = ("order", "user", "type", "status", "awb_code", "created_at")
     list_filter = ("type", "status", "created_at")
     search_fields = ("order__order_number", "user__username", "awb_code")
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "kind", "variant", "quantity", "order", "note")
+    list_filter = ("kind", "created_at")
+    search_fields = ("variant__sku", "order__order_number")
+    raw_id_fields = ("variant", "order")
+
+
+@admin.register(TrackingEvent)
+class TrackingEventAdmin(admin.ModelAdmin):
+    list_display = ("occurred_at", "awb", "status", "activity", "location", "source", "order")
+    list_filter = ("source", "status")
+    search_fields = ("awb", "order__order_number")
+    raw_id_fields = ("order",)
+
+
+@admin.register(DailySalesFact)
+class DailySalesFactAdmin(admin.ModelAdmin):
+    list_display = ("date", "orders", "units", "revenue", "net_sales", "tax", "shipping", "discount", "cost")
+    date_hierarchy = "date"
+    readonly_fields = ("updated_at",)
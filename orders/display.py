@@ -0,0 +1,121 @@
+"""Order thumbnails and item display rows for the dashboard and customer views.
+
+Order pages show each item with the product image matching its variant color
+(falling back to the product's first image). ``enrich_orders`` resolves that
+for a whole page of orders with two queries: the order items (with product
+and variant) and one pass over the images of every product involved, turned
+into a (product id, color) -> URL map.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from catalog.models import ProductImage
+from .models import Order, OrderItem
+
+
+EXTRA_THUMBS = 3
+
+
+class ImageUrlMap:
+    """(product id, lowercased color) -> image URL, with "" as the first image."""
+
+    def __init__(self, product_ids: Iterable[int]):
+        self._urls: Dict[Tuple[int, str], str] = {}
+        ids = {pid for pid in product_ids if pid}
+        if not ids:
+            return
+        storage = ProductImage._meta.get_field("image").storage
+        rows = (
+            ProductImage.objects.filter(product_id__in=ids)
+            .exclude(image="")
+            .order_by("id")
+            .values_list("product_id", "color", "image")
+        )
+        for pid, color, name in rows:
+            try:
+                url = storage.url(name)
+            except Exception:
+                continue
+            # First image per product, and first image per product color
+            self._urls.setdefault((pid, ""), url)
+            key = (color or "").strip().lower()
+            if key:
+                self._urls.setdefault((pid, key), url)
+
+    def url_for(self, product_id: int, color: Optional[str] = None) -> str:
+        key = (color or "").strip().lower()
+        if key and (product_id, key) in self._urls:
+            return self._urls[(product_id, key)]
+        return self._urls.get((product_id, ""), "")
+
+
+def item_size(it: OrderItem) -> str:
+    return getattr(it.variant, "size", None) or it.variant_size or ""
+
+
+def item_color(it: OrderItem) -> str:
+    return getattr(it.variant, "color", None) or it.variant_color or ""
+
+
+def _items_prefetch():
+    return Prefetch("items", queryset=OrderItem.objects.select_related("product", "variant").order_by("id"))
+
+
+def enrich_orders(orders: Iterable[Order], extra_thumbs: int = EXTRA_THUMBS) -> List[Order]:
+    """Attach first-item and thumbnail attributes to each order.
+
+    Sets ``thumb_url``, ``first_size``, ``first_color``, ``first_item_name``,
+    ``item_thumbs`` (up to ``extra_thumbs`` other distinct item images) and
+    ``item_more_count``. Items are prefetched, so templates iterating
+    ``o.items.all`` don't query again.
+    """
+    orders = list(orders)
+    prefetch_related_objects(orders, _items_prefetch())
+    urls = ImageUrlMap(it.product_id for o in orders for it in o.items.all())
+    for o in orders:
+        items = list(o.items.all())
+        o.thumb_url = ""
+        o.first_size = ""
+        o.first_color = ""
+        o.first_item_name = ""
+        o.item_thumbs = []
+        o.item_more_count = 0
+        if not items:
+            continue
+        first = items[0]
+        o.first_size = item_size(first)
+        o.first_color = item_color(first)
+        o.first_item_name = first.product.name
+        o.thumb_url = urls.url_for(first.product_id, o.first_color)
+        thumbs = []
+        for it in items:
+            t = urls.url_for(it.product_id, item_color(it))
+            if t and t != o.thumb_url and t not in thumbs:
+                thumbs.append(t)
+            if len(thumbs) >= extra_thumbs:
+                break
+        o.item_thumbs = thumbs
+        o.item_more_count = max(0, len(items) - 1 - len(thumbs))
+    return orders
+
+
+def order_item_rows(order: Order) -> List[dict]:
+    """Display rows for an order's items with size, color and matching image."""
+    items = list(order.items.select_related("product", "variant").order_by("id"))
+    urls = ImageUrlMap(it.product_id for it in items)
+    rows = []
+    for it in items:
+        color = item_color(it)
+        rows.append({
+            "obj": it,
+            "product": it.product,
+            "variant": it.variant,
+            "size": item_size(it),
+            "color": color,
+            "qty": it.quantity,
+            "unit_price": it.unit_price,
+            "line_total": it.line_total,
+            "img_url": urls.url_for(it.product_id, color),
+        })
+    return rows
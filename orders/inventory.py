@@ -0,0 +1,166 @@
+"""Stock reservations and debits with a ledger.
+
+Checkout reserves every line of an order (Variant.reserved), so concurrent
+checkouts can't sell the same units twice; packing the order debits the
+reservation from on-hand stock. A Razorpay order that isn't paid within
+STOCK_RESERVATION_TTL seconds releases its reservation (job
+"orders.release_stock"), as does cancelling an order before it is packed.
+
+Every change locks the order's variant rows with select_for_update (in id
+order, so concurrent checkouts can't deadlock) and is applied to all of them
+in one UPDATE built from F() expressions, then recorded as StockMovement rows.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from catalog.models import Variant
+from core.cache import bump_version
+from core.jobs import enqueue
+from .models import Order, StockMovement
+
+
+logger = logging.getLogger(__name__)
+
+class OutOfStock(Exception):
+    def __init__(self, variant: Variant, available: int):
+        self.variant = variant
+        self.available = available
+        super().__init__(f"Only {available} left of {variant}")
+
+
+def _order_quantities(order: Order) -> Dict[int, int]:
+    """Units per variant across the order's lines (product-only lines have no stock)."""
+    qty: Dict[int, int] = defaultdict(int)
+    for variant_id, quantity in order.items.filter(variant__isnull=False).values_list("variant_id", "quantity"):
+        qty[variant_id] += int(quantity)
+    return dict(qty)
+
+
+def _lock_variants(ids) -> Dict[int, Variant]:
+    rows = Variant.objects.select_for_update().filter(pk__in=ids).order_by("pk").only("id", "product_id", "stock", "reserved")
+    return {v.pk: v for v in rows}
+
+
+def _per_variant(qty: Dict[int, int]):
+    # CASE id WHEN ... THEN quantity: one UPDATE covers every line
+    return Case(*[When(pk=pk, then=Value(n)) for pk, n in qty.items()], default=Value(0), output_field=IntegerField())
+
+
+def _apply(order: Order, qty: Dict[int, int], kind: str, variants: Dict[int, Variant], note: str = "", **updates):
+    Variant.objects.filter(pk__in=list(qty)).update(**updates)
+    StockMovement.objects.bulk_create(
+        [StockMovement(variant_id=pk, order=order, kind=kind, quantity=n, note=note) for pk, n in qty.items()]
+    )
+    # Sellable stock feeds the cached variant matrix on product pages
+    for pid in {v.product_id for v in variants.values()}:
+        transaction.on_commit(lambda pid=pid: bump_version("product", pid))
+
+
+def stock_reservation_ttl() -> int:
+    return int(getattr(settings, "STOCK_RESERVATION_TTL", 30 * 60))
+
+
+def reserve_order(order: Order, ttl: Optional[int] = None) -> None:
+    """Reserve stock for every line of a new order, or raise OutOfStock.
+
+    ``ttl`` (seconds) makes the reservation lapse unless the order is paid
+    first; None keeps it until the order is packed or cancelled.
+    """
+    qty = _order_quantities(order)
+    with transaction.atomic():
+        variants = _lock_variants(qty)
+        for pk, n in qty.items():
+            variant = variants.get(pk)
+            available = variant.available_stock() if variant else 0
+            if n > available:
+                raise OutOfStock(variant, available)
+        if qty:
+            _apply(order, qty, StockMovement.KIND_RESERVE, variants, reserved=F("reserved") + _per_variant(qty))
+        order.stock_reserved = True
+        order.reserved_until = (timezone.now() + timedelta(seconds=ttl)) if ttl else None
+        Order.objects.filter(pk=order.pk).update(stock_reserved=True, reserved_until=order.reserved_until)
+    if ttl:
+        enqueue(
+            "orders.release_stock",
+            {"order_number": order.order_number},
+            key=f"stock-release:{order.order_number}",
+            delay=ttl,
+        )
+
+
+def confirm_reservation(order: Order) -> None:
+    """Hold a paid order's stock until it is packed.
+
+    Clears the reservation's TTL; if it already lapsed, reserves again
+    (best effort: a paid order is never rejected for stock here).
+    """
+    order.reserved_until = None
+    if Order.objects.filter(pk=order.pk, stock_reserved=True).update(reserved_until=None):
+        return
+    if order.stock_debited:
+        return
+    try:
+        reserve_order(order)
+    except OutOfStock as exc:
+        logger.warning("Paid order %s could not reserve stock: %s", order.order_number, exc)
+
+
+def release_order(order: Order, note: str = "", expired_before: Optional[datetime] = None) -> bool:
+    """Return an order's reserved units to sale; False if it held none.
+
+    With ``expired_before``, only a reservation whose TTL ended before then
+    is released. The check is made on the locked row, so a payment that
+    cleared the TTL after the caller looked keeps its stock.
+    """
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        if not locked.stock_reserved or locked.stock_debited:
+            return False
+        if expired_before is not None and (locked.reserved_until is None or locked.reserved_until > expired_before):
+            return False
+        qty = _order_quantities(locked)
+        variants = _lock_variants(qty)
+        if qty:
+            _apply(
+                locked, qty, StockMovement.KIND_RELEASE, variants, note,
+                reserved=Greatest(F("reserved") - _per_variant(qty), Value(0)),
+            )
+        Order.objects.filter(pk=order.pk).update(stock_reserved=False, reserved_until=None)
+    order.stock_reserved = False
+    order.reserved_until = None
+    return True
+
+
+def debit_order(order: Order) -> bool:
+    """Take a packed order's units out of on-hand stock, once.
+
+    Consumes the order's reservation; orders placed before reservations
+    existed are debited directly. Stock never goes below zero.
+    """
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        if locked.stock_debited:
+            return False
+        qty = _order_quantities(locked)
+        variants = _lock_variants(qty)
+        if qty:
+            per_variant = _per_variant(qty)
+            updates = {"stock": Greatest(F("stock") - per_variant, Value(0))}
+            if locked.stock_reserved:
+                updates["reserved"] = Greatest(F("reserved") - per_variant, Value(0))
+            _apply(locked, qty, StockMovement.KIND_SALE, variants, **updates)
+        Order.objects.filter(pk=order.pk).update(
+            stock_debited=True, stock_reserved=False, reserved_until=None, updated_at=timezone.now()
+        )
+    order.stock_debited = True
+    order.stock_reserved = False
+    order.reserved_until = None
+    return True
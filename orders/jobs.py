@@ -0,0 +1,52 @@
+import logging
+
+from django.utils import timezone
+
+from core.jobs import job
+from .inventory import release_order
+from .models import Order
+from .shiprocket import _enabled, create_shiprocket_shipment
+from .tracking import poll, schedule_poll
+
+
+logger = logging.getLogger(__name__)
+
+
+@job("orders.create_shipment")
+def create_shipment(order_number: str):
+    """Create the Shiprocket shipment for a paid order; raises so the queue retries.
+
+    A retry after the shipment was created only re-runs the AWB assignment
+    (the shipment id is saved on the order).
+    """
+    order = Order.objects.select_related("user").filter(order_number=order_number).first()
+    if order is None or order.tracking_number or order.status in ("cancelled", "refunded"):
+        return
+    if not _enabled():
+        return
+    if not create_shiprocket_shipment(order):
+        raise RuntimeError(f"Shiprocket did not assign an AWB for order {order_number}")
+    # Start (or join) the tracking poll chain now there is a shipment to follow
+    schedule_poll()
+
+
+@job("orders.release_stock")
+def release_stock(order_number: str):
+    """Release an unpaid checkout's reservation once its TTL has passed."""
+    order = Order.objects.filter(order_number=order_number, stock_reserved=True).first()
+    if order is None:
+        return
+    # The TTL is re-checked under the order's row lock: a payment landing now
+    # clears it, and a paid order's stock must not be released
+    release_order(order, note="Payment not completed in time", expired_before=timezone.now())
+
+
+@job("orders.poll_tracking")
+def poll_tracking():
+    """Fetch tracking for active shipments, then queue the next run."""
+    try:
+        poll()
+    except Exception:
+        # The next slot's run retries; a failing poll must not stop the chain
+        logger.exception("Tracking poll failed")
+    schedule_poll()
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders.models import Order
+from orders.sales import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySalesFact rollup from orders (all history by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Only the last N days")
+        parser.add_argument("--since", default=None, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--chunk", type=int, default=90, help="Days rebuilt per transaction")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options["since"]:
+            first = parse_date(options["since"])
+            if first is None:
+                raise CommandError("--since must be YYYY-MM-DD")
+        elif options["days"]:
+            first = today - timedelta(days=options["days"] - 1)
+        else:
+            span = Order.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+            if span["first"] is None:
+                self.stdout.write("No orders")
+                return
+            first = timezone.localdate(span["first"])
+            today = max(today, timezone.localdate(span["last"]))
+        total = 0
+        cursor = first
+        while cursor <= today:
+            last = min(today, cursor + timedelta(days=options["chunk"] - 1))
+            total += rebuild(cursor, last)
+            cursor = last + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {first}..{today}: {total} days with sales"))
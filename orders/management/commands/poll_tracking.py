@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from orders.tracking import poll, schedule_poll
+
+
+class Command(BaseCommand):
+    help = "Fetch Shiprocket tracking for active shipments now and queue the recurring poll job"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Most orders to poll (default: TRACKING_POLL_LIMIT)")
+        parser.add_argument("--no-schedule", action="store_true", help="Do not queue the orders.poll_tracking job")
+
+    def handle(self, *args, **options):
+        polled = poll(limit=options["limit"])
+        if not options["no_schedule"]:
+            schedule_poll()
+        self.stdout.write(self.style.SUCCESS(f"Polled {polled} shipments"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from orders.shiprocket import client, quote_cache
+
+
+class Command(BaseCommand):
+    help = "Show Shiprocket API latency and rate-quote cache counters"
+
+    def handle(self, *args, **options):
+        for endpoint, row in client.stats().items():
+            if not row["calls"]:
+                continue
+            avg = row["total_ms"] / row["calls"]
+            self.stdout.write(f"{endpoint}: {row['calls']} calls, avg {avg:.0f} ms, {row['errors']} errors")
+        stats = quote_cache.stats()
+        lookups = stats["hit"] + stats["stale"] + stats["miss"]
+        for name, value in stats.items():
+            self.stdout.write(f"quote.{name}: {value}")
+        if lookups:
+            served = stats["hit"] + stats["stale"]
+            self.stdout.write(f"quote.hit_ratio: {served / lookups:.1%}")
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:12
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+REVENUE_STATUSES = ("paid", "confirmed", "processing", "packed", "dispatched", "shipped", "out_for_delivery", "delivered")
+
+
+def backfill_daily_sales(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    DailySalesFact = apps.get_model("orders", "DailySalesFact")
+    orders = Order.objects.filter(status__in=REVENUE_STATUSES)
+    facts = {}
+    rows = orders.annotate(d=TruncDate("created_at")).values("d").annotate(
+        orders=Count("id"),
+        revenue=Sum("total_amount"),
+        net_sales=Sum("subtotal"),
+        tax=Sum("gst_amount"),
+        shipping=Sum("shipping_amount"),
+        discount=Sum("discount_amount"),
+    ).order_by()
+    for row in rows:
+        day = row.pop("d")
+        facts[day] = DailySalesFact(date=day, **{k: v or 0 for k, v in row.items()})
+    items = OrderItem.objects.filter(order__in=orders).annotate(d=TruncDate("order__created_at")).values("d").annotate(
+        cost=Sum("line_cost"), units=Sum("quantity")
+    ).order_by()
+    for row in items:
+        if row["d"] in facts:
+            facts[row["d"]].cost = row["cost"] or 0
+            facts[row["d"]].units = row["units"] or 0
+    DailySalesFact.objects.bulk_create(list(facts.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_razorpay_order_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shipping', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_daily_sales_facts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shipment_id',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
@@ -31,7 +31,7 @@ class Order(models.Model):
     order_number = models.CharField(max_length=20, unique=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="created")
     payment_method = models.CharField(max_length=12, choices=PAYMENT_METHODS)
-    razorpay_order_id = models.CharField(max_length=200, blank=True)
+    razorpay_order_id = models.CharField(max_length=200, blank=True, db_index=True)
     razorpay_payment_id = models.CharField(max_length=200, blank=True)
     razorpay_signature = models.CharField(max_length=200, blank=True)
 
@@ -52,12 +52,29 @@ class Order(models.Model):
     country = models.CharField(max_length=100, default="India")
 
     shipping_provider = models.CharField(max_length=100, default="Shiprocket")
-    tracking_number = models.CharField(max_length=100, blank=True)
+    tracking_number = models.CharField(max_length=100, blank=True, db_index=True)
+    # Shiprocket shipment created for this order, kept so a retry assigns an
+    # AWB to it instead of creating the order again
+    shipment_id = models.CharField(max_length=50, blank=True)
+    # Latest courier status (orders.tracking) and when it was last received
+    tracking_status = models.CharField(max_length=100, blank=True)
+    tracking_synced_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     # Whether stock has been decremented for this order (upon 'packed' status)
     stock_debited = models.BooleanField(default=False)
+    # Whether the order currently holds a stock reservation (orders.inventory),
+    # and when an unpaid reservation lapses
+    stock_reserved = models.BooleanField(default=False)
+    reserved_until = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status as loaded, so post_save can tell which sales totals it left (orders.sales)
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
 
     def __str__(self):
         return f"Order {self.order_number} ({self.user})"
@@ -115,3 +132,82 @@ class ReturnItem(models.Model):
 
     def __str__(self):
         return f"{self.order_item} -> {self.exchange_variant or '-'}"
+
+
+class StockMovement(models.Model):
+    """Ledger of every stock and reservation change made by orders.inventory."""
+
+    KIND_RESERVE = "reserve"
+    KIND_RELEASE = "release"
+    KIND_SALE = "sale"
+    KINDS = [
+        (KIND_RESERVE, "Reserved"),
+        (KIND_RELEASE, "Reservation released"),
+        (KIND_SALE, "Sold (stock debited)"),
+    ]
+
+    variant = models.ForeignKey(Variant, on_delete=models.PROTECT, related_name="stock_movements")
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name="stock_movements")
+    kind = models.CharField(max_length=10, choices=KINDS)
+    # Units moved; the effect on stock/reserved follows from kind
+    quantity = models.PositiveIntegerField()
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [models.Index(fields=["variant", "created_at"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity} x {self.variant_id}"
+
+
+class TrackingEvent(models.Model):
+    """A courier scan for an order's shipment (see orders.tracking)."""
+
+    SOURCE_WEBHOOK = "webhook"
+    SOURCE_POLL = "poll"
+    SOURCES = [(SOURCE_WEBHOOK, "Webhook"), (SOURCE_POLL, "Poll")]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="tracking_events")
+    awb = models.CharField(max_length=100)
+    # Shiprocket status label, e.g. "IN TRANSIT"
+    status = models.CharField(max_length=100, blank=True)
+    activity = models.CharField(max_length=255, blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    source = models.CharField(max_length=10, choices=SOURCES)
+    # Hash of the scan's fields: a redelivered or re-polled scan is stored once
+    fingerprint = models.CharField(max_length=40, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-occurred_at", "-id"]
+        indexes = [models.Index(fields=["order", "occurred_at"])]
+
+    def __str__(self):
+        return f"{self.awb} {self.status} @ {self.occurred_at}"
+
+
+class DailySalesFact(models.Model):
+    """Sales totals for one (store-local) day, maintained by orders.sales."""
+
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    # Order totals: revenue is the amount charged; net_sales is merchandise
+    # after discount, before GST and shipping (Order.subtotal)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shipping = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Sum of the items' snapshot cost (OrderItem.line_cost)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"Sales {self.date}: {self.orders} orders, {self.revenue}"
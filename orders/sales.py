@@ -0,0 +1,108 @@
+"""Daily sales rollup for dashboard analytics.
+
+DailySalesFact keeps one row per store-local day with the totals of that
+day's revenue orders, so charts read at most one row per day however many
+orders there are. ``rebuild`` recomputes a date range from the orders:
+order amounts and item sums (cost, units) are aggregated in separate
+queries, so an order's amounts are counted once rather than once per item.
+
+The Order/OrderItem signals in orders.signals call ``order_changed`` when a
+save or delete can move a day's totals, and the day is rebuilt after the
+transaction commits. Code that changes status with a queryset update calls
+``order_changed`` itself. ``manage.py backfill_sales_facts`` rebuilds history.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesFact, Order, OrderItem
+
+
+logger = logging.getLogger(__name__)
+
+# Orders that count as sales: paid (or accepted) and not cancelled or returned
+REVENUE_STATUSES = (
+    "paid",
+    "confirmed",
+    "processing",
+    "packed",
+    "dispatched",
+    "shipped",
+    "out_for_delivery",
+    "delivered",
+)
+
+_AMOUNTS = {
+    "revenue": "total_amount",
+    "net_sales": "subtotal",
+    "tax": "gst_amount",
+    "shipping": "shipping_amount",
+    "discount": "discount_amount",
+}
+
+
+def _bounds(first: date, last: date):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first, time.min), tz)
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def rebuild(first: date, last: Optional[date] = None) -> int:
+    """Recompute the facts for ``first``..``last`` (inclusive); returns days with sales."""
+    last = last or first
+    start, end = _bounds(first, last)
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end, status__in=REVENUE_STATUSES)
+    facts = {}
+    rows = (
+        orders.annotate(d=TruncDate("created_at"))
+        .values("d")
+        .annotate(orders=Count("id"), **{name: Sum(field) for name, field in _AMOUNTS.items()})
+        .order_by()
+    )
+    for row in rows:
+        day = row.pop("d")
+        facts[day] = DailySalesFact(date=day, **{k: v or 0 for k, v in row.items()})
+    items = (
+        OrderItem.objects.filter(order__in=orders)
+        .annotate(d=TruncDate("order__created_at"))
+        .values("d")
+        .annotate(cost=Sum("line_cost"), units=Sum("quantity"))
+        .order_by()
+    )
+    for row in items:
+        fact = facts.get(row["d"])
+        if fact is not None:
+            fact.cost = row["cost"] or 0
+            fact.units = row["units"] or 0
+    with transaction.atomic():
+        DailySalesFact.objects.filter(date__gte=first, date__lte=last).exclude(date__in=list(facts)).delete()
+        DailySalesFact.objects.bulk_create(
+            list(facts.values()),
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["date"],
+            update_fields=["orders", "units", "cost", "updated_at", *_AMOUNTS],
+        )
+    return len(facts)
+
+
+def _refresh(day: date) -> None:
+    try:
+        rebuild(day)
+    except Exception:
+        # Best effort: the day is corrected by its next change or a backfill
+        logger.exception("Could not refresh sales facts for %s", day)
+
+
+def order_changed(order: Order) -> None:
+    """Rebuild the order's day once the current transaction commits."""
+    if order.created_at is None:
+        return
+    day = timezone.localdate(order.created_at)
+    transaction.on_commit(lambda: _refresh(day))
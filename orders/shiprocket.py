@@ -1,11 +1,19 @@
 import logging
+import math
+import threading
 import time
 from datetime import datetime
 from decimal import Decimal
 from typing import Any, Dict, Optional, Iterable, List
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
+from django.core.cache import cache
+
+from catalog.packaging import parcel_for_items
+from core import metrics
 
 from .models import Order, OrderItem
 
@@ -13,8 +21,6 @@ from .models import Order, OrderItem
 logger = logging.getLogger(__name__)
 
 _SR_BASE = "https://apiv2.shiprocket.in/v1/external"
-_token: Optional[str] = None
-_token_expiry_ts: float = 0.0
 
 
 def _enabled() -> bool:
@@ -24,27 +30,146 @@ def _enabled() -> bool:
     return bool(settings.SHIPROCKET_EMAIL and settings.SHIPROCKET_PASSWORD and settings.SHIPROCKET_PICKUP_LOCATION)
 
 
-def _auth_headers() -> Dict[str, str]:
-    token = _get_token()
-    return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+class ShiprocketClient:
+    """HTTP client for the Shiprocket API.
 
+    Requests share one keep-alive ``requests.Session`` per process. Connection
+    failures are retried for every method; 429/5xx responses and read
+    timeouts only for GETs, so order creation is never sent twice. The auth
+    token is kept in the Django cache so all workers share one login; a cache
+    lock makes a single worker refresh it while the others wait for the new
+    token. Each call records ``shiprocket.<endpoint>`` timings and errors in
+    core.metrics.
+    """
 
-def _get_token() -> str:
-    global _token, _token_expiry_ts
-    now = time.time()
-    if _token and now < _token_expiry_ts:
-        return _token
-    email = settings.SHIPROCKET_EMAIL
-    password = settings.SHIPROCKET_PASSWORD
-    resp = requests.post(f"{_SR_BASE}/auth/login", json={"email": email, "password": password}, timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
-    _token = data.get("token")
+    TOKEN_KEY = "shiprocket:token"
+    TOKEN_LOCK_KEY = "shiprocket:token-lock"
     # Token TTL is typically 10 min; refresh slightly earlier
-    _token_expiry_ts = now + 9 * 60
-    if not _token:
-        raise RuntimeError("Shiprocket auth failed: token missing")
-    return _token
+    TOKEN_TTL = 9 * 60
+    ENDPOINTS = ("auth", "create_order", "assign_awb", "serviceability", "track", "track_bulk", "create_return")
+
+    def __init__(self, base_url: str = _SR_BASE):
+        self.base_url = base_url
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        # Created lazily so forked workers never share a parent's sockets
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    retry = Retry(
+                        total=3,
+                        connect=3,
+                        read=2,
+                        status=2,
+                        backoff_factor=0.3,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=frozenset({"GET", "HEAD"}),
+                        raise_on_status=False,
+                    )
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    # Auth
+
+    def _login(self) -> str:
+        with metrics.timed("shiprocket.auth"):
+            resp = self.session.post(
+                f"{self.base_url}/auth/login",
+                json={"email": settings.SHIPROCKET_EMAIL, "password": settings.SHIPROCKET_PASSWORD},
+                timeout=20,
+            )
+        resp.raise_for_status()
+        token = resp.json().get("token")
+        if not token:
+            raise RuntimeError("Shiprocket auth failed: token missing")
+        return token
+
+    def token(self, refresh: bool = False) -> str:
+        stale = None
+        try:
+            stale = cache.get(self.TOKEN_KEY)
+        except Exception:
+            logger.debug("Cache unavailable reading Shiprocket token", exc_info=True)
+        if stale and not refresh:
+            return stale
+        try:
+            acquired = cache.add(self.TOKEN_LOCK_KEY, 1, 30)
+        except Exception:
+            acquired = True
+        if not acquired:
+            # Another worker is logging in; wait for the token it stores
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                time.sleep(0.2)
+                try:
+                    token = cache.get(self.TOKEN_KEY)
+                except Exception:
+                    break
+                if token and token != stale:
+                    return token
+        try:
+            token = self._login()
+            try:
+                cache.set(self.TOKEN_KEY, token, self.TOKEN_TTL)
+            except Exception:
+                logger.debug("Cache unavailable storing Shiprocket token", exc_info=True)
+            return token
+        finally:
+            if acquired:
+                try:
+                    cache.delete(self.TOKEN_LOCK_KEY)
+                except Exception:
+                    pass
+
+    # Requests
+
+    def request(self, method: str, path: str, endpoint: str, timeout: int = 30, **kwargs) -> Dict[str, Any]:
+        """Call an API path and return the decoded JSON body; raises on HTTP errors."""
+        url = f"{self.base_url}{path}"
+        try:
+            with metrics.timed(f"shiprocket.{endpoint}"):
+                resp = self.session.request(method, url, headers=self._headers(), timeout=timeout, **kwargs)
+                if resp.status_code == 401:
+                    # Token revoked or expired early: log in again once
+                    resp = self.session.request(method, url, headers=self._headers(refresh=True), timeout=timeout, **kwargs)
+            resp.raise_for_status()
+            return resp.json() or {}
+        except Exception:
+            metrics.incr(f"shiprocket.{endpoint}.error")
+            raise
+
+    def _headers(self, refresh: bool = False) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token(refresh=refresh)}", "Content-Type": "application/json"}
+
+    def post(self, path: str, endpoint: str, payload: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        return self.request("POST", path, endpoint, json=payload, **kwargs)
+
+    def get(self, path: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        return self.request("GET", path, endpoint, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        names = []
+        for ep in self.ENDPOINTS:
+            names += [f"shiprocket.{ep}.count", f"shiprocket.{ep}.total_ms", f"shiprocket.{ep}.error"]
+        values = metrics.read(names)
+        return {
+            ep: {
+                "calls": values[f"shiprocket.{ep}.count"],
+                "total_ms": values[f"shiprocket.{ep}.total_ms"],
+                "errors": values[f"shiprocket.{ep}.error"],
+            }
+            for ep in self.ENDPOINTS
+        }
+
+
+client = ShiprocketClient()
 
 
 def _format_order_items(order: Order):
@@ -75,7 +200,9 @@ def _order_subtotal_from_items(order: Order) -> Decimal:
 def create_shiprocket_shipment(order: Order) -> Optional[str]:
     """Create a Shiprocket order + assign AWB. Returns AWB code or None.
 
-    Safe no-op if Shiprocket not enabled or already has tracking number.
+    Safe no-op if Shiprocket not enabled or already has tracking number. The
+    shipment id is saved as soon as the order is created, so a call after
+    the AWB assignment failed only retries the assignment.
     """
     try:
         if not _enabled():
@@ -84,42 +211,13 @@ def create_shiprocket_shipment(order: Order) -> Optional[str]:
         if order.tracking_number:
             logger.info("Order %s already has tracking: %s", order.order_number, order.tracking_number)
             return order.tracking_number
+        if order.shipment_id:
+            return _save_awb(order, _assign_awb(order.shipment_id))
 
         # Build order payload
         order_date = (order.created_at or datetime.utcnow()).strftime("%Y-%m-%d %H:%M")
         items = _format_order_items(order)
-        units_total = sum(i["units"] for i in items)
-        # Compute weight and dims from order items where available
-        total_weight_dec = Decimal("0.00")
-        max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
-        max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
-        max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
-        for it in order.items.select_related("product", "variant").all():
-            w = None
-            if it.variant and getattr(it.variant, "weight_kg", None):
-                w = Decimal(str(it.variant.weight_kg))
-            elif getattr(it.product, "weight_kg", None):
-                w = Decimal(str(it.product.weight_kg))
-            else:
-                w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
-            total_weight_dec += (w * Decimal(it.quantity))
-            lv = (getattr(it.variant, "length_cm", None) if it.variant else None) or getattr(it.product, "length_cm", None)
-            bv = (getattr(it.variant, "breadth_cm", None) if it.variant else None) or getattr(it.product, "breadth_cm", None)
-            hv = (getattr(it.variant, "height_cm", None) if it.variant else None) or getattr(it.product, "height_cm", None)
-            if lv:
-                try: max_l = max(max_l, int(lv))
-                except Exception: pass
-            if bv:
-                try: max_b = max(max_b, int(bv))
-                except Exception: pass
-            if hv:
-                try: max_h = max(max_h, int(hv))
-                except Exception: pass
-        total_weight = float(total_weight_dec)
-
-        l = max_l
-        b = max_b
-        h = max_h
+        parcel = parcel_for_items(order.items.all())
 
         payment_method = "Prepaid" if order.payment_method == "razorpay" else "COD"
         sub_total = float(_order_subtotal_from_items(order))
@@ -143,30 +241,25 @@ def create_shiprocket_shipment(order: Order) -> Optional[str]:
             "order_items": items,
             "payment_method": payment_method,
             "sub_total": sub_total,
-            "length": l,
-            "breadth": b,
-            "height": h,
-            "weight": total_weight,
+            "length": parcel.dims_cm[0],
+            "breadth": parcel.dims_cm[1],
+            "height": parcel.dims_cm[2],
+            "weight": float(parcel.weight_kg),
         }
         # Remove nulls
         payload = {k: v for k, v in payload.items() if v is not None}
 
         # Create order in Shiprocket
-        resp = requests.post(f"{_SR_BASE}/orders/create/adhoc", json=payload, headers=_auth_headers(), timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
+        data = client.post("/orders/create/adhoc", "create_order", payload)
         shipment_id = data.get("shipment_id") or (data.get("data") or {}).get("shipment_id")
         if not shipment_id:
             logger.warning("Shiprocket create order did not return shipment_id for %s: %s", order.order_number, data)
             return None
+        order.shipment_id = str(shipment_id)
+        order.save(update_fields=["shipment_id", "updated_at"])
 
         # Assign AWB (auto-assign best courier)
-        awb = _assign_awb(shipment_id)
-        if awb:
-            order.tracking_number = awb
-            order.shipping_provider = "Shiprocket"
-            order.save(update_fields=["tracking_number", "shipping_provider", "updated_at"])
-        return awb
+        return _save_awb(order, _assign_awb(shipment_id))
     except requests.HTTPError as http_err:
         logger.exception("Shiprocket HTTP error for %s: %s", order.order_number, http_err)
     except Exception as e:
@@ -174,16 +267,17 @@ def create_shiprocket_shipment(order: Order) -> Optional[str]:
     return None
 
 
+def _save_awb(order: Order, awb: Optional[str]) -> Optional[str]:
+    if awb:
+        order.tracking_number = awb
+        order.shipping_provider = "Shiprocket"
+        order.save(update_fields=["tracking_number", "shipping_provider", "updated_at"])
+    return awb
+
+
 def _assign_awb(shipment_id: Any) -> Optional[str]:
     try:
-        resp = requests.post(
-            f"{_SR_BASE}/courier/assign/awb",
-            json={"shipment_id": shipment_id},
-            headers=_auth_headers(),
-            timeout=30,
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        data = client.post("/courier/assign/awb", "assign_awb", {"shipment_id": shipment_id})
         # Different accounts may return under different keys; try common ones
         awb = data.get("awb_code") or (data.get("data") or {}).get("awb_code")
         return str(awb) if awb else None
@@ -192,6 +286,190 @@ def _assign_awb(shipment_id: Any) -> Optional[str]:
         return None
 
 
+def _weight_bucket(weight_kg: float) -> float:
+    # Couriers bill in half-kilo slabs; quote the slab the parcel falls into
+    step = float(getattr(settings, "SHIPROCKET_QUOTE_WEIGHT_STEP_KG", 0.5))
+    return max(step, math.ceil(round(weight_kg / step, 6)) * step)
+
+
+def _dim_bucket(cm: int) -> int:
+    step = int(getattr(settings, "SHIPROCKET_QUOTE_DIM_STEP_CM", 5))
+    return max(step, int(math.ceil(int(cm) / step)) * step)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Decimal] = None
+
+
+class RateQuoteCache:
+    """Cache for serviceability quotes keyed on the bucketed shipment shape.
+
+    Entries are ``(rate or None, fetched_at)``. Within SHIPROCKET_QUOTE_TTL an
+    entry is served as is; for SHIPROCKET_QUOTE_STALE_TTL after that it is
+    still served while one background refresh runs, so a slow Shiprocket never
+    delays the cart. "Not serviceable" answers are kept for the shorter
+    SHIPROCKET_QUOTE_NEGATIVE_TTL; failed calls are not cached.
+
+    Concurrent misses for the same key share one upstream call: threads in a
+    process wait on the first caller, and other processes wait (briefly) for
+    the value while a cache lock is held.
+    """
+
+    METRICS = ("hit", "miss", "stale", "error", "coalesced")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+
+    # Settings
+
+    def _ttl(self) -> int:
+        return int(getattr(settings, "SHIPROCKET_QUOTE_TTL", 6 * 3600))
+
+    def _stale_ttl(self) -> int:
+        return int(getattr(settings, "SHIPROCKET_QUOTE_STALE_TTL", 24 * 3600))
+
+    def _negative_ttl(self) -> int:
+        return int(getattr(settings, "SHIPROCKET_QUOTE_NEGATIVE_TTL", 600))
+
+    # Cache entries
+
+    def _read(self, key: str):
+        try:
+            return cache.get(f"shiprocket:quote:{key}")
+        except Exception:
+            return None
+
+    def _write(self, key: str, rate: Optional[Decimal]):
+        ttl = self._ttl() if rate is not None else self._negative_ttl()
+        try:
+            cache.set(f"shiprocket:quote:{key}", (rate, time.time()), ttl + self._stale_ttl())
+        except Exception:
+            logger.debug("Could not cache Shiprocket quote %s", key, exc_info=True)
+
+    def _fresh(self, entry) -> bool:
+        rate, fetched_at = entry
+        ttl = self._ttl() if rate is not None else self._negative_ttl()
+        return time.time() - fetched_at < ttl
+
+    # Lookup
+
+    def get(self, key: str, fetch) -> Optional[Decimal]:
+        entry = self._read(key)
+        if entry is not None:
+            if self._fresh(entry):
+                metrics.incr("shiprocket.quote.hit")
+                return entry[0]
+            metrics.incr("shiprocket.quote.stale")
+            self._refresh_in_background(key, fetch)
+            return entry[0]
+        metrics.incr("shiprocket.quote.miss")
+        return self._single_flight(key, fetch)
+
+    def _fetch_and_store(self, key: str, fetch) -> Optional[Decimal]:
+        try:
+            rate = fetch()
+        except Exception:
+            metrics.incr("shiprocket.quote.error")
+            logger.exception("Shiprocket rate quote failed for %s", key)
+            return None
+        self._write(key, rate)
+        return rate
+
+    def _single_flight(self, key: str, fetch) -> Optional[Decimal]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            metrics.incr("shiprocket.quote.coalesced")
+            flight.done.wait(35)
+            return flight.result
+        try:
+            flight.result = self._fetch_across_processes(key, fetch)
+            return flight.result
+        finally:
+            flight.done.set()
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def _fetch_across_processes(self, key: str, fetch) -> Optional[Decimal]:
+        lock_key = f"shiprocket:quote-lock:{key}"
+        try:
+            acquired = cache.add(lock_key, 1, 35)
+        except Exception:
+            acquired = True
+        if not acquired:
+            # Another worker is fetching this quote; give it a moment
+            deadline = time.time() + 3
+            while time.time() < deadline:
+                time.sleep(0.1)
+                entry = self._read(key)
+                if entry is not None:
+                    metrics.incr("shiprocket.quote.coalesced")
+                    return entry[0]
+            return self._fetch_and_store(key, fetch)
+        try:
+            return self._fetch_and_store(key, fetch)
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass
+
+    def _refresh_in_background(self, key: str, fetch):
+        try:
+            if not cache.add(f"shiprocket:quote-refresh:{key}", 1, 60):
+                return
+        except Exception:
+            return
+
+        def _run():
+            try:
+                self._fetch_and_store(key, fetch)
+            finally:
+                try:
+                    cache.delete(f"shiprocket:quote-refresh:{key}")
+                except Exception:
+                    pass
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def stats(self) -> Dict[str, int]:
+        values = metrics.read(f"shiprocket.quote.{m}" for m in self.METRICS)
+        return {m: values[f"shiprocket.quote.{m}"] for m in self.METRICS}
+
+
+quote_cache = RateQuoteCache()
+
+
+def _fetch_cheapest_rate(payload: Dict[str, Any]) -> Optional[Decimal]:
+    """Cheapest courier rate for a serviceability payload; None if not serviceable."""
+    data = client.post("/courier/serviceability/", "serviceability", payload)
+    companies: Iterable[Dict[str, Any]] = (
+        (data.get("data") or {}).get("available_courier_companies")
+        or data.get("available_courier_companies")
+        or []
+    )
+    rates: list[Decimal] = []
+    for c in companies:
+        rate = c.get("rate")
+        if rate is None:
+            # fallback fields sometimes present
+            rate = c.get("freight_charge") or c.get("total_amount")
+        try:
+            if rate is not None:
+                rates.append(Decimal(str(rate)))
+        except Exception:
+            continue
+    if not rates:
+        return None
+    return min(rates)
+
+
 def estimate_shipping_charge(
     drop_pin: str,
     units_total: int,
@@ -204,6 +482,10 @@ def estimate_shipping_charge(
 
     Returns the cheapest available rate as Decimal, or None on failure.
     Requires SHIPROCKET_ENABLED and SHIPROCKET_PICKUP_PIN to be configured.
+    Quotes are cached per (pickup pin, drop pin, weight slab, dimension
+    bucket, billed slab, COD) by ``quote_cache``. Weight is rounded up to the
+    courier's slab before quoting; dimensions are quoted as given and only
+    bucketed in the cache key, with the volumetric slab they bill at.
     """
     try:
         if not _enabled():
@@ -222,42 +504,32 @@ def estimate_shipping_charge(
             l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
             b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
             h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
+        weight = _weight_bucket(weight)
+        l, b, h = int(l), int(b), int(h)
+        # Couriers bill the larger of dead and volumetric weight, so parcels
+        # sharing a dimension bucket only share a rate at the same billed slab
+        divisor = float(getattr(settings, "SHIPROCKET_VOLUMETRIC_DIVISOR", 5000))
+        billed = max(weight, _weight_bucket(l * b * h / divisor))
         payload: Dict[str, Any] = {
             "pickup_postcode": str(pickup_pin),
-            "delivery_postcode": str(drop_pin),
+            "delivery_postcode": str(drop_pin).strip(),
             "weight": weight,
             "cod": 1 if cod else 0,
             "length": l,
             "breadth": b,
             "height": h,
         }
+        dims = "x".join(str(_dim_bucket(d)) for d in (l, b, h))
+        key = f"{payload['pickup_postcode']}:{payload['delivery_postcode']}:{weight}:{dims}:{billed}:{payload['cod']}"
         if declared_value is not None:
             try:
                 payload["declared_value"] = float(declared_value)
+                if cod:
+                    # COD fees scale with the collected amount: bucket it into the key
+                    key += f":{int(payload['declared_value'] // 500)}"
             except Exception:
                 pass
-        resp = requests.post(f"{_SR_BASE}/courier/serviceability/", json=payload, headers=_auth_headers(), timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        companies: Iterable[Dict[str, Any]] = (
-            (data.get("data") or {}).get("available_courier_companies")
-            or data.get("available_courier_companies")
-            or []
-        )
-        rates: list[Decimal] = []
-        for c in companies:
-            rate = c.get("rate")
-            if rate is None:
-                # fallback fields sometimes present
-                rate = c.get("freight_charge") or c.get("total_amount")
-            try:
-                if rate is not None:
-                    rates.append(Decimal(str(rate)))
-            except Exception:
-                continue
-        if not rates:
-            return None
-        return min(rates)
+        return quote_cache.get(key, lambda: _fetch_cheapest_rate(payload))
     except Exception:
         logger.exception("Shiprocket rate estimate failed for drop_pin=%s", drop_pin)
         return None
@@ -270,9 +542,7 @@ def track_awb(awb_code: str) -> Optional[Dict[str, Any]]:
     try:
         if not _enabled() or not awb_code:
             return None
-        resp = requests.get(f"{_SR_BASE}/courier/track/awb/{awb_code}", headers=_auth_headers(), timeout=30)
-        resp.raise_for_status()
-        data = resp.json() or {}
+        data = client.get(f"/courier/track/awb/{awb_code}", "track")
         # Normalize common fields
         track_data = data.get("tracking_data") or data
         shipment_status = (track_data.get("shipment_status") or track_data.get("current_status"))
@@ -283,6 +553,25 @@ def track_awb(awb_code: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def track_awbs(awb_codes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Raw ``tracking_data`` for several AWBs in one call, keyed by AWB.
+
+    AWBs missing from the response (unknown, or no scans yet) are left out;
+    raises on HTTP errors so pollers can retry.
+    """
+    awbs = [a for a in awb_codes if a]
+    if not _enabled() or not awbs:
+        return {}
+    data = client.post("/courier/track/awbs", "track_bulk", {"awbs": awbs})
+    out: Dict[str, Dict[str, Any]] = {}
+    for awb, body in (data or {}).items():
+        if isinstance(body, dict):
+            track_data = body.get("tracking_data") or body
+            if isinstance(track_data, dict):
+                out[str(awb)] = track_data
+    return out
+
+
 def create_shiprocket_return(order: Order, items: List[OrderItem]) -> Optional[str]:
     """Create a Shiprocket return (reverse pickup) for given order items.
     Returns return AWB code on success.
@@ -293,41 +582,14 @@ def create_shiprocket_return(order: Order, items: List[OrderItem]) -> Optional[s
         # Build return order payload — mirror original shipment, customer address is pickup here
         order_date = (order.created_at or datetime.utcnow()).strftime("%Y-%m-%d %H:%M")
         line_items = []
-        units_total = 0
-        total_weight_dec = Decimal("0.00")
-        max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
-        max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
-        max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
         for it in items:
             name = str(it.product)
             if it.variant:
                 name = f"{name} - {it.variant.size}/{it.variant.color}"
             sku = it.variant.sku if it.variant else f"SKU-{it.product.id}"
             qty = int(it.quantity)
-            units_total += qty
             line_items.append({"name": name, "sku": sku, "units": qty, "selling_price": float(it.unit_price)})
-            # weight/dims
-            w = None
-            if it.variant and getattr(it.variant, "weight_kg", None):
-                w = Decimal(str(it.variant.weight_kg))
-            elif getattr(it.product, "weight_kg", None):
-                w = Decimal(str(it.product.weight_kg))
-            else:
-                w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
-            total_weight_dec += (w * Decimal(qty))
-            lv = (getattr(it.variant, "length_cm", None) if it.variant else None) or getattr(it.product, "length_cm", None)
-            bv = (getattr(it.variant, "breadth_cm", None) if it.variant else None) or getattr(it.product, "breadth_cm", None)
-            hv = (getattr(it.variant, "height_cm", None) if it.variant else None) or getattr(it.product, "height_cm", None)
-            if lv:
-                try: max_l = max(max_l, int(lv))
-                except Exception: pass
-            if bv:
-                try: max_b = max(max_b, int(bv))
-                except Exception: pass
-            if hv:
-                try: max_h = max(max_h, int(hv))
-                except Exception: pass
-        total_weight = float(total_weight_dec)
+        parcel = parcel_for_items(items)
 
         payload = {
             "order_id": f"RET-{order.order_number}",
@@ -353,14 +615,12 @@ def create_shiprocket_return(order: Order, items: List[OrderItem]) -> Optional[s
             "delivery_email": getattr(order.user, "email", "") or "",
             "delivery_phone": order.shipping_phone,
             "order_items": line_items,
-            "length": max_l,
-            "breadth": max_b,
-            "height": max_h,
-            "weight": total_weight,
+            "length": parcel.dims_cm[0],
+            "breadth": parcel.dims_cm[1],
+            "height": parcel.dims_cm[2],
+            "weight": float(parcel.weight_kg),
         }
-        resp = requests.post(f"{_SR_BASE}/orders/create/return", json=payload, headers=_auth_headers(), timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
+        data = client.post("/orders/create/return", "create_return", payload)
         # Some accounts return awb_code directly
         awb = data.get("awb_code") or (data.get("data") or {}).get("awb_code")
         if awb:
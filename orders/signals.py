@@ -1,32 +1,48 @@
 import logging
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Order
+from .models import Order, OrderItem
+from .sales import REVENUE_STATUSES, order_changed
 from django.core.mail import EmailMultiAlternatives
-from threading import Thread
 from django.template.loader import render_to_string
 from django.contrib.sites.models import Site
-from .shiprocket import create_shiprocket_shipment
+from core.jobs import enqueue
+from core.mail import send_async
 
 logger = logging.getLogger(__name__)
 
 
-@receiver(post_save, sender=Order)
-def create_shiprocket_on_paid(sender, instance: Order, created: bool, **kwargs):
-    # Auto-create shipment only when order is paid and Shiprocket is enabled
+def queue_shipment(order: Order) -> None:
+    """Queue Shiprocket shipment creation for a paid order, once.
+
+    Called by the post_save receiver and by code that marks orders paid with
+    a queryset update (which sends no signal).
+    """
     try:
         if not getattr(settings, "SHIPROCKET_ENABLED", False):
             return
-        if instance.status != "paid":
+        if order.status != "paid":
             return
-        if instance.tracking_number:
+        if order.tracking_number:
             return
-        # Best-effort; do not raise exceptions
-        create_shiprocket_shipment(instance)
+        # Run by the job worker so saving an order never waits on Shiprocket;
+        # the key makes repeated saves of a paid order enqueue a single job
+        enqueue(
+            "orders.create_shipment",
+            {"order_number": order.order_number},
+            key=f"shiprocket-shipment:{order.order_number}",
+        )
     except Exception:
-        logger.exception("Error in Shiprocket post-save handler for %s", instance.order_number)
+        logger.exception("Error queueing Shiprocket shipment for %s", order.order_number)
+
+
+@receiver(post_save, sender=Order)
+def create_shiprocket_on_paid(sender, instance: Order, created: bool, **kwargs):
+    # Queue shipment creation only when order is paid and Shiprocket is enabled
+    queue_shipment(instance)
 
 
 @receiver(post_save, sender=Order)
@@ -38,6 +54,12 @@ def notify_new_order_created(sender, instance: Order, created: bool, **kwargs):
     """
     if not created:
         return
+    # After commit: the order's items exist by then, and a checkout that
+    # rolls back (e.g. out of stock) sends nothing
+    transaction.on_commit(lambda: _send_new_order_alert(instance))
+
+
+def _send_new_order_alert(instance: Order):
     try:
         recipients = list(getattr(settings, "ORDER_ALERT_EMAILS", []) or [])
         if not recipients:
@@ -57,7 +79,7 @@ def notify_new_order_created(sender, instance: Order, created: bool, **kwargs):
 
         ctx = {
             "order": instance,
-            "items": list(instance.items.all()),
+            "items": list(instance.items.select_related("product", "variant__product")),
             "CURRENCY_SYMBOL": getattr(settings, "CURRENCY_SYMBOL", "₹"),
             "site_name": site_name,
             "site_domain": site_domain,
@@ -71,12 +93,50 @@ def notify_new_order_created(sender, instance: Order, created: bool, **kwargs):
         from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None) or None
         msg = EmailMultiAlternatives(subject, text_body, from_email, recipients)
         msg.attach_alternative(html_body, "text/html")
-        # Send asynchronously to avoid blocking request thread on SMTP connect
-        def _send(m):
-            try:
-                m.send(fail_silently=True)
-            except Exception:
-                logger.exception("Email send failed for order %s", instance.order_number)
-        Thread(target=_send, args=(msg,), daemon=True).start()
+        # Queued for the mail senders so the request never waits on SMTP
+        send_async(msg)
     except Exception:
         logger.exception("Failed to send new-order alert for %s", instance.order_number)
+
+
+# Order fields that feed the daily sales facts
+_SALES_FIELDS = {"status", "created_at", "total_amount", "subtotal", "gst_amount", "shipping_amount", "discount_amount"}
+
+
+@receiver(post_save, sender=Order)
+def order_sales_changed(sender, instance: Order, created: bool, update_fields=None, **kwargs):
+    """Refresh the order's day when it enters, leaves or changes within the sales totals."""
+    try:
+        if update_fields is not None and not (set(update_fields) & _SALES_FIELDS):
+            return
+        was = getattr(instance, "_loaded_status", None)
+        if update_fields is not None and set(update_fields) & _SALES_FIELDS == {"status"} \
+                and was in REVENUE_STATUSES and instance.status in REVENUE_STATUSES:
+            # e.g. paid -> dispatched: still a sale, same amounts
+            pass
+        elif instance.status in REVENUE_STATUSES or was in REVENUE_STATUSES:
+            order_changed(instance)
+        instance._loaded_status = instance.status
+    except Exception:
+        logger.exception("Sales fact refresh failed for %s", instance.order_number)
+
+
+@receiver(post_delete, sender=Order)
+def order_sales_deleted(sender, instance: Order, **kwargs):
+    if instance.status in REVENUE_STATUSES:
+        order_changed(instance)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_sales_changed(sender, instance: OrderItem, **kwargs):
+    """Item edits move a sales day's cost and units (bulk-created checkout lines send no signal)."""
+    if isinstance(kwargs.get("origin"), Order):
+        # Deleted with its order; the order's own handler refreshes the day
+        return
+    try:
+        order = Order.objects.filter(pk=instance.order_id, status__in=REVENUE_STATUSES).only("created_at").first()
+        if order is not None:
+            order_changed(order)
+    except Exception:
+        logger.exception("Sales fact refresh failed for order item %s", instance.pk)
@@ -0,0 +1,223 @@
+"""Shipment tracking kept in the database.
+
+Courier scans arrive two ways: Shiprocket pushes them to ``tracking_webhook``,
+and the ``orders.poll_tracking`` job fetches the shipments the webhook has not
+refreshed lately, many AWBs per API call. Both hand the raw payload to
+``record``, which stores new scans as TrackingEvent rows (a scan's fingerprint
+is unique, so redelivered or re-polled scans are skipped), keeps
+Order.tracking_status current and moves Order.status forward along
+dispatched -> out_for_delivery -> delivered. The track page renders from
+these rows only and never calls Shiprocket.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import metrics
+from core.jobs import enqueue
+
+from .inventory import debit_order
+from .models import Order, TrackingEvent
+from .shiprocket import track_awbs
+
+
+logger = logging.getLogger(__name__)
+
+# Orders whose shipment may still produce scans
+ACTIVE_STATUSES = ("paid", "confirmed", "processing", "packed", "dispatched", "shipped", "out_for_delivery")
+
+# Forward order of statuses tracking may move between; any other status
+# (cancelled, refunded, returns) is never changed by a scan
+_RANK = {
+    "created": 0,
+    "paid": 1,
+    "confirmed": 1,
+    "processing": 1,
+    "packed": 2,
+    "dispatched": 3,
+    "shipped": 3,
+    "out_for_delivery": 4,
+    "delivered": 5,
+}
+
+_IN_TRANSIT_LABELS = ("PICKED UP", "SHIPPED", "IN TRANSIT", "REACHED", "HUB", "MISROUTED", "DELAYED")
+
+_DATE_FORMATS = ("%d %m %Y %H:%M:%S", "%d-%m-%Y %H:%M:%S", "%d %b %Y %H:%M")
+
+
+def poll_interval() -> int:
+    return int(getattr(settings, "TRACKING_POLL_INTERVAL", 3600))
+
+
+def order_status_for(label: str) -> Optional[str]:
+    """Order status implied by a Shiprocket status label, if any."""
+    s = (label or "").upper()
+    if not s or any(word in s for word in ("RTO", "RETURN", "CANCEL", "LOST", "UNDELIVERED", "DAMAGED")):
+        return None
+    if "OUT FOR DELIVERY" in s:
+        return "out_for_delivery"
+    if "DELIVERED" in s:
+        return "delivered"
+    if "PICKUP" in s:
+        # Pickup scheduled/queued: the parcel has not left yet
+        return None
+    if any(word in s for word in _IN_TRANSIT_LABELS):
+        return "dispatched"
+    return None
+
+
+def _parse_date(raw) -> Optional[datetime]:
+    if not raw:
+        return None
+    raw = str(raw).strip()
+    value = parse_datetime(raw)
+    if value is None:
+        for fmt in _DATE_FORMATS:
+            try:
+                value = datetime.strptime(raw, fmt)
+                break
+            except ValueError:
+                continue
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        # Shiprocket reports local (store) time
+        value = timezone.make_aware(value)
+    return value
+
+
+def _normalize(payload: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+    """(current status label, scans) from a webhook body or a track API tracking_data."""
+    scans = payload.get("scans") or payload.get("shipment_track_activities") or []
+    current = payload.get("current_status")
+    if not current:
+        track = payload.get("shipment_track") or []
+        if track and isinstance(track[0], dict):
+            current = track[0].get("current_status")
+    if not current and isinstance(payload.get("shipment_status"), str):
+        current = payload["shipment_status"]
+    scans = [s for s in scans if isinstance(s, dict)]
+    if not current and scans:
+        current = _scan_label(scans[0])
+    return str(current or "").strip(), scans
+
+
+def _scan_label(scan: Dict[str, Any]) -> str:
+    return str(scan.get("sr-status-label") or scan.get("status") or "").strip()
+
+
+def _fingerprint(awb: str, scan: Dict[str, Any]) -> str:
+    raw = "|".join(
+        str(scan.get(k) or "") for k in ("date", "status", "sr-status-label", "activity", "location")
+    )
+    return hashlib.sha1(f"{awb}|{raw}".encode()).hexdigest()
+
+
+def record(order: Order, payload: Dict[str, Any], source: str) -> int:
+    """Store a tracking payload for ``order``; returns the number of new scans."""
+    awb = order.tracking_number
+    current, scans = _normalize(payload)
+    rows = {}
+    for scan in scans:
+        fp = _fingerprint(awb, scan)
+        rows[fp] = TrackingEvent(
+            order=order,
+            awb=awb,
+            status=_scan_label(scan)[:100],
+            activity=str(scan.get("activity") or "")[:255],
+            location=str(scan.get("location") or "")[:255],
+            occurred_at=_parse_date(scan.get("date")),
+            source=source,
+            fingerprint=fp,
+        )
+    now = timezone.now()
+    with transaction.atomic():
+        if rows:
+            seen = set(TrackingEvent.objects.filter(fingerprint__in=list(rows)).values_list("fingerprint", flat=True))
+            new = [row for fp, row in rows.items() if fp not in seen]
+            # ignore_conflicts covers a concurrent webhook and poll of the same scan
+            TrackingEvent.objects.bulk_create(new, ignore_conflicts=True)
+        else:
+            new = []
+        # Compared and saved under the row lock: a webhook and a poll of the
+        # same AWB must not move the status backwards
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        fields = ["tracking_synced_at", "updated_at"]
+        locked.tracking_synced_at = now
+        if current and current != locked.tracking_status:
+            locked.tracking_status = current[:100]
+            fields.append("tracking_status")
+        target = order_status_for(current)
+        if target and locked.status in _RANK and _RANK[target] > _RANK[locked.status]:
+            locked.status = target
+            fields.append("status")
+        locked.save(update_fields=fields)
+    for name in ("tracking_synced_at", "tracking_status", "status", "stock_debited", "updated_at"):
+        setattr(order, name, getattr(locked, name))
+    if "status" in fields and not locked.stock_debited:
+        # A shipment that left the warehouse was packed, even if nobody marked it
+        try:
+            debit_order(locked)
+        except Exception:
+            logger.exception("Stock debit failed for shipped order %s", order.order_number)
+    metrics.incr(f"tracking.{source}.scans", len(new))
+    return len(new)
+
+
+def _due_orders(limit: int):
+    stale = timezone.now() - timedelta(seconds=poll_interval())
+    return (
+        Order.objects.exclude(tracking_number="")
+        .filter(status__in=ACTIVE_STATUSES)
+        .filter(Q(tracking_synced_at__isnull=True) | Q(tracking_synced_at__lt=stale))
+        .order_by(F("tracking_synced_at").asc(nulls_first=True), "id")[:limit]
+    )
+
+
+def _chunks(items: List[Order], size: int) -> Iterable[List[Order]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def poll(limit: Optional[int] = None) -> int:
+    """Refresh active shipments not updated within the poll interval; returns orders polled.
+
+    Shipments the webhook refreshed recently are skipped, so the poller only
+    fills gaps. Orders are marked synced even when Shiprocket has no scans
+    for them yet, so they do not starve the rest of the queue.
+    """
+    orders = list(_due_orders(limit or int(getattr(settings, "TRACKING_POLL_LIMIT", 500))))
+    batch = int(getattr(settings, "TRACKING_POLL_BATCH", 50))
+    polled = 0
+    for chunk in _chunks(orders, batch):
+        data = track_awbs(o.tracking_number for o in chunk)
+        for order in chunk:
+            payload = data.get(order.tracking_number)
+            try:
+                if payload:
+                    record(order, payload, TrackingEvent.SOURCE_POLL)
+            except Exception:
+                logger.exception("Could not record tracking for %s", order.order_number)
+        Order.objects.filter(pk__in=[o.pk for o in chunk]).update(tracking_synced_at=timezone.now())
+        polled += len(chunk)
+    return polled
+
+
+def schedule_poll() -> None:
+    """Queue the next poll while any shipment is still active.
+
+    Jobs are keyed by interval slot, so any number of callers queue one run.
+    """
+    if not Order.objects.exclude(tracking_number="").filter(status__in=ACTIVE_STATUSES).exists():
+        return
+    interval = poll_interval()
+    slot = int(time.time() // interval) + 1
+    enqueue("orders.poll_tracking", key=f"tracking-poll:{slot}", delay=max(0.0, slot * interval - time.time()))
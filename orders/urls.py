@@ -11,4 +11,6 @@ urlpatterns = [
     path("order/<str:order_number>/track/", views.order_track, name="order_track"),
     path("order/<str:order_number>/return/", views.order_return_request, name="order_return_request"),
     path("order/<str:order_number>/return/initiate/", views.order_return_quick, name="order_return_quick"),
+    # Shiprocket rejects webhook URLs containing "shiprocket"
+    path("orders/tracking/webhook/", views.tracking_webhook, name="tracking_webhook"),
 ]
@@ -1,25 +1,70 @@
+import hmac
+import json
+import logging
 import uuid
 from decimal import Decimal
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
 from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from cart.models import Cart
-from .models import Order, OrderItem
-from payments.utils import create_razorpay_order
-from .shiprocket import estimate_shipping_charge
-from cart.utils import get_session_items, clear_session_cart, get_session_coupon, clear_session_coupon
-from coupons.models import Coupon
+from cart.signals import batched_totals
+from cart.pricing import drop_pin_for, price_lines, snapshot
+from .models import Order, OrderItem, TrackingEvent
+from .display import enrich_orders, order_item_rows
+from .inventory import OutOfStock, release_order, reserve_order, stock_reservation_ttl
+from core import metrics
+from payments.utils import create_razorpay_order, create_razorpay_order_async
+from cart.utils import get_session_items, get_session_coupon, clear_session_coupon, merge_session_cart
 from accounts.models import Address
 from .shiprocket import create_shiprocket_return
+from .tracking import record as record_tracking
 from .models import ReturnRequest, ReturnItem
 from catalog.models import Variant
 
 
+logger = logging.getLogger(__name__)
+
+
 def _generate_order_number() -> str:
     return uuid.uuid4().hex[:10].upper()
 
 
+def _order_items(order: Order, sources, snap, buy_now_data=None):
+    """Unsaved OrderItem rows for the checkout lines.
+
+    Unit prices come from the pricing snapshot the totals were computed
+    from, and cost snapshots from the variants already loaded in ``sources``.
+    """
+    rows = []
+    for (prod, var, qty), line in zip(sources, snap.lines):
+        unit_cost = Decimal(str(var.cost_price)) if (var and var.cost_price is not None) else Decimal("0.00")
+        size = (getattr(var, "size", "") if var else "") or ""
+        color = (getattr(var, "color", "") if var else "") or ""
+        if buy_now_data:
+            # Buy Now keeps the shopper's picked size/color even without a variant
+            size = size or buy_now_data.get("size") or ""
+            color = color or buy_now_data.get("color") or ""
+        rows.append(OrderItem(
+            order=order,
+            product=prod,
+            variant=var,
+            variant_size=size,
+            variant_color=color,
+            quantity=qty,
+            unit_price=line.unit_price,
+            line_total=(line.unit_price * qty).quantize(Decimal("0.01")),
+            unit_cost=unit_cost,
+            line_cost=(unit_cost * Decimal(qty)).quantize(Decimal("0.01")),
+        ))
+    return rows
+
+
 @login_required
 def checkout(request):
     # Detect Buy Now mode (single-item checkout)
@@ -39,18 +84,11 @@ def checkout(request):
 
     # Merge any session cart items into the user's cart on first checkout
     # Skip when in Buy Now mode so we don't pollute the user's cart
-    if not buy_now_mode and not selected_mode:
-        ses_items = get_session_items(request)
-        if ses_items:
-            cart = getattr(request.user, "cart", None)
-            if not cart:
-                cart = Cart.objects.create(user=request.user)
-            for it in ses_items:
-                db_item, created = cart.items.get_or_create(product=it.product, variant=it.variant, defaults={"quantity": it.quantity})
-                if not created:
-                    db_item.quantity += it.quantity
-                    db_item.save()
-            clear_session_cart(request)
+    if not buy_now_mode and not selected_mode and get_session_items(request):
+        cart = getattr(request.user, "cart", None)
+        if not cart:
+            cart = Cart.objects.create(user=request.user)
+        merge_session_cart(request, cart)
 
     cart = getattr(request.user, "cart", None)
     if not buy_now_mode and not selected_mode and (not cart or cart.items.count() == 0):
@@ -146,58 +184,36 @@ def checkout(request):
             bn_unit = None
         if bn_unit is None:
             bn_unit = (bn_variant.price() if bn_variant else bn_product.price())
-        subtotal = (bn_unit * bn_qty).quantize(Decimal("0.01"))
         sources = [(bn_product, bn_variant, bn_qty)]
     elif selected_mode:
         sources = []
-        subtotal = Decimal("0.00")
         # Auth users: resolve DB cart items by id; Guests: use sv list
         if request.user.is_authenticated and selected_data.get("db_ids"):
             ids = list(map(int, selected_data.get("db_ids") or []))
             for it in (cart.items.select_related("product", "variant").filter(id__in=ids) if cart else []):
                 sources.append((it.product, it.variant, it.quantity))
-                subtotal += (it.unit_price() * it.quantity)
         else:
-            from catalog.models import Product, Variant
+            from catalog.models import Product
+            picks = []
             for sv in (selected_data.get("sv") or []):
                 try:
-                    prod = Product.objects.get(id=int(sv.get("pid")))
+                    pid = int(sv.get("pid"))
                 except Exception:
                     continue
-                var = None
                 vid = sv.get("vid")
-                if vid not in (None, "", 0, "0", "None"):
-                    try:
-                        var = Variant.objects.get(id=int(vid))
-                    except Exception:
-                        var = None
-                qty = max(1, int(sv.get("qty", 1)))
-                sources.append((prod, var, qty))
-                unit = (var.price() if var else prod.price())
-                subtotal += (unit * qty)
-        subtotal = subtotal.quantize(Decimal("0.01"))
+                try:
+                    vid = int(vid) if vid not in (None, "", 0, "0", "None") else None
+                except (TypeError, ValueError):
+                    vid = None
+                picks.append((pid, vid, max(1, int(sv.get("qty", 1)))))
+            # Two queries for all selected lines
+            products = Product.objects.in_bulk({pid for pid, _, _ in picks})
+            variants = Variant.objects.in_bulk({vid for _, vid, _ in picks if vid})
+            for pid, vid, qty in picks:
+                if pid in products:
+                    sources.append((products[pid], variants.get(vid), qty))
     else:
-        subtotal = cart.subtotal()
         sources = [(it.product, it.variant, it.quantity) for it in cart.items.select_related("product", "variant")]
-    # Coupon application
-    coupon_code = get_session_coupon(request)
-    coupon = None
-    discount_amount = Decimal("0.00")
-    if coupon_code:
-        try:
-            coupon = Coupon.objects.get(code__iexact=coupon_code)
-            if coupon.is_valid():
-                discount_amount = (subtotal * Decimal(coupon.discount_percent) / Decimal("100")).quantize(Decimal("0.01"))
-            else:
-                coupon = None
-        except Coupon.DoesNotExist:
-            coupon = None
-    discounted_subtotal = (subtotal - discount_amount).quantize(Decimal("0.01"))
-    if discounted_subtotal < 0:
-        discounted_subtotal = Decimal("0.00")
-    gst_rate = Decimal(str(getattr(settings, "GST_RATE", "0.18")))
-    gst_amount = (discounted_subtotal * gst_rate).quantize(Decimal("0.01"))
-
     # Estimate shipment charge using session delivery pin or default address
     addresses = Address.objects.filter(user=request.user)
     selected_id = request.GET.get("address_id")
@@ -210,122 +226,15 @@ def checkout(request):
     if not default_address:
         default_address = addresses.filter(is_default=True).first() or addresses.first()
 
-    # Helpers for weight/dimensions based on product/variant fields
-    def _items_total_weight_dims():
-        total_w = Decimal("0.00")
-        max_l = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_LCM", 20))
-        max_b = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_BCM", 15))
-        max_h = int(getattr(settings, "SHIPROCKET_DEFAULT_DIM_HCM", 2))
-        for prod, var, qty in sources:
-            if var and getattr(var, "weight_kg", None):
-                w = Decimal(str(var.weight_kg))
-            elif getattr(prod, "weight_kg", None):
-                w = Decimal(str(prod.weight_kg))
-            else:
-                w = Decimal(str(getattr(settings, "SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG", 0.5)))
-            total_w += (w * Decimal(qty))
-            lv = (getattr(var, "length_cm", None) if var else None) or getattr(prod, "length_cm", None)
-            bv = (getattr(var, "breadth_cm", None) if var else None) or getattr(prod, "breadth_cm", None)
-            hv = (getattr(var, "height_cm", None) if var else None) or getattr(prod, "height_cm", None)
-            if lv:
-                try: max_l = max(max_l, int(lv))
-                except Exception: pass
-            if bv:
-                try: max_b = max(max_b, int(bv))
-                except Exception: pass
-            if hv:
-                try: max_h = max(max_h, int(hv))
-                except Exception: pass
-        return total_w, (max_l, max_b, max_h)
-
-    # Free shipping threshold still applies
-    shipping = Decimal("0.00")
-    if discounted_subtotal >= Decimal(getattr(settings, "FREE_SHIPPING_THRESHOLD", 399)):
-        shipping = Decimal("0.00")
-    else:
-        # Try Shiprocket estimate when configured and address present
-        ship_estimate = None
-        try:
-            if buy_now_mode:
-                units_total = bn_qty
-            elif selected_mode:
-                units_total = sum((qty for _, _, qty in sources), 0) or 1
-            else:
-                cart = getattr(request.user, "cart", None)
-                units_total = sum((it.quantity for it in cart.items.all()), 0) if cart else 0
-            # Prefer session delivery pin
-            delivery = request.session.get("delivery") or {}
-            drop_pin = (str(delivery.get("postal_code") or "").strip() or None)
-            if not drop_pin:
-                drop_pin = default_address.postal_code if default_address else None
-            if drop_pin:
-                total_w, dims = _items_total_weight_dims()
-                ship_est = estimate_shipping_charge(
-                    drop_pin=str(drop_pin),
-                    units_total=units_total or 1,
-                    cod=False,
-                    declared_value=discounted_subtotal,
-                    total_weight_kg=total_w,
-                    dims_cm=dims,
-                )
-                ship_estimate = ship_est
-        except Exception:
-            ship_estimate = None
-
-        if ship_estimate is not None:
-            shipping = ship_estimate.quantize(Decimal("0.01"))
-        else:
-            flat = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
-            shipping = flat
-
-    total = (discounted_subtotal + gst_amount + shipping).quantize(Decimal("0.01"))
+    # Variant.price() falls back to the product; reuse the instance already loaded
+    for prod, var, _ in sources:
+        if var is not None and var.product_id == prod.id:
+            var.product = prod
 
-    # Build display items with color-aware thumbnail selection and variant-aware pricing
-    display_items = []
-    try:
-        for prod, var, qty in sources:
-            unit = (bn_unit if buy_now_mode else (var.price() if var else prod.price()))
-            chosen_color = None
-            if var and getattr(var, "color", None):
-                try:
-                    chosen_color = (var.color or "").strip()
-                except Exception:
-                    chosen_color = None
-            elif buy_now_mode:
-                try:
-                    chosen_color = ((buy_now_data or {}).get("color") or "").strip() or None
-                except Exception:
-                    chosen_color = None
-            img_url = ""
-            try:
-                imgs = list(getattr(prod, "images", None).all()) if getattr(prod, "images", None) else []
-                if chosen_color:
-                    low = chosen_color.strip().lower()
-                    match = None
-                    for im in imgs:
-                        c = (getattr(im, "color", "") or "").strip().lower()
-                        if c == low:
-                            match = im
-                            break
-                    if match and getattr(match, "image", None) and getattr(match.image, "url", None):
-                        img_url = match.image.url
-                if not img_url and imgs:
-                    first = imgs[0]
-                    if getattr(first, "image", None) and getattr(first.image, "url", None):
-                        img_url = first.image.url
-            except Exception:
-                img_url = ""
-            display_items.append({
-                "product": prod,
-                "variant": var,
-                "qty": qty,
-                "unit": unit,
-                "img_url": img_url,
-                "color": chosen_color,
-            })
-    except Exception:
-        # Fallback: minimal structures if something goes wrong
-        display_items = [{"product": p, "variant": v, "qty": q, "img_url": "", "color": None} for p, v, q in sources]
+    # Totals (coupon, GST, shipping estimate) from the shared pricing engine
+    snap = snapshot((prod, var, qty, (bn_unit if buy_now_mode else None)) for prod, var, qty in sources)
+    coupon_code = get_session_coupon(request)
+    prices = price_lines(snap, coupon_code=coupon_code, drop_pin=drop_pin_for(request, default_address))
 
     if request.method == "POST":
         payment_method = request.POST.get("payment_method")
@@ -343,132 +252,74 @@ def checkout(request):
             except (Address.DoesNotExist, ValueError, TypeError):
                 addr_obj = None
 
-        # Compute shipment charge using selected address and payment method
-        shipping_for_order = Decimal("0.00")
-        if discounted_subtotal >= Decimal(getattr(settings, "FREE_SHIPPING_THRESHOLD", 399)):
-            shipping_for_order = Decimal("0.00")
-        else:
-            try:
-                if buy_now_mode:
-                    units_total = bn_qty
-                elif selected_mode:
-                    units_total = sum((qty for _, _, qty in sources), 0) or 1
-                else:
-                    cart_for_units = getattr(request.user, "cart", None)
-                    units_total = sum((it.quantity for it in cart_for_units.items.all()), 0) if cart_for_units else 1
-                # Prefer session delivery pin
-                delivery = request.session.get("delivery") or {}
-                drop_pin = (str(delivery.get("postal_code") or "").strip() or None)
-                if not drop_pin:
-                    drop_pin = (addr_obj.postal_code if addr_obj else request.POST.get("postal_code")) or ""
-                est = None
-                if drop_pin:
-                    total_w, dims = _items_total_weight_dims()
-                    est = estimate_shipping_charge(
-                        drop_pin=str(drop_pin),
-                        units_total=units_total or 1,
-                        cod=(payment_method == "cod"),
-                        declared_value=discounted_subtotal,
-                        total_weight_kg=total_w,
-                        dims_cm=dims,
-                    )
-                if est is not None:
-                    shipping_for_order = est.quantize(Decimal("0.01"))
-                else:
-                    shipping_for_order = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
-            except Exception:
-                shipping_for_order = Decimal(str(getattr(settings, "FLAT_SHIPPING_RATE", 49)))
-
-        total = (discounted_subtotal + gst_amount + shipping_for_order).quantize(Decimal("0.01"))
-
-        order = Order.objects.create(
-            user=request.user,
-            order_number=order_number,
-            status="created",
-            payment_method=payment_method,
-            subtotal=discounted_subtotal,
-            discount_amount=discount_amount,
-            coupon_code=coupon.code if coupon else "",
-            gst_amount=gst_amount,
-            shipping_amount=shipping_for_order,
-            total_amount=total,
-            shipping_name=(addr_obj.full_name if addr_obj else (request.POST.get("shipping_name") or request.user.get_full_name() or request.user.username)),
-            shipping_phone=(addr_obj.phone if addr_obj else request.POST.get("shipping_phone", "")),
-            address_line1=(addr_obj.address_line1 if addr_obj else request.POST.get("address_line1", "")),
-            address_line2=(addr_obj.address_line2 if addr_obj else request.POST.get("address_line2", "")),
-            city=(addr_obj.city if addr_obj else request.POST.get("city", "")),
-            state=(addr_obj.state if addr_obj else request.POST.get("state", "")),
-            postal_code=(addr_obj.postal_code if addr_obj else request.POST.get("postal_code", "")),
-            country=(addr_obj.country if addr_obj else "India"),
+        # Re-price for the selected address and payment method
+        prices = price_lines(
+            snap,
+            coupon_code=coupon_code,
+            drop_pin=drop_pin_for(request, addr_obj, request.POST.get("postal_code")),
+            cod=(payment_method == "cod"),
         )
+        total = prices.total
 
-        if buy_now_mode:
-            unit_cost_val = Decimal("0.00")
-            if bn_variant and getattr(bn_variant, "cost_price", None) is not None:
-                try:
-                    unit_cost_val = Decimal(str(bn_variant.cost_price))
-                except Exception:
-                    unit_cost_val = Decimal("0.00")
-            OrderItem.objects.create(
-                order=order,
-                product=bn_product,
-                variant=bn_variant,
-                variant_size=(getattr(bn_variant, "size", None) or (buy_now_data.get("size") if buy_now_data else "") or ""),
-                variant_color=(getattr(bn_variant, "color", None) or (buy_now_data.get("color") if buy_now_data else "") or ""),
-                quantity=bn_qty,
-                unit_price=bn_unit,
-                line_total=(bn_unit * bn_qty).quantize(Decimal("0.01")),
-                unit_cost=unit_cost_val,
-                line_cost=(unit_cost_val * Decimal(bn_qty)).quantize(Decimal("0.01")),
-            )
-        elif selected_mode:
-            for prod, var, qty in sources:
-                unit_cost_val = Decimal("0.00")
-                if var and getattr(var, "cost_price", None) is not None:
-                    try:
-                        unit_cost_val = Decimal(str(var.cost_price))
-                    except Exception:
-                        unit_cost_val = Decimal("0.00")
-                unit = (var.price() if (var and (getattr(var, "sale_price", None) is not None or getattr(var, "base_price", None) is not None)) else prod.price())
-                OrderItem.objects.create(
-                    order=order,
-                    product=prod,
-                    variant=var,
-                    variant_size=(getattr(var, "size", "") if var else ""),
-                    variant_color=(getattr(var, "color", "") if var else ""),
-                    quantity=qty,
-                    unit_price=unit,
-                    line_total=(unit * qty).quantize(Decimal("0.01")),
-                    unit_cost=unit_cost_val,
-                    line_cost=(unit_cost_val * Decimal(qty)).quantize(Decimal("0.01")),
-                )
-        else:
-            for item in cart.items.select_related("product", "variant"):
-                # Resolve unit cost from variant/product cost_price if available
-                unit_cost_val = Decimal("0.00")
-                if item.variant and getattr(item.variant, "cost_price", None) is not None:
-                    try:
-                        unit_cost_val = Decimal(str(item.variant.cost_price))
-                    except Exception:
-                        unit_cost_val = Decimal("0.00")
-                # Fallback: product doesn't yet have cost_price field; leave 0
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    variant=item.variant,
-                    variant_size=(getattr(item.variant, "size", "") if item.variant else ""),
-                    variant_color=(getattr(item.variant, "color", "") if item.variant else ""),
-                    quantity=item.quantity,
-                    unit_price=item.unit_price(),
-                    line_total=item.line_total(),
-                    unit_cost=unit_cost_val,
-                    line_cost=(unit_cost_val * Decimal(item.quantity)).quantize(Decimal("0.01")),
+        rp_future = None
+        if payment_method == "razorpay" and getattr(settings, "RAZORPAY_PRECREATE", True):
+            # The Razorpay order needs only the amount and receipt, so it is
+            # created while the rows below are written (an order orphaned by a
+            # rollback is never paid and simply expires at Razorpay)
+            rp_future = create_razorpay_order_async(int(total * 100), receipt=order_number)
+
+        # Order, items and stock reservation commit together; a line that
+        # sold out since the cart was priced rolls the whole order back
+        try:
+            with metrics.timed("checkout.persist"), transaction.atomic():
+                order = Order.objects.create(
+                    user=request.user,
+                    order_number=order_number,
+                    status="created",
+                    payment_method=payment_method,
+                    subtotal=prices.discounted_subtotal,
+                    discount_amount=prices.discount_amount,
+                    coupon_code=prices.coupon_code,
+                    gst_amount=prices.gst_amount,
+                    shipping_amount=prices.shipping,
+                    total_amount=total,
+                    shipping_name=(addr_obj.full_name if addr_obj else (request.POST.get("shipping_name") or request.user.get_full_name() or request.user.username)),
+                    shipping_phone=(addr_obj.phone if addr_obj else request.POST.get("shipping_phone", "")),
+                    address_line1=(addr_obj.address_line1 if addr_obj else request.POST.get("address_line1", "")),
+                    address_line2=(addr_obj.address_line2 if addr_obj else request.POST.get("address_line2", "")),
+                    city=(addr_obj.city if addr_obj else request.POST.get("city", "")),
+                    state=(addr_obj.state if addr_obj else request.POST.get("state", "")),
+                    postal_code=(addr_obj.postal_code if addr_obj else request.POST.get("postal_code", "")),
+                    country=(addr_obj.country if addr_obj else "India"),
                 )
 
+                OrderItem.objects.bulk_create(_order_items(order, sources, snap, buy_now_data if buy_now_mode else None))
+                reserve_order(order, ttl=(stock_reservation_ttl() if payment_method == "razorpay" else None))
+                if payment_method == "cod" and cart and not buy_now_mode:
+                    # A COD order is final here, so its lines leave the cart in the same transaction
+                    lines = cart.items.all()
+                    if selected_mode:
+                        lines = lines.filter(id__in=list(map(int, selected_data.get("db_ids") or [])))
+                    with batched_totals([cart.pk]):
+                        lines.delete()
+        except OutOfStock as exc:
+            messages.error(request, f"Only {exc.available} left of {exc.variant}. Please update your cart.")
+            return redirect("view_cart")
+
         if payment_method == "razorpay":
-            rp_order = create_razorpay_order(int(total * 100), receipt=order_number)
+            try:
+                if rp_future is not None:
+                    rp_order = rp_future.result()
+                else:
+                    rp_order = create_razorpay_order(int(total * 100), receipt=order_number)
+            except Exception:
+                logger.exception("Razorpay order creation failed for %s", order_number)
+                release_order(order, note="Payment gateway unavailable")
+                Order.objects.filter(pk=order.pk).update(status="cancelled")
+                messages.error(request, "We could not reach the payment gateway. Please try again.")
+                return redirect("checkout")
             order.razorpay_order_id = rp_order.get("id", "")
-            order.save()
+            Order.objects.filter(pk=order.pk).update(razorpay_order_id=order.razorpay_order_id)
             # Clear temp buy-now / selected items
             if buy_now_mode:
                 try:
@@ -491,12 +342,6 @@ def checkout(request):
                 },
             )
         else:  # COD
-            order.status = "created"
-            order.save()
-            if not buy_now_mode and not selected_mode and cart:
-                cart.items.all().delete()
-            elif selected_mode and cart and request.user.is_authenticated and (selected_data.get("db_ids") or []):
-                cart.items.filter(id__in=list(map(int, selected_data.get("db_ids") or []))).delete()
             clear_session_coupon(request)
             if buy_now_mode:
                 try:
@@ -511,6 +356,54 @@ def checkout(request):
             messages.success(request, f"COD order placed: {order.order_number}")
             return redirect("order_detail", order_number=order.order_number)
 
+    # Build display items with color-aware thumbnail selection and variant-aware pricing
+    display_items = []
+    prefetch_related_objects([prod for prod, _, _ in sources], "images")
+    try:
+        for prod, var, qty in sources:
+            unit = (bn_unit if buy_now_mode else (var.price() if var else prod.price()))
+            chosen_color = None
+            if var and getattr(var, "color", None):
+                try:
+                    chosen_color = (var.color or "").strip()
+                except Exception:
+                    chosen_color = None
+            elif buy_now_mode:
+                try:
+                    chosen_color = ((buy_now_data or {}).get("color") or "").strip() or None
+                except Exception:
+                    chosen_color = None
+            img_url = ""
+            try:
+                imgs = list(getattr(prod, "images", None).all()) if getattr(prod, "images", None) else []
+                if chosen_color:
+                    low = chosen_color.strip().lower()
+                    match = None
+                    for im in imgs:
+                        c = (getattr(im, "color", "") or "").strip().lower()
+                        if c == low:
+                            match = im
+                            break
+                    if match and getattr(match, "image", None) and getattr(match.image, "url", None):
+                        img_url = match.image.url
+                if not img_url and imgs:
+                    first = imgs[0]
+                    if getattr(first, "image", None) and getattr(first.image, "url", None):
+                        img_url = first.image.url
+            except Exception:
+                img_url = ""
+            display_items.append({
+                "product": prod,
+                "variant": var,
+                "qty": qty,
+                "unit": unit,
+                "img_url": img_url,
+                "color": chosen_color,
+            })
+    except Exception:
+        # Fallback: minimal structures if something goes wrong
+        display_items = [{"product": p, "variant": v, "qty": q, "img_url": "", "color": None} for p, v, q in sources]
+
     return render(
         request,
         "orders/checkout.html",
@@ -519,13 +412,13 @@ def checkout(request):
             "sources": sources,
             "items": display_items,
             "buy_now": buy_now_data,
-            "subtotal": subtotal,
-            "discount_amount": discount_amount,
-            "discounted_subtotal": discounted_subtotal,
+            "subtotal": prices.subtotal,
+            "discount_amount": prices.discount_amount,
+            "discounted_subtotal": prices.discounted_subtotal,
             "coupon_code": coupon_code,
-            "gst_amount": gst_amount,
-            "shipping": shipping,
-            "total": total,
+            "gst_amount": prices.gst_amount,
+            "shipping": prices.shipping,
+            "total": prices.total,
             "addresses": addresses,
             "default_address": default_address,
         },
@@ -534,86 +427,16 @@ def checkout(request):
 
 @login_required
 def order_list(request):
-    orders = (
-        Order.objects.filter(user=request.user)
-        .order_by("-created_at")
-        .prefetch_related("items__product__images", "items__variant")
-    )
-    # Enrich orders with first item size/color and a color-aware thumbnail
-    for o in orders:
-        try:
-            it = o.items.select_related("product", "variant").first()
-            if not it:
-                continue
-            size = (getattr(it.variant, "size", None) or getattr(it, "variant_size", "") or "")
-            color = (getattr(it.variant, "color", None) or getattr(it, "variant_color", "") or "")
-            thumb = ""
-            try:
-                imgs = list(getattr(it.product, "images", None).all()) if getattr(it.product, "images", None) else []
-                if color:
-                    low = str(color).strip().lower()
-                    for im in imgs:
-                        c = (getattr(im, "color", "") or "").strip().lower()
-                        if c and c == low and getattr(im, "image", None) and getattr(im.image, "url", None):
-                            thumb = im.image.url
-                            break
-                if not thumb and imgs:
-                    first = imgs[0]
-                    if getattr(first, "image", None) and getattr(first.image, "url", None):
-                        thumb = first.image.url
-            except Exception:
-                thumb = ""
-            o.first_size = size
-            o.first_color = color
-            o.thumb_url = thumb
-        except Exception:
-            o.first_size = ""
-            o.first_color = ""
-            o.thumb_url = ""
+    # First item size/color and a color-aware thumbnail, resolved in bulk
+    orders = enrich_orders(Order.objects.filter(user=request.user).order_by("-created_at"))
     return render(request, "orders/order_list.html", {"orders": orders})
 
 
 @login_required
 def order_detail(request, order_number):
     order = get_object_or_404(Order, user=request.user, order_number=order_number)
-    # Build color-aware thumbnails for each item
-    items = []
-    try:
-        for it in order.items.select_related("product", "variant").all():
-            # Determine display size/color (prefer variant relation, fallback to snapshot fields)
-            disp_size = (getattr(it.variant, "size", None) or it.variant_size or "")
-            disp_color = (getattr(it.variant, "color", None) or it.variant_color or "")
-            chosen_color = (disp_color or None)
-            img_url = ""
-            try:
-                imgs = list(getattr(it.product, "images", None).all()) if getattr(it.product, "images", None) else []
-                if chosen_color:
-                    low = chosen_color.strip().lower()
-                    match = None
-                    for im in imgs:
-                        c = (getattr(im, "color", "") or "").strip().lower()
-                        if c == low:
-                            match = im
-                            break
-                    if match and getattr(match, "image", None) and getattr(match.image, "url", None):
-                        img_url = match.image.url
-                if not img_url and imgs:
-                    first = imgs[0]
-                    if getattr(first, "image", None) and getattr(first.image, "url", None):
-                        img_url = first.image.url
-            except Exception:
-                img_url = ""
-            items.append({
-                "obj": it,
-                "product": it.product,
-                "variant": it.variant,
-                "size": disp_size,
-                "color": disp_color,
-                "qty": it.quantity,
-                "img_url": img_url,
-            })
-    except Exception:
-        items = [{"obj": it, "product": it.product, "variant": it.variant, "size": (getattr(it.variant, "size", None) or it.variant_size or ""), "color": (getattr(it.variant, "color", None) or it.variant_color or ""), "qty": it.quantity, "img_url": ""} for it in order.items.all()]
+    # Color-aware thumbnails for each item
+    items = order_item_rows(order)
     return render(request, "orders/order_detail.html", {"order": order, "items": items})
 
 
@@ -642,10 +465,42 @@ def order_invoice(request, order_number):
 @login_required
 def order_track(request, order_number):
     order = get_object_or_404(Order, user=request.user, order_number=order_number)
-    tracking = None
+    # Local data only: scans are stored by orders.tracking (webhook and poller)
+    events = []
     if order.tracking_number:
-        tracking = track_awb(order.tracking_number)
-    return render(request, "orders/track.html", {"order": order, "tracking": tracking})
+        events = list(order.tracking_events.filter(awb=order.tracking_number))
+    return render(request, "orders/track.html", {"order": order, "events": events})
+
+
+@csrf_exempt
+@require_POST
+def tracking_webhook(request):
+    """Shiprocket shipment status webhook.
+
+    Shiprocket sends the token configured in its panel in the X-Api-Key
+    header; requests without the matching SHIPROCKET_WEBHOOK_TOKEN are
+    refused. Unknown AWBs (e.g. return shipments) are acknowledged and ignored.
+    """
+    token = getattr(settings, "SHIPROCKET_WEBHOOK_TOKEN", "")
+    supplied = request.headers.get("X-Api-Key", "")
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return HttpResponseForbidden("Invalid token")
+    try:
+        payload = json.loads(request.body.decode())
+    except Exception:
+        return HttpResponseBadRequest("Invalid payload")
+    if not isinstance(payload, dict):
+        return HttpResponseBadRequest("Invalid payload")
+    awb = str(payload.get("awb") or "").strip()
+    order = Order.objects.filter(tracking_number=awb).first() if awb else None
+    if order is not None:
+        try:
+            record_tracking(order, payload, TrackingEvent.SOURCE_WEBHOOK)
+        except Exception:
+            logger.exception("Could not record tracking webhook for %s", awb)
+            # Let Shiprocket redeliver; stored scans are deduplicated
+            return HttpResponse(status=500)
+    return HttpResponse(status=200)
 
 
 @login_required
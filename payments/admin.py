@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import PaymentEvent
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ("received_at", "event", "razorpay_order_id", "razorpay_payment_id", "status", "note", "deliveries")
+    list_filter = ("status", "event")
+    search_fields = ("event_id", "razorpay_order_id", "razorpay_payment_id")
+    readonly_fields = ("received_at", "updated_at")
@@ -0,0 +1,113 @@
+"""Razorpay payment events.
+
+``mark_order_paid`` is the one paid transition: a conditional UPDATE that
+only matches an order still awaiting payment, so whichever of the checkout
+callback and the webhook arrives first confirms the stock reservation and
+queues the shipment, and the other changes nothing. No post_save signal
+fires, so repeated deliveries never redo shipment or email work.
+
+``handle_webhook`` stores each delivery as a PaymentEvent keyed on the
+X-Razorpay-Event-Id header and applies it in the same transaction; a
+redelivery finds the stored event and only counts itself. Callers verify
+the X-Razorpay-Signature first with ``verify_webhook_signature``.
+"""
+import hashlib
+import hmac
+import json
+import logging
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from orders.inventory import confirm_reservation
+from orders.models import Order
+from orders.sales import order_changed
+from orders.signals import queue_shipment
+
+from .models import PaymentEvent
+
+
+logger = logging.getLogger(__name__)
+
+PAID_EVENTS = ("payment.captured", "order.paid")
+
+
+def verify_webhook_signature(body: bytes, signature: str) -> bool:
+    """HMAC-SHA256 of the raw body with RAZORPAY_WEBHOOK_SECRET, as Razorpay signs it."""
+    secret = getattr(settings, "RAZORPAY_WEBHOOK_SECRET", "")
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def mark_order_paid(razorpay_order_id: str, payment_id: str = "", signature: str = "") -> Optional[Order]:
+    """Mark the order paid if it is still unpaid; returns it only if this call did."""
+    if not razorpay_order_id:
+        return None
+    fields = {"status": "paid", "updated_at": timezone.now()}
+    if payment_id:
+        fields["razorpay_payment_id"] = payment_id
+    if signature:
+        fields["razorpay_signature"] = signature
+    with transaction.atomic():
+        # Only "created" orders: a paid, shipped or cancelled order is never moved back
+        if not Order.objects.filter(razorpay_order_id=razorpay_order_id, status="created").update(**fields):
+            return None
+        order = Order.objects.get(razorpay_order_id=razorpay_order_id)
+        confirm_reservation(order)
+        queue_shipment(order)
+        # The update sent no post_save, so refresh the sales day here
+        order_changed(order)
+    return order
+
+
+def _entity(payload: dict, name: str) -> dict:
+    return ((payload.get(name) or {}).get("entity") or {}) if isinstance(payload, dict) else {}
+
+
+def handle_webhook(body: bytes, event_id: str = "") -> Tuple[PaymentEvent, bool]:
+    """Store and apply a verified webhook body; returns (event, created).
+
+    ``created`` is False for a redelivery, which changes nothing. Raises
+    ValueError for a body that is not a JSON object.
+    """
+    data = json.loads(body.decode())
+    if not isinstance(data, dict):
+        raise ValueError("Webhook body is not an object")
+    event = str(data.get("event") or "")
+    payment = _entity(data.get("payload") or {}, "payment")
+    order_id = payment.get("order_id") or _entity(data.get("payload") or {}, "order").get("id") or ""
+    # Razorpay always sends the header; the body hash is only a fallback
+    event_id = event_id or hashlib.sha256(body).hexdigest()
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                obj = PaymentEvent.objects.create(
+                    event_id=event_id[:100],
+                    event=event[:60],
+                    razorpay_order_id=str(order_id)[:200],
+                    razorpay_payment_id=str(payment.get("id") or "")[:200],
+                    status=PaymentEvent.STATUS_IGNORED,
+                    payload=data,
+                )
+        except IntegrityError:
+            PaymentEvent.objects.filter(event_id=event_id[:100]).update(
+                deliveries=F("deliveries") + 1, updated_at=timezone.now()
+            )
+            return PaymentEvent.objects.get(event_id=event_id[:100]), False
+
+        if event not in PAID_EVENTS:
+            obj.note = "event not handled"
+        elif not order_id:
+            obj.note = "no order id in payload"
+        elif mark_order_paid(order_id, obj.razorpay_payment_id):
+            obj.status = PaymentEvent.STATUS_PROCESSED
+        else:
+            obj.note = "no unpaid order"
+        obj.save(update_fields=["status", "note", "updated_at"])
+    return obj, True
@@ -0,0 +1,104 @@
+import statistics
+import time
+
+import razorpay
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from cart.models import Cart
+from catalog.models import Product, Variant
+from core import metrics
+from payments.stub import start
+from payments.utils import create_razorpay_order
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f"mean {statistics.mean(timings):.2f} ms, median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+
+
+class Command(BaseCommand):
+    help = "Benchmark Razorpay order creation and Razorpay checkout against a local stub (changes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=100, help="API calls per client mode")
+        parser.add_argument("--orders", type=int, default=20, help="Checkouts per mode")
+        parser.add_argument("--latency", type=float, default=50, help="Stub latency in milliseconds")
+
+    def handle(self, *args, **options):
+        server, url = start(latency_ms=options["latency"])
+        handler = server.RequestHandlerClass
+        try:
+            with override_settings(RAZORPAY_BASE_URL=url, ALLOWED_HOSTS=["*"]):
+                self._clients(url, options["calls"], handler)
+                self._checkouts(options["orders"])
+        finally:
+            server.shutdown()
+
+    def _clients(self, url, calls, handler):
+        auth = (settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+        data = {"amount": 49900, "currency": "INR", "receipt": "bench"}
+        for label, call in (
+            ("new client per call", lambda: razorpay.Client(auth=auth, base_url=url).order.create(data=data)),
+            ("pooled client", lambda: create_razorpay_order(49900, "bench")),
+        ):
+            handler.new_connections = 0
+            timings = []
+            for _ in range(calls):
+                start_t = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start_t) * 1000)
+            self.stdout.write(f"{label}: {_summary(timings)}, {handler.new_connections} connections")
+
+    def _checkouts(self, orders):
+        products = list(Product.objects.filter(is_active=True, variants__isnull=False).distinct().order_by("id")[:3])
+        if not products:
+            raise CommandError("No active products with variants; run seed_store first")
+        try:
+            with transaction.atomic():
+                self._run_checkouts(products, orders)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run_checkouts(self, products, orders):
+        user = get_user_model().objects.create_user(username="bench-razorpay", password="x")
+        cart = Cart.objects.create(user=user)
+        for p in products:
+            variant = p.variants.order_by("id").first()
+            # Plenty of stock so reservations never run out mid-run
+            Variant.objects.filter(pk=variant.pk).update(stock=10 ** 6)
+            cart.items.create(product=p, variant=variant, quantity=1)
+        http = Client()
+        http.force_login(user)
+        post = {
+            "payment_method": "razorpay",
+            "shipping_name": "Bench", "shipping_phone": "9999999999", "address_line1": "1 Road",
+            "city": "Delhi", "state": "Delhi", "postal_code": "110001",
+        }
+        names = ["checkout.persist.count", "checkout.persist.total_ms", "razorpay.create_order.count", "razorpay.create_order.total_ms"]
+        for label, precreate in (("checkout, order created after writes", False), ("checkout, order created concurrently", True)):
+            before = metrics.read(names)
+            timings = []
+            with override_settings(RAZORPAY_PRECREATE=precreate):
+                for _ in range(orders):
+                    start_t = time.perf_counter()
+                    resp = http.post(reverse("checkout"), post)
+                    timings.append((time.perf_counter() - start_t) * 1000)
+                    if resp.status_code != 200:
+                        raise CommandError(f"checkout returned {resp.status_code}")
+            after = metrics.read(names)
+            delta = {n: after[n] - before[n] for n in names}
+            persist = delta["checkout.persist.total_ms"] / max(1, delta["checkout.persist.count"])
+            api = delta["razorpay.create_order.total_ms"] / max(1, delta["razorpay.create_order.count"])
+            self.stdout.write(f"{label}: {_summary(timings)} (writes ~{persist:.0f} ms, Razorpay ~{api:.0f} ms)")
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from payments.stub import start
+
+
+class Command(BaseCommand):
+    help = "Run a local stub of the Razorpay Orders API (set RAZORPAY_BASE_URL to its address)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0, help="Milliseconds to wait before each reply")
+
+    def handle(self, *args, **options):
+        server, url = start(options["host"], options["port"], options["latency"])
+        self.stdout.write(f"Razorpay stub listening on {url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('event', models.CharField(max_length=60)),
+                ('razorpay_order_id', models.CharField(blank=True, db_index=True, max_length=200)),
+                ('razorpay_payment_id', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(choices=[('processed', 'Processed'), ('ignored', 'Ignored')], max_length=10)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('deliveries', models.PositiveIntegerField(default=1)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('-received_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class PaymentEvent(models.Model):
+    """A Razorpay webhook delivery, stored once per event id (see payments.events)."""
+
+    STATUS_PROCESSED = "processed"
+    STATUS_IGNORED = "ignored"
+    STATUS_CHOICES = [
+        (STATUS_PROCESSED, "Processed"),
+        (STATUS_IGNORED, "Ignored"),
+    ]
+
+    # X-Razorpay-Event-Id; redeliveries of an event share it
+    event_id = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=60)
+    razorpay_order_id = models.CharField(max_length=200, blank=True, db_index=True)
+    razorpay_payment_id = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    # Why the event changed nothing, e.g. "order already paid"
+    note = models.CharField(max_length=200, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    deliveries = models.PositiveIntegerField(default=1)
+    received_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-received_at",)
+
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.status})"
@@ -0,0 +1,71 @@
+"""A local stand-in for the Razorpay Orders API.
+
+Answers ``POST /v1/orders`` like Razorpay (any Basic auth accepted) after an
+optional fixed latency, so checkout can be exercised and benchmarked without
+network access: set RAZORPAY_BASE_URL to the stub's address, or run
+``manage.py razorpay_stub``.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    # Headers and body are separate writes; without this, keep-alive replies
+    # stall on Nagle + delayed ACK and the benchmark measures that instead
+    disable_nagle_algorithm = True
+    latency = 0.0
+    new_connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).new_connections += 1
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            data = None
+        if self.path.rstrip("/") != "/v1/orders":
+            return self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Not found"}})
+        if not isinstance(data, dict) or not data.get("amount"):
+            return self._reply(400, {"error": {"code": "BAD_REQUEST_ERROR", "description": "amount is required"}})
+        if self.latency:
+            time.sleep(self.latency)
+        self._reply(200, {
+            "id": f"order_stub{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": data["amount"],
+            "amount_paid": 0,
+            "amount_due": data["amount"],
+            "currency": data.get("currency", "INR"),
+            "receipt": data.get("receipt"),
+            "status": "created",
+            "attempts": 0,
+            "created_at": int(time.time()),
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the stub on a daemon thread; returns (server, base URL). Port 0 picks a free port."""
+    handler = type("Handler", (StubHandler,), {"latency": latency_ms / 1000.0, "new_connections": 0})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="razorpay-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
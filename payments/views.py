@@ -1,12 +1,16 @@
-import json
+import logging
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
+from .events import handle_webhook, mark_order_paid, verify_webhook_signature
 from .utils import verify_razorpay_signature
 from orders.models import Order
 
 
+logger = logging.getLogger(__name__)
+
+
 @csrf_exempt
 def razorpay_callback(request):
     if request.method != "POST":
@@ -25,10 +29,11 @@ def razorpay_callback(request):
     order = get_object_or_404(Order, razorpay_order_id=razorpay_order_id)
 
     if verify_razorpay_signature(params):
-        order.razorpay_payment_id = razorpay_payment_id
-        order.razorpay_signature = razorpay_signature
-        order.status = "paid"
-        order.save()
+        if not mark_order_paid(razorpay_order_id, razorpay_payment_id, razorpay_signature):
+            # The webhook got there first; only record the checkout signature
+            Order.objects.filter(pk=order.pk, razorpay_signature="").update(
+                razorpay_payment_id=razorpay_payment_id, razorpay_signature=razorpay_signature
+            )
         messages.success(request, f"Payment successful for order {order.order_number}")
         # Clear cart for user if any
         if hasattr(order.user, "cart"):
@@ -41,23 +46,13 @@ def razorpay_callback(request):
 
 @csrf_exempt
 def razorpay_webhook(request):
+    if request.method != "POST":
+        return HttpResponseBadRequest("Invalid method")
+    if not verify_webhook_signature(request.body, request.headers.get("X-Razorpay-Signature", "")):
+        logger.warning("Rejected Razorpay webhook with a missing or invalid signature")
+        return HttpResponseBadRequest("Invalid signature")
     try:
-        data = json.loads(request.body.decode())
-    except Exception:
+        handle_webhook(request.body, request.headers.get("X-Razorpay-Event-Id", ""))
+    except ValueError:
         return HttpResponseBadRequest("Invalid payload")
-
-    # In a production setup, verify webhook signature header 'X-Razorpay-Signature'
-    event = data.get("event")
-    payload = data.get("payload", {})
-    if event == "payment.captured":
-        order_id = payload.get("payment", {}).get("entity", {}).get("order_id")
-        if order_id:
-            try:
-                order = Order.objects.get(razorpay_order_id=order_id)
-                order.status = "paid"
-                order.save()
-            except Order.DoesNotExist:
-                pass
-
     return HttpResponse(status=200)
-
@@ -5,3 +5,8 @@ class ReviewsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "reviews"
 
+    def ready(self):
+        try:
+            from . import signals  # noqa: F401
+        except Exception:
+            pass
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from reviews.signals import refresh_product_ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild denormalized rating and review-media counts on products"
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", type=int, help="Limit to these product IDs (default: all)")
+
+    def handle(self, *args, **options):
+        ids = options["product_ids"] or None
+        updated = refresh_product_ratings(ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} products"))
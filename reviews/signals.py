@@ -0,0 +1,39 @@
+from typing import Iterable, Optional
+
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from catalog.models import Product
+from .models import Review, ReviewMedia
+
+
+def refresh_product_ratings(product_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute Product.rating_sum/rating_count/media_count in one UPDATE.
+
+    Pass product_ids to limit the refresh; None rebuilds every product.
+    """
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    media = ReviewMedia.objects.filter(review__product=OuterRef("pk")).order_by().values("review__product")
+    qs = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=list(product_ids))
+    return qs.update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(s=Sum("rating")).values("s")), 0),
+        rating_count=Coalesce(Subquery(reviews.annotate(c=Count("id")).values("c")), 0),
+        media_count=Coalesce(Subquery(media.annotate(c=Count("id")).values("c")), 0),
+    )
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance: Review, **kwargs):
+    refresh_product_ratings([instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=ReviewMedia)
+def review_media_changed(sender, instance: ReviewMedia, **kwargs):
+    try:
+        product_id = instance.review.product_id
+    except Review.DoesNotExist:
+        # Review deleted in the same cascade; review_changed handles it
+        return
+    refresh_product_ratings([product_id])
@@ -1,6 +1,7 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
+from django.db import transaction
 from .models import Review, ReviewMedia
 from catalog.models import Product
 
@@ -18,10 +19,6 @@ def add_review(request, product_id):
         messages.error(request, "Invalid rating")
         return redirect("product_detail", slug=product.slug)
 
-    review, _created = Review.objects.update_or_create(
-        user=request.user, product=product, defaults={"rating": rating, "title": title, "body": body}
-    )
-
     # Handle uploaded media (images/videos)
     files = []
     files.extend(request.FILES.getlist("media"))
@@ -29,24 +26,30 @@ def add_review(request, product_id):
     if request.FILES.get("video"):
         files.append(request.FILES["video"])
 
-    saved_photos = 0
-    saved_video = False
-    for f in files:
-        ctype = getattr(f, 'content_type', '') or ''
-        if ctype.startswith('image/'):
-            if saved_photos >= 4:
-                continue
-            if hasattr(f, 'size') and f.size and f.size > 20 * 1024 * 1024:
-                continue
-            ReviewMedia.objects.create(review=review, file=f, kind='image')
-            saved_photos += 1
-        elif ctype.startswith('video/'):
-            if saved_video:
-                continue
-            if hasattr(f, 'size') and f.size and f.size > 200 * 1024 * 1024:
-                continue
-            ReviewMedia.objects.create(review=review, file=f, kind='video')
-            saved_video = True
+    # Review, media and the product's rating aggregates (reviews.signals) commit together
+    with transaction.atomic():
+        review, _created = Review.objects.update_or_create(
+            user=request.user, product=product, defaults={"rating": rating, "title": title, "body": body}
+        )
+
+        saved_photos = 0
+        saved_video = False
+        for f in files:
+            ctype = getattr(f, 'content_type', '') or ''
+            if ctype.startswith('image/'):
+                if saved_photos >= 4:
+                    continue
+                if hasattr(f, 'size') and f.size and f.size > 20 * 1024 * 1024:
+                    continue
+                ReviewMedia.objects.create(review=review, file=f, kind='image')
+                saved_photos += 1
+            elif ctype.startswith('video/'):
+                if saved_video:
+                    continue
+                if hasattr(f, 'size') and f.size and f.size > 200 * 1024 * 1024:
+                    continue
+                ReviewMedia.objects.create(review=review, file=f, kind='video')
+                saved_video = True
     messages.success(request, "Review submitted")
     next_url = request.POST.get("next", "")
     if next_url and isinstance(next_url, str) and next_url.startswith("/"):
@@ -110,6 +110,8 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    # Re-indexes sessions whose key is cycled while signed in (accounts.sessions)
+    "accounts.middleware.UserSessionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -165,6 +167,27 @@ DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL")
 # SMTP protocol debug toggle (when using SMTP backend).
 SMTP_DEBUG = env("SMTP_DEBUG")
 ORDER_ALERT_EMAILS = env("ORDER_ALERT_EMAILS")
+# Seconds before a stalled SMTP connect/command gives up
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=20)
+
+# Outbound mail service (core.mail): sender threads per process, queued
+# messages before overflow goes to the job queue, messages per send_messages
+# call, seconds an idle connection stays open, retries of transient SMTP
+# errors before the rest of a batch is stored as a job, and seconds given to
+# send what is queued at shutdown
+EMAIL_WORKERS = env.int("EMAIL_WORKERS", default=2)
+EMAIL_QUEUE_SIZE = env.int("EMAIL_QUEUE_SIZE", default=500)
+EMAIL_BATCH_SIZE = env.int("EMAIL_BATCH_SIZE", default=50)
+EMAIL_IDLE_TIMEOUT = env.int("EMAIL_IDLE_TIMEOUT", default=30)
+EMAIL_MAX_RETRIES = env.int("EMAIL_MAX_RETRIES", default=3)
+EMAIL_DRAIN_TIMEOUT = env.int("EMAIL_DRAIN_TIMEOUT", default=10)
+
+# Product/coupon announcements (accounts.announcements), fanned out by the job
+# worker: email them as well as the in-app notice, users per chunk, and the
+# most announcement emails sent per minute
+ANNOUNCE_BY_EMAIL = env.bool("ANNOUNCE_BY_EMAIL", default=False)
+ANNOUNCE_CHUNK_SIZE = env.int("ANNOUNCE_CHUNK_SIZE", default=500)
+ANNOUNCE_EMAILS_PER_MINUTE = env.int("ANNOUNCE_EMAILS_PER_MINUTE", default=600)
 
 # Basic logging to console, including mail logger
 LOGGING = {
@@ -198,6 +221,32 @@ DATABASES = {
 # Persistent connections (no-op for SQLite)
 DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
 
+# Cache: per-process memory by default. Set CACHE_URL (e.g. redis://...) when
+# running several workers so storefront cache invalidations are shared.
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+# Lifetime (seconds) of cached storefront data such as header counters
+STORE_CACHE_TIMEOUT = env.int("STORE_CACHE_TIMEOUT", default=300)
+
+# Session storage. "django.contrib.sessions.backends.cached_db" serves reads
+# from the cache above and only writes through to the database on change; use
+# it (or ".cache") together with a shared CACHE_URL.
+SESSION_ENGINE = env.str("SESSION_ENGINE", default="django.contrib.sessions.backends.db")
+
+# Background jobs (core.jobs), processed by `python manage.py run_jobs`.
+# JOBS_EAGER runs each job in-process right after the enqueuing transaction
+# commits, for development setups without a worker.
+JOBS_EAGER = env.bool("JOBS_EAGER", default=False)
+JOB_RETRY_BASE_DELAY = env.int("JOB_RETRY_BASE_DELAY", default=30)
+JOB_RETRY_MAX_DELAY = env.int("JOB_RETRY_MAX_DELAY", default=3600)
+# A running job not finished after this many seconds is assumed lost and retried
+JOB_LOCK_TIMEOUT = env.int("JOB_LOCK_TIMEOUT", default=600)
+
+# Seconds a Razorpay checkout holds its stock before the reservation lapses
+# (released by the job worker). COD orders hold stock until packed or cancelled.
+STOCK_RESERVATION_TTL = env.int("STOCK_RESERVATION_TTL", default=30 * 60)
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -245,6 +294,14 @@ BRAND_GOLD_DARK = env("BRAND_GOLD_DARK")
 # Razorpay keys
 RAZORPAY_KEY_ID = env("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = env("RAZORPAY_KEY_SECRET")
+# Secret set on the Razorpay webhook; unsigned or mis-signed deliveries are rejected
+RAZORPAY_WEBHOOK_SECRET = env.str("RAZORPAY_WEBHOOK_SECRET", default="")
+# API base URL (point at manage.py razorpay_stub for local benchmarks), request
+# timeout in seconds, and whether checkout creates the Razorpay order while it
+# writes the order rows instead of afterwards
+RAZORPAY_BASE_URL = env.str("RAZORPAY_BASE_URL", default="")
+RAZORPAY_TIMEOUT = env.int("RAZORPAY_TIMEOUT", default=15)
+RAZORPAY_PRECREATE = env.bool("RAZORPAY_PRECREATE", default=True)
 
 # Shiprocket
 SHIPROCKET_ENABLED = env("SHIPROCKET_ENABLED")
@@ -257,6 +314,20 @@ SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG = env("SHIPROCKET_DEFAULT_UNIT_WEIGHT_KG")
 SHIPROCKET_DEFAULT_DIM_LCM = env("SHIPROCKET_DEFAULT_DIM_LCM")
 SHIPROCKET_DEFAULT_DIM_BCM = env("SHIPROCKET_DEFAULT_DIM_BCM")
 SHIPROCKET_DEFAULT_DIM_HCM = env("SHIPROCKET_DEFAULT_DIM_HCM")
+# Serviceability quote cache (seconds): fresh for QUOTE_TTL, then served stale
+# while refreshing for up to QUOTE_STALE_TTL; "not serviceable" for NEGATIVE_TTL
+SHIPROCKET_QUOTE_TTL = env.int("SHIPROCKET_QUOTE_TTL", default=6 * 3600)
+SHIPROCKET_QUOTE_STALE_TTL = env.int("SHIPROCKET_QUOTE_STALE_TTL", default=24 * 3600)
+SHIPROCKET_QUOTE_NEGATIVE_TTL = env.int("SHIPROCKET_QUOTE_NEGATIVE_TTL", default=600)
+# Token Shiprocket sends (X-Api-Key) to the tracking webhook; empty disables it
+SHIPROCKET_WEBHOOK_TOKEN = env.str("SHIPROCKET_WEBHOOK_TOKEN", default="")
+# Seconds between tracking polls; shipments updated by the webhook within
+# this window are not polled
+TRACKING_POLL_INTERVAL = env.int("TRACKING_POLL_INTERVAL", default=3600)
+
+# Product search backend: "auto" (Postgres full-text on PostgreSQL, else the
+# in-process inverted index), "memory" or "postgres"
+CATALOG_SEARCH_BACKEND = env.str("CATALOG_SEARCH_BACKEND", default="auto")
 
 # Analytics / profit estimation
 COGS_RATE = env("COGS_RATE")